@@ -380,22 +380,27 @@ class Model(object):
 
     def timespan(self, time_span):
         """
-        Set the time span of simulation. StochKit does not support non-uniform
-        timespans.
+        Set the time span of simulation. Solvers which do not support
+        timelines, such as StochKit, only support uniform timespans starting
+        at 0.
 
         tspan : numpy ndarray
-            Evenly-spaced list of times at which to sample the species
+            Increasing list of times at which to sample the species
             populations during the simulation.
         """
 
-        items = np.diff(time_span)
-        items = map(lambda x: round(x, 10), items)
-        isuniform = (len(set(items)) == 1)
+        if len(time_span) < 2 or np.any(np.diff(time_span) <= 0):
+            raise InvalidModelError("A timespan must contain at least two increasing times.")
+        self.tspan = time_span
 
-        if isuniform:
-            self.tspan = time_span
-        else:
-            raise InvalidModelError("StochKit only supports uniform timespans")
+    def uniform_timespan(self):
+        """
+        Whether the timespan is evenly spaced from 0, so that solvers can
+        rebuild it from its end time and increment.
+        """
+        items = np.diff(self.tspan)
+        items = map(lambda x: round(x, 10), items)
+        return self.tspan[0] == 0 and len(set(items)) == 1
 
     def get_reaction(self, rname):
         return self.listOfReactions[rname]
@@ -437,26 +442,28 @@ class Model(object):
             Use names of species as index of result object rather than position numbers.
         """
         if solver is not None:
-            if ((isinstance(solver, type)
-                    and issubclass(solver, GillesPySolver))) or issubclass(type(solver), GillesPySolver):
-                return solver.run(model=self, t=self.tspan[-1],
-                                  increment=self.tspan[-1] - self.tspan[-2],
-                                  seed=seed,
-                                  number_of_trajectories=number_of_trajectories,
-                                  stochkit_home=stochkit_home, profile=profile, debug=debug,
-                                  show_labels=show_labels)
-            else:
+            if not (((isinstance(solver, type)
+                    and issubclass(solver, GillesPySolver))) or issubclass(type(solver), GillesPySolver)):
                 raise SimulationError(
                     "argument 'solver' to run() must be a subclass of GillesPySolver")
         else:
             from gillespy2.solvers.auto import SSASolver
+            solver = SSASolver
             if debug:
                 print("Using Solver: {0}".format(SSASolver.name))
-            return SSASolver.run(model=self, t=self.tspan[-1],
-                                      increment=self.tspan[-1] - self.tspan[-2], seed=seed,
-                                      number_of_trajectories=number_of_trajectories,
-                                      stochkit_home=stochkit_home, profile=profile, debug=debug,
-                                      show_labels=show_labels)
+        # Other timespans are passed as a timeline of output times.
+        timeline_args = {}
+        if not self.uniform_timespan():
+            if not solver.supports_timeline:
+                raise SimulationError(
+                    "{0} only supports uniform timespans starting at 0".format(solver.name))
+            timeline_args['timeline'] = self.tspan
+        return solver.run(model=self, t=self.tspan[-1],
+                          increment=self.tspan[-1] - self.tspan[-2],
+                          seed=seed,
+                          number_of_trajectories=number_of_trajectories,
+                          stochkit_home=stochkit_home, profile=profile, debug=debug,
+                          show_labels=show_labels, **timeline_args)
 
 
 
@@ -26,7 +26,12 @@ class GillesPySolver:
         simulation.
     show_labels : bool (True)
         Use names of species as index of result object rather than position numbers.
+    supports_timeline : bool
+        True if run accepts a timeline of output times, which may be unevenly
+        spaced, in place of t and increment.
     """
+    supports_timeline = False
+
     def run(self, model, t=20, number_of_trajectories=1, increment=0.05, seed=None,
             debug=False, profile=False, show_labels=False, **kwargs):
         """ 
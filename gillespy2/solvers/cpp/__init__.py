@@ -1,4 +1,6 @@
 from gillespy2.solvers.cpp.ssa_c_solver import SSACSolver
+from gillespy2.solvers.cpp.tau_leaping_c_solver import TauLeapingCSolver
+from gillespy2.solvers.cpp.ode_c_solver import ODECSolver
 
 def check_cpp_support():
     from gillespy2.example_models import Example
@@ -14,4 +16,4 @@ def check_cpp_support():
 
 can_use_cpp = check_cpp_support()
 
-__all__ = ['SSACSolver'] if can_use_cpp else []
+__all__ = ['SSACSolver', 'TauLeapingCSolver', 'ODECSolver'] if can_use_cpp else []
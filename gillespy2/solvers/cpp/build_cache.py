@@ -0,0 +1,148 @@
+"""Persistent, content-addressed cache for compiled C++ solver artifacts."""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DEFAULT_CACHE_DIRECTORY = os.environ.get('GILLESPY2_CACHE_DIR', os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'gillespy2'))
+DEFAULT_CACHE_SIZE = int(os.environ.get('GILLESPY2_CACHE_SIZE', 256 * 1024 * 1024))
+
+
+class BuildCache:
+    """
+    Stores compiled artifacts under a key derived from everything that went into building them,
+    so identical models compiled in separate processes reuse a single build.
+
+    Entries are written to a temporary file and atomically renamed into place, so concurrent
+    readers never observe a partially written artifact. Lookups refresh an entry's modification
+    time, and once the cache grows past max_size the least recently used entries are evicted.
+
+    Attributes
+    ----------
+    directory : str
+        Directory holding cached artifacts. Defaults to ~/.cache/gillespy2, or GILLESPY2_CACHE_DIR if set.
+    max_size : int
+        Upper bound in bytes on the total size of cached artifacts.
+    """
+    lock_file = '.lock'
+
+    def __init__(self, directory=None, max_size=None):
+        self.directory = os.path.abspath(directory if directory is not None else DEFAULT_CACHE_DIRECTORY)
+        self.max_size = max_size if max_size is not None else DEFAULT_CACHE_SIZE
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*sources):
+        """
+        Hash a sequence of str/bytes sources into a cache key.
+        :param sources: the contents which determine the compiled artifact, e.g. source files and flags.
+        :return: a hex digest identifying the artifact.
+        """
+        digest = hashlib.sha256()
+        for source in sources:
+            if isinstance(source, str):
+                source = source.encode('utf-8')
+            # Length prefix each source so boundaries between sources affect the key.
+            digest.update(str(len(source)).encode('ascii') + b':')
+            digest.update(source)
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def fetch(self, key, destination):
+        """
+        Place the artifact stored under key at destination.
+        :return: True on a cache hit, False if no artifact is cached for key.
+        """
+        path = self.entry_path(key)
+        if os.path.exists(destination):
+            os.remove(destination)
+        try:
+            # A hard link survives eviction of the entry by another process.
+            os.link(path, destination)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            try:
+                shutil.copy2(path, destination)
+            except FileNotFoundError:
+                return False
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True
+
+    def store(self, key, source):
+        """
+        Atomically add the artifact at source to the cache under key, then evict old entries if needed.
+        """
+        handle, temporary_path = tempfile.mkstemp(prefix='.tmp-', dir=self.directory)
+        os.close(handle)
+        try:
+            shutil.copy2(source, temporary_path)
+            os.replace(temporary_path, self.entry_path(key))
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until the cache fits in max_size.
+        :param keep: a key which is never evicted, typically the entry just stored.
+        """
+        with self._lock():
+            entries = []
+            total_size = 0
+            for name in os.listdir(self.directory):
+                if name.startswith('.'):
+                    continue
+                try:
+                    stat = os.stat(self.entry_path(name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+                total_size += stat.st_size
+            entries.sort()
+            for mtime, size, name in entries:
+                if total_size <= self.max_size:
+                    break
+                if name == keep:
+                    continue
+                try:
+                    os.remove(self.entry_path(name))
+                except FileNotFoundError:
+                    pass
+                total_size -= size
+
+    def clear(self):
+        """ Remove every entry from the cache. """
+        with self._lock():
+            for name in os.listdir(self.directory):
+                if not name.startswith('.'):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(self.entry_path(name))
+
+    @contextlib.contextmanager
+    def _lock(self):
+        """ Serialize cache maintenance between processes where file locking is available. """
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, self.lock_file), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -2,24 +2,45 @@
 #include <vector>
 #include <iostream>
 #include <sstream>
+#include <algorithm>
 #include <time.h>
 #include <math.h>
 #include "model.h"
 #include "ssa.h"
+#include "ode.h"
 using namespace Gillespy;
 
 //Default values, replaced with command line args
 unsigned int number_trajectories = 0;
 unsigned int number_timesteps = 0;
-int random_seed = 0;
+unsigned int number_threads = 1;
+unsigned int random_seed = 0;
+unsigned int first_trajectory = 0;
 double end_time = 0;
 bool seed_time = true;
+bool integer_output = false;
+unsigned int number_parameter_overrides = 0;
+unsigned int number_initial_states = 0;
+bool custom_timeline = false; //Output times are read from stdin rather than evenly spaced up to end_time
+std :: vector<double> output_times;
+bool record_events = false; //Follow the results with the log of every reaction fired
+bool summarize = false; //Output the mean, variance and histograms of populations across trajectories instead of every trajectory
+unsigned int number_bins = 0;
+double histogram_lower = 0;
+double histogram_upper = 0;
+std :: string algorithm = "direct";
+double tau_tolerance = 0.03;
+double relative_tolerance = 1e-6;
+double absolute_tolerance = 1e-9;
 
 //Default constants
 __DEFINE_CONSTANTS__
 
 class PropensityFunction : public IPropensityFunction{
 public:
+  //Model parameters (volume first), defaults may be overridden at runtime
+__DEFINE_PARAMETERS__
+
   double evaluate(unsigned int reaction_number, unsigned int* S){
     switch(reaction_number){
 __DEFINE_PROPENSITY__
@@ -28,27 +49,307 @@ __DEFINE_PROPENSITY__
       return -1;
     }
   }
+
+  double evaluate(unsigned int reaction_number, double* S){
+    switch(reaction_number){
+__DEFINE_PROPENSITY__
+
+    default: //Error
+      return -1;
+    }
+  }
 };
 
-int main(int argc, char* argv[]){
+Model build_model(){
   std :: vector<std :: string> species_names(s_names, s_names + sizeof(s_names)/sizeof(std :: string));
   std :: vector<unsigned int> species_populations(populations, populations + sizeof(populations)/sizeof(populations[0]));
   std :: vector<std :: string> reaction_names(r_names, r_names + sizeof(r_names)/sizeof(std :: string));
   
   Model model(species_names, species_populations, reaction_names);
 
-  //Begin reaction species changes
+  //Begin reaction species changes and dependencies
 __DEFINE_REACTIONS_
-  //End reaction species changes
-  model.update_affected_reactions();
+  //End reaction species changes and dependencies
+  return model;
+}
+
+//One propensity function per parameter set, each a block of values in parameter order
+std :: vector<PropensityFunction> make_propensity_functions(const double* parameters, unsigned int number_parameter_sets){
+  std :: vector<PropensityFunction> propensity_functions(std :: max(number_parameter_sets, 1u));
+  for(unsigned int i = 0; i < number_parameter_sets; i++){
+    propensity_functions[i].set_parameters(&(parameters[(size_t) i * PropensityFunction :: number_parameters]));
+  }
+  return propensity_functions;
+}
+
+//Several parameter sets sweep the simulation's trajectories over them
+void sweep_parameter_sets(Simulation& simulation, std :: vector<PropensityFunction>& propensity_functions){
+  if(propensity_functions.size() > 1){
+    for(PropensityFunction& propensity_function : propensity_functions){
+      simulation.swept_propensity_functions.push_back(&propensity_function);
+    }
+  }
+}
+
+//Receives the event log of each trajectory from the shared library build
+typedef void (*EventCallback)(unsigned int trajectory_number, size_t number_events, const double* times, const unsigned int* reaction_numbers);
+
+//Entry point for the shared library build, writes results into caller allocated buffers, and passes event logs to event_callback unless it is null
+extern "C" int run_simulation(unsigned int number_trajectories, unsigned int number_timesteps, double end_time, unsigned int random_seed, int seed_time, unsigned int first_trajectory, unsigned int number_threads, const char* algorithm, double tau_tolerance, const double* parameters, unsigned int number_parameter_sets, const unsigned int* initial_states, unsigned int number_initial_states, int custom_timeline, EventCallback event_callback, double* timeline, unsigned int* trajectories){
+  if(seed_time){
+    random_seed = time(NULL);
+  }
+  Model model = build_model();
+  std :: vector<PropensityFunction> propensity_functions = make_propensity_functions(parameters, number_parameter_sets);
+  Simulation simulation(&model, number_trajectories, number_timesteps, end_time, &(propensity_functions[0]), random_seed, number_threads, trajectories);
+  sweep_parameter_sets(simulation, propensity_functions);
+  simulation.first_trajectory = first_trajectory;
+  simulation.set_initial_states(initial_states, number_initial_states);
+  //A custom timeline is read from the timeline buffer, which is otherwise only written
+  if(custom_timeline){
+    simulation.set_timeline(timeline);
+  }
+  simulation.tau_tolerance = tau_tolerance;
+  if(event_callback){
+    simulation.enable_event_log();
+  }
+  if(!simulate(&simulation, algorithm)){
+    return 1;
+  }
+  if(event_callback){
+    for(unsigned int i = 0; i < number_trajectories; i++){
+      event_callback(i, simulation.event_times[i].size(), simulation.event_times[i].data(), simulation.event_reactions[i].data());
+    }
+  }
+  for(unsigned int i = 0; i < number_timesteps; i++){
+    timeline[i] = simulation.timeline[i];
+  }
+  return 0;
+}
+
+//Entry point for summarized runs of the shared library build, writes the mean and variance of populations across the trajectories of each initial state or parameter set and their histograms into caller allocated buffers
+extern "C" int run_summary(unsigned int number_trajectories, unsigned int number_timesteps, double end_time, unsigned int random_seed, int seed_time, unsigned int first_trajectory, unsigned int number_threads, const char* algorithm, double tau_tolerance, const double* parameters, unsigned int number_parameter_sets, const unsigned int* initial_states, unsigned int number_initial_states, int custom_timeline, unsigned int number_bins, double lower, double upper, double* timeline, double* means, double* variances, unsigned long long* histograms){
+  if(seed_time){
+    random_seed = time(NULL);
+  }
+  Model model = build_model();
+  std :: vector<PropensityFunction> propensity_functions = make_propensity_functions(parameters, number_parameter_sets);
+  EnsembleSummary summary(std :: max(number_initial_states, number_parameter_sets), number_timesteps, model.number_species, number_bins, lower, upper);
+  Simulation simulation(&model, number_trajectories, number_timesteps, end_time, &(propensity_functions[0]), random_seed, number_threads, nullptr, &summary);
+  sweep_parameter_sets(simulation, propensity_functions);
+  simulation.first_trajectory = first_trajectory;
+  simulation.set_initial_states(initial_states, number_initial_states);
+  if(custom_timeline){
+    simulation.set_timeline(timeline);
+  }
+  simulation.tau_tolerance = tau_tolerance;
+  if(!simulate(&simulation, algorithm)){
+    return 1;
+  }
+  summary.moments(means, variances);
+  std :: copy(summary.histograms.begin(), summary.histograms.end(), histograms);
+  for(unsigned int i = 0; i < number_timesteps; i++){
+    timeline[i] = simulation.timeline[i];
+  }
+  return 0;
+}
+
+//Entry point for deterministic runs of the shared library build, integrates once from each initial state, returns 2 if the step size underflows
+extern "C" int run_ode(unsigned int number_timesteps, double end_time, double relative_tolerance, double absolute_tolerance, const double* parameters, const unsigned int* initial_states, unsigned int number_initial_states, int custom_timeline, double* timeline, double* trajectories){
+  Model model = build_model();
+  PropensityFunction propensity_function;
+  propensity_function.set_parameters(parameters);
+  if(!custom_timeline){
+    double timestep_size = end_time / (number_timesteps - 1);
+    for(unsigned int i = 0; i < number_timesteps; i++){
+      timeline[i] = timestep_size * i;
+    }
+  }
+  for(unsigned int i = 0; i < number_initial_states; i++){
+    if(!ode_solve(&model, &propensity_function, timeline, number_timesteps, &(initial_states[i * model.number_species]), relative_tolerance, absolute_tolerance, &(trajectories[(size_t) i * number_timesteps * model.number_species]))){
+      return 2;
+    }
+  }
+  return 0;
+}
+
+#ifndef GILLESPY_LIBRARY
+//Simulates with the current settings and writes binary results to os, returns false with a description in error if the settings are invalid
+//parameters holds no values for the model's defaults, or one or more parameter sets
+bool run_request(Model& model, const std :: vector<double>& parameters, std :: vector<unsigned int>& initial_states, std :: ostream& os, std :: string& error){
+  if(seed_time){
+    random_seed = time(NULL);
+  }
+  if(parameters.size() % PropensityFunction :: number_parameters != 0){
+    error = "Expected parameter sets of " + std :: to_string(PropensityFunction :: number_parameters) + " values.";
+    return false;
+  }
+  unsigned int number_parameter_sets = parameters.size() / PropensityFunction :: number_parameters;
+  if(number_initial_states > 0 && number_trajectories % number_initial_states != 0){
+    error = "Expected the trajectories to divide evenly between " + std :: to_string(number_initial_states) + " initial states.";
+    return false;
+  }
+  if(number_parameter_sets > 0 && number_trajectories % number_parameter_sets != 0){
+    error = "Expected the trajectories to divide evenly between " + std :: to_string(number_parameter_sets) + " parameter sets.";
+    return false;
+  }
+  std :: vector<PropensityFunction> propensity_functions = make_propensity_functions(parameters.data(), number_parameter_sets);
+  //Trajectories are reduced into the summary as they finish rather than stored
+  std :: unique_ptr<EnsembleSummary> summary;
+  if(summarize){
+    summary.reset(new EnsembleSummary(std :: max({number_initial_states, number_parameter_sets, 1u}), number_timesteps, model.number_species, number_bins, histogram_lower, histogram_upper));
+  }
+  Simulation simulation(&model, number_trajectories, number_timesteps, end_time, &(propensity_functions[0]), random_seed, number_threads, nullptr, summary.get());
+  sweep_parameter_sets(simulation, propensity_functions);
+  simulation.first_trajectory = first_trajectory;
+  simulation.tau_tolerance = tau_tolerance;
+  if(custom_timeline){
+    simulation.set_timeline(output_times.data());
+  }
+  if(record_events){
+    simulation.enable_event_log();
+  }
+  if(number_initial_states > 0){
+    simulation.set_initial_states(initial_states.data(), number_initial_states);
+  }
+  //Deterministic, so each initial state is integrated once
+  if(algorithm == "ode"){
+    if(number_parameter_sets > 1){
+      error = "Expected a single parameter set for a deterministic run.";
+      return false;
+    }
+    size_t trajectory_size = (size_t) number_timesteps * model.number_species;
+    std :: vector<double> trajectories(simulation.number_initial_states * trajectory_size);
+    for(unsigned int i = 0; i < simulation.number_initial_states; i++){
+      if(!ode_solve(&model, &(propensity_functions[0]), simulation.timeline, number_timesteps, &(simulation.initial_states[i * model.number_species]), relative_tolerance, absolute_tolerance, &(trajectories[i * trajectory_size]))){
+	error = "Step size underflow integrating from initial state " + std :: to_string(i) + ", the tolerances cannot be met.";
+	return false;
+      }
+    }
+    output_ode_results(os, simulation.number_initial_states, number_timesteps, model.number_species, simulation.timeline, trajectories.data());
+    return true;
+  }
+  if(!simulate(&simulation, algorithm)){
+    error = "Unknown algorithm " + algorithm + ".";
+    return false;
+  }
+  if(summarize){
+    summary -> output_summary_buffer(os, simulation.timeline);
+    return true;
+  }
+  simulation.output_results_buffer(os, integer_output);
+  if(record_events){
+    simulation.output_events_buffer(os);
+  }
+  return true;
+}
+
+template <typename T> bool read_values(std :: istream& is, T* values, size_t count){
+  is.read(reinterpret_cast<char*>(values), count * sizeof(T));
+  return (bool) is;
+}
+
+//Serves run requests from stdin until it is closed, keeping the process alive between runs
+//Request: uint32 trajectories, timesteps, threads, seed_time, integer_output, algorithm length, parameter count, initial state count, custom_timeline, record_events, first_trajectory, summarize and histogram bins,
+//uint32 seed, float64 end time, tau tolerance, relative and absolute tolerance, histogram lower and upper bounds, then the algorithm name, parameters, initial states and output times if custom_timeline
+//Response: uint32 status, followed by the binary results (and event log) or summary if it is 0, otherwise by a uint32 length and an error message
+int serve(Model& model){
+  while(true){
+    unsigned int header[13];
+    double tolerances[3];
+    double histogram_range[2];
+    if(!read_values(std :: cin, header, 13) || !read_values(std :: cin, &random_seed, 1) || !read_values(std :: cin, &end_time, 1) || !read_values(std :: cin, tolerances, 3) || !read_values(std :: cin, histogram_range, 2)){
+      //stdin closed
+      return 0;
+    }
+    number_trajectories = header[0];
+    number_timesteps = header[1];
+    number_threads = header[2];
+    seed_time = header[3];
+    integer_output = header[4];
+    number_parameter_overrides = header[6];
+    number_initial_states = header[7];
+    custom_timeline = header[8];
+    record_events = header[9];
+    first_trajectory = header[10];
+    summarize = header[11];
+    number_bins = header[12];
+    histogram_lower = histogram_range[0];
+    histogram_upper = histogram_range[1];
+    tau_tolerance = tolerances[0];
+    relative_tolerance = tolerances[1];
+    absolute_tolerance = tolerances[2];
+    algorithm.assign(header[5], ' ');
+    std :: vector<double> parameters(number_parameter_overrides);
+    std :: vector<unsigned int> initial_states((size_t) number_initial_states * model.number_species);
+    if(!read_values(std :: cin, &algorithm[0], algorithm.size()) || !read_values(std :: cin, parameters.data(), parameters.size()) || !read_values(std :: cin, initial_states.data(), initial_states.size())){
+      return 1;
+    }
+    output_times.resize(custom_timeline ? number_timesteps : 0);
+    if(!read_values(std :: cin, output_times.data(), output_times.size())){
+      return 1;
+    }
+    std :: string error;
+    unsigned int status = 0;
+    std :: ostringstream results;
+    run_request(model, parameters, initial_states, results, error);
+    if(!error.empty()){
+      status = 1;
+      unsigned int length = error.size();
+      std :: cout.write(reinterpret_cast<const char*>(&status), sizeof(status));
+      std :: cout.write(reinterpret_cast<const char*>(&length), sizeof(length));
+      std :: cout << error;
+    }else{
+      std :: cout.write(reinterpret_cast<const char*>(&status), sizeof(status));
+      std :: cout << results.str();
+    }
+    std :: cout.flush();
+  }
+}
+
+int main(int argc, char* argv[]){
+  Model model = build_model();
  
   //Parse command line arguments
  std :: string arg;
+ std :: string mode = "run";
  for(int i = 1; i < argc - 1; i++){
    arg = argv[i];
    if(argc > i+1 && arg.size() > 1 && arg[0] == '-'){
      std :: stringstream arg_stream(argv[i+1]);
      switch(arg[1]){
+     case 'a':
+       if(arg[2] == 't'){
+	 arg_stream >> absolute_tolerance;
+       }else{
+	 arg_stream >> algorithm;
+       }
+       break;
+     case 'b':
+       arg_stream >> number_bins;
+       break;
+     case 'c':
+       arg_stream >> custom_timeline;
+       break;
+     case 'l':
+       arg_stream >> histogram_lower;
+       break;
+     case 'u':
+       arg_stream >> histogram_upper;
+       break;
+     case 'o':
+       summarize = (arg_stream.str() == "summary");
+       break;
+     case 'm':
+       arg_stream >> mode;
+       break;
+     case 'r':
+       if(arg[2] == 'e'){
+	 record_events = (arg_stream.str() == "events");
+       }else{
+	 arg_stream >> relative_tolerance;
+       }
+       break;
      case 's':
        arg_stream >> random_seed;
        seed_time = false;
@@ -56,25 +357,69 @@ __DEFINE_REACTIONS_
      case 'e':
        arg_stream >> end_time;
        break;
+     case 'i':
+       arg_stream >> number_initial_states;
+       break;
+     case 'p':
+       arg_stream >> number_parameter_overrides;
+       break;
+     case 'f':
+       if(arg[2] == 'i'){
+	 arg_stream >> first_trajectory;
+       }else{
+	 integer_output = (arg_stream.str() == "integer");
+       }
+       break;
      case 't':
        if(arg[2] == 'r'){
 	 arg_stream >> number_trajectories;
        }else if(arg[2] == 'i'){
 	 arg_stream >> number_timesteps;
+       }else if(arg[2] == 'h'){
+	 arg_stream >> number_threads;
+       }else if(arg[2] == 'o'){
+	 arg_stream >> tau_tolerance;
        }
        break;
      }
    }
  }
 
- if(seed_time){
-   random_seed = time(NULL);
- }
-  IPropensityFunction *propFun = new PropensityFunction();
-  Simulation simulation(&model, number_trajectories, number_timesteps, end_time, propFun, random_seed);
-  ssa_direct(&simulation);
-  //std :: cout << simulation << std :: endl;
-  simulation.output_results_buffer(std :: cout);
-  delete propFun;
+  if(mode == "worker"){
+    return serve(model);
+  }
+  //Parameter overrides are read from stdin as a block of doubles, holding one or more parameter sets
+  std :: vector<double> parameters(number_parameter_overrides);
+  if(number_parameter_overrides > 0){
+    std :: cin.read(reinterpret_cast<char*>(parameters.data()), number_parameter_overrides * sizeof(double));
+    if(!std :: cin){
+      std :: cerr << "Expected " << number_parameter_overrides << " parameter values on stdin." << std :: endl;
+      return 1;
+    }
+  }
+  //Initial states follow the parameters on stdin, one block of populations per state
+  std :: vector<unsigned int> initial_states((size_t) number_initial_states * model.number_species);
+  if(number_initial_states > 0){
+    std :: cin.read(reinterpret_cast<char*>(initial_states.data()), initial_states.size() * sizeof(unsigned int));
+    if(!std :: cin){
+      std :: cerr << "Expected " << number_initial_states << " initial states on stdin." << std :: endl;
+      return 1;
+    }
+  }
+  //Followed by the output times of a custom timeline
+  if(custom_timeline){
+    output_times.resize(number_timesteps);
+    std :: cin.read(reinterpret_cast<char*>(output_times.data()), number_timesteps * sizeof(double));
+    if(!std :: cin){
+      std :: cerr << "Expected " << number_timesteps << " output times on stdin." << std :: endl;
+      return 1;
+    }
+  }
+  std :: string error;
+  if(!run_request(model, parameters, initial_states, std :: cout, error)){
+    std :: cerr << error << std :: endl;
+    return 1;
+  }
   return 0;
 }
+#endif
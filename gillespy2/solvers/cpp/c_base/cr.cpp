@@ -0,0 +1,183 @@
+#include "ssa.h"
+#include "rng.h"
+#include <cmath>//Included for natural logarithm and frexp
+#include <string.h>//Included for memcpy only
+
+namespace Gillespy{
+  //Reactions grouped by the power of two bounding their propensity, bin b holds propensities in [2^(b-offset-1), 2^(b-offset))
+  class PropensityBins{
+  public:
+    PropensityBins(unsigned int number_reactions) : propensities(number_reactions, 0), members(number_bins), sums(number_bins, 0), reaction_bin(number_reactions, empty), reaction_position(number_reactions), lowest(number_bins - 1), highest(0), updates_since_resum(0){
+    }
+
+    void update(unsigned int reaction, double propensity){
+      //Sums are kept by adding differences, resum once per number of reactions updates so rounding error does not accumulate
+      if(++updates_since_resum >= propensities.size()){
+	resum();
+      }
+      int old_bin = reaction_bin[reaction];
+      int new_bin = propensity > 0 ? bin_of(propensity) : empty;
+      if(old_bin != empty && old_bin == new_bin){
+	sums[new_bin] += propensity - propensities[reaction];
+	propensities[reaction] = propensity;
+	return;
+      }
+      if(old_bin != empty){
+	remove(reaction, old_bin);
+      }
+      propensities[reaction] = propensity;
+      if(new_bin != empty){
+	insert(reaction, new_bin);
+      }
+    }
+
+    //Sum of all propensities, cost is proportional to the number of bins in use rather than reactions
+    double total() const{
+      double sum = 0;
+      for(int bin = lowest; bin <= highest; bin++){
+	sum += sums[bin];
+      }
+      return sum;
+    }
+
+    //Composition picks a bin by its share of the total, rejection picks a member uniformly and accepts it with probability a/2^b
+    unsigned int select(Philox& rng, double propensity_sum){
+      double cumulative_sum = rng() * propensity_sum / rng.max();
+      int bin = highest;
+      while(bin > lowest){
+	cumulative_sum -= sums[bin];
+	if(cumulative_sum <= 0 && !members[bin].empty()){
+	  break;
+	}
+	bin--;
+      }
+      //Rounding may leave the remainder in an empty bin, move up to the nearest occupied one
+      while(members[bin].empty()){
+	bin++;
+      }
+      double bound = ldexp(1.0, bin - offset);
+      std :: vector<unsigned int>& candidates = members[bin];
+      while(true){
+	unsigned int candidate = candidates[rng() % candidates.size()];
+	if(rng() * bound / rng.max() < propensities[candidate]){
+	  return candidate;
+	}
+      }
+    }
+
+  private:
+    //frexp exponents of positive finite doubles lie in [-1073, 1024]
+    static const int offset = 1074;
+    static const int number_bins = 2100;
+    static const int empty = -1;
+    std :: vector<double> propensities;
+    std :: vector<std :: vector<unsigned int>> members;
+    std :: vector<double> sums;
+    std :: vector<int> reaction_bin;
+    std :: vector<unsigned int> reaction_position;
+    //Range of bins which have ever been occupied
+    int lowest;
+    int highest;
+    size_t updates_since_resum;
+
+    //Recomputes each bin's sum from its members
+    void resum(){
+      for(int bin = lowest; bin <= highest; bin++){
+	double sum = 0;
+	for(unsigned int reaction : members[bin]){
+	  sum += propensities[reaction];
+	}
+	sums[bin] = sum;
+      }
+      updates_since_resum = 0;
+    }
+
+    static int bin_of(double propensity){
+      int exponent;
+      frexp(propensity, &exponent);
+      return exponent + offset;
+    }
+
+    void insert(unsigned int reaction, int bin){
+      reaction_bin[reaction] = bin;
+      reaction_position[reaction] = members[bin].size();
+      members[bin].push_back(reaction);
+      sums[bin] += propensities[reaction];
+      if(bin < lowest){
+	lowest = bin;
+      }
+      if(bin > highest){
+	highest = bin;
+      }
+    }
+
+    void remove(unsigned int reaction, int bin){
+      std :: vector<unsigned int>& bin_members = members[bin];
+      unsigned int position = reaction_position[reaction];
+      bin_members[position] = bin_members.back();
+      reaction_position[bin_members[position]] = position;
+      bin_members.pop_back();
+      reaction_bin[reaction] = empty;
+      //Reset emptied bins so rounding error does not accumulate
+      sums[bin] = bin_members.empty() ? 0 : sums[bin] - propensities[reaction];
+    }
+  };
+  //Definitions of the constants above, which are bound to references
+  const int PropensityBins :: offset;
+  const int PropensityBins :: number_bins;
+  const int PropensityBins :: empty;
+
+  //Simulates a single trajectory with the composition-rejection method, selection cost is independent of the number of reactions
+  void ssa_composition_rejection_trajectory(Simulation* simulation, unsigned int trajectory_number, unsigned int** trajectory){
+    //Stream keyed by (seed, trajectory) so each trajectory is reproducible regardless of thread count or how an ensemble is split between runs
+    Philox rng(simulation -> random_seed, simulation -> first_trajectory + trajectory_number);
+    IPropensityFunction* propensity_function = simulation -> propensity_function_for(trajectory_number);
+    Model& model = *(simulation -> model);
+    unsigned int state_size = sizeof(int) * model.number_species;
+    std :: vector<unsigned int> current_state(model.number_species);
+
+    memcpy(trajectory[0], simulation -> initial_state(trajectory_number), state_size);
+    memcpy(current_state.data(), trajectory[0], state_size);
+    double current_time = simulation -> timeline[0];
+    unsigned int entry_count = 1;
+
+    PropensityBins bins(model.number_reactions);
+    for(unsigned int reaction_number = 0; reaction_number < model.number_reactions; reaction_number++){
+      bins.update(reaction_number, propensity_function -> evaluate(reaction_number, current_state.data()));
+    }
+    double propensity_sum;
+    while(current_time < (simulation -> end_time)){
+      propensity_sum = bins.total();
+      //No more reactions
+      if(propensity_sum <= 0){
+	for(unsigned int i = entry_count; i < simulation -> number_timesteps; i++){
+	  memcpy(trajectory[i], current_state.data(), state_size);
+	}
+	break;
+      }
+      current_time += -log(rng() * 1.0 / rng.max()) / propensity_sum;
+      //Copy current state to passed timesteps
+      while(entry_count < simulation -> number_timesteps && (simulation -> timeline[entry_count]) <= current_time){
+	memcpy(trajectory[entry_count], current_state.data(), state_size);
+	entry_count++;
+      }
+      unsigned int fired_reaction = bins.select(rng, propensity_sum);
+      Reaction& reaction = model.reactions[fired_reaction];
+      simulation -> record_event(trajectory_number, current_time, fired_reaction);
+      //Update current state
+      for(unsigned int species_number = 0; species_number < model.number_species; species_number++){
+	current_state[species_number] += reaction.species_change[species_number];
+      }
+      //Recalculate needed propensities
+      for(unsigned int& affected_reaction : reaction.affected_reactions){
+	bins.update(affected_reaction, propensity_function -> evaluate(affected_reaction, current_state.data()));
+      }
+    }
+  }//end ssa_composition_rejection_trajectory
+
+  void ssa_composition_rejection(Simulation* simulation){
+    if(simulation){
+      simulate_trajectories(simulation, ssa_composition_rejection_trajectory);
+    }
+  }
+}//end namespace
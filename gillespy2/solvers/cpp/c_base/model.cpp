@@ -1,4 +1,7 @@
 #include "model.h"
+#include <atomic>
+#include <thread>
+#include <algorithm>
 
 namespace Gillespy{
   
@@ -23,51 +26,183 @@ namespace Gillespy{
     }
   }
 
-  void Model :: update_affected_reactions(){
-    //Clear affected_reactions for each reaction
-    for(unsigned int i = 0; i < number_reactions; i++){
-      reactions[i].affected_reactions.clear();
-    }   
-    //Check all reactions for common species changes -> affected reactions
-    for(unsigned int r1 = 0; r1 < number_reactions; r1++){
-      reactions[r1].affected_reactions.push_back(r1);
-      for(unsigned int r2 = r1 + 1; r2 < number_reactions; r2++){
-	for(unsigned int s = 0; s < number_species; s++){
-	  if(reactions[r1].species_change[s] != 0 and reactions[r2].species_change[s] != 0){
-	    reactions[r1].affected_reactions.push_back(r2);
-	    reactions[r2].affected_reactions.push_back(r1);
-	  }
-	}
-      }
+  Simulation :: Simulation(Model* model, unsigned int number_trajectories, unsigned int number_timesteps, double end_time, IPropensityFunction* propensity_function, unsigned int random_seed, unsigned int number_threads, unsigned int* output_buffer, EnsembleSummary* summary) : model(model), end_time(end_time), random_seed(random_seed), first_trajectory(0), number_timesteps(number_timesteps), number_trajectories(number_trajectories), number_threads(number_threads), trajectories_1D(nullptr), trajectories(nullptr), owns_trajectories(output_buffer == nullptr), summary(summary), number_initial_states(1), initial_states(model -> number_species), propensity_function(propensity_function), tau_tolerance(0.03), record_events(false){
+    for(unsigned int i = 0; i < model -> number_species; i++){
+      initial_states[i] = model -> species[i].initial_population;
     }
-  }
-
-
-  Simulation :: Simulation(Model* model, unsigned int number_trajectories, unsigned int number_timesteps, double end_time, IPropensityFunction* propensity_function, int random_seed) : model(model), end_time(end_time), random_seed(random_seed), number_timesteps(number_timesteps), number_trajectories(number_trajectories), propensity_function(propensity_function){
     timeline = new double[number_timesteps];
     double timestep_size = end_time/(number_timesteps-1);
     for(unsigned int i = 0; i < number_timesteps; i++){
       timeline[i] = timestep_size * i;
     }
-    unsigned int trajectory_size = number_timesteps * (model -> number_species);
-    trajectories_1D = new unsigned int[number_trajectories * trajectory_size];
+    //Summarized trajectories are only held by the threads simulating them
+    if(summary){
+      return;
+    }
+    size_t trajectory_size = (size_t) number_timesteps * (model -> number_species);
+    trajectories_1D = owns_trajectories ? new unsigned int[number_trajectories * trajectory_size] : output_buffer;
     trajectories = new unsigned int**[number_trajectories];
     for(unsigned int i = 0; i < number_trajectories; i++){
       trajectories[i] = new unsigned int*[number_timesteps];
       for(unsigned int j = 0; j < number_timesteps; j++){
-	trajectories[i][j] = &(trajectories_1D[i * trajectory_size + j *  (model -> number_species)]);
+	trajectories[i][j] = &(trajectories_1D[i * trajectory_size + (size_t) j * (model -> number_species)]);
       }
     }    
   }
 
 
   Simulation :: ~Simulation(){
-    delete timeline;
-    delete trajectories_1D;
+    delete[] timeline;
+    if(trajectories == nullptr){
+      return;
+    }
+    if(owns_trajectories){
+      delete[] trajectories_1D;
+    }
     for(unsigned int i = 0; i < number_trajectories; i++){
-      delete trajectories[i];
+      delete[] trajectories[i];
+    }
+    delete[] trajectories;
+  }
+
+
+  void Simulation :: set_initial_states(const unsigned int* states, unsigned int number_states){
+    number_initial_states = number_states;
+    initial_states.assign(states, states + number_states * (model -> number_species));
+  }
+
+
+  void Simulation :: set_timeline(const double* times){
+    //Output times may be unevenly spaced, trajectories start from their initial state at the first one
+    std :: copy(times, times + number_timesteps, timeline);
+    end_time = timeline[number_timesteps - 1];
+  }
+
+
+  void Simulation :: enable_event_log(){
+    record_events = true;
+    event_times.assign(number_trajectories, std :: vector<double>());
+    event_reactions.assign(number_trajectories, std :: vector<unsigned int>());
+  }
+
+
+  unsigned int Simulation :: condition(unsigned int trajectory_number){
+    //Consecutive blocks of trajectories share an initial state
+    return (unsigned long long) trajectory_number * number_initial_states / number_trajectories;
+  }
+
+
+  unsigned int* Simulation :: initial_state(unsigned int trajectory_number){
+    return &(initial_states[condition(trajectory_number) * (model -> number_species)]);
+  }
+
+
+  IPropensityFunction* Simulation :: propensity_function_for(unsigned int trajectory_number){
+    if(swept_propensity_functions.empty()){
+      return propensity_function;
+    }
+    //Consecutive blocks of trajectories share a parameter set
+    return swept_propensity_functions[(unsigned long long) trajectory_number * swept_propensity_functions.size() / number_trajectories];
+  }
+
+
+  void simulate_trajectories(Simulation* simulation, void (*simulate_trajectory)(Simulation* simulation, unsigned int trajectory_number, unsigned int** trajectory)){
+    //Threads take the next unsimulated trajectory until none remain
+    std :: atomic<unsigned int> next_trajectory(0);
+    unsigned int number_threads = std :: max(1u, std :: min(simulation -> number_threads, simulation -> number_trajectories));
+    EnsembleSummary* summary = simulation -> summary;
+    //When summarizing, each thread simulates into one reused trajectory and keeps its own partial summary
+    std :: vector<EnsembleSummary> partial_summaries;
+    if(summary){
+      partial_summaries.assign(number_threads, EnsembleSummary(summary -> number_conditions, summary -> number_timesteps, summary -> number_species, summary -> number_bins, summary -> lower, summary -> upper));
+    }
+    auto worker = [&](unsigned int thread_number){
+      unsigned int number_species = simulation -> model -> number_species;
+      std :: vector<unsigned int> buffer(summary ? (size_t) simulation -> number_timesteps * number_species : 0);
+      std :: vector<unsigned int*> rows(summary ? simulation -> number_timesteps : 0);
+      for(unsigned int i = 0; i < rows.size(); i++){
+	rows[i] = &(buffer[(size_t) i * number_species]);
+      }
+      for(unsigned int trajectory_number = next_trajectory++; trajectory_number < simulation -> number_trajectories; trajectory_number = next_trajectory++){
+	if(summary){
+	  simulate_trajectory(simulation, trajectory_number, rows.data());
+	  //Consecutive blocks of trajectories are summarized separately
+	  partial_summaries[thread_number].add((unsigned long long) trajectory_number * summary -> number_conditions / simulation -> number_trajectories, rows.data());
+	}else{
+	  simulate_trajectory(simulation, trajectory_number, simulation -> trajectories[trajectory_number]);
+	}
+      }
+    };
+    std :: vector<std :: thread> threads;
+    for(unsigned int i = 1; i < number_threads; i++){
+      threads.emplace_back(worker, i);
+    }
+    worker(0);
+    for(std :: thread& thread : threads){
+      thread.join();
+    }
+    for(EnsembleSummary& partial_summary : partial_summaries){
+      summary -> merge(partial_summary);
+    }
+  }
+
+
+  EnsembleSummary :: EnsembleSummary(unsigned int number_conditions, unsigned int number_timesteps, unsigned int number_species, unsigned int number_bins, double lower, double upper) : number_conditions(number_conditions), number_timesteps(number_timesteps), number_species(number_species), number_bins(number_bins), lower(lower), upper(upper), counts(number_conditions, 0){
+    size_t size = (size_t) number_conditions * number_timesteps * number_species;
+    sums.assign(size, 0);
+    squares.assign(size, 0);
+    histograms.assign(size * number_bins, 0);
+  }
+
+
+  void EnsembleSummary :: add(unsigned int condition, unsigned int** trajectory){
+    counts[condition]++;
+    size_t offset = (size_t) condition * number_timesteps * number_species;
+    double bin_width = (upper - lower) / number_bins;
+    for(unsigned int i = 0; i < number_timesteps; i++){
+      for(unsigned int j = 0; j < number_species; j++){
+	size_t index = offset + (size_t) i * number_species + j;
+	unsigned long long population = trajectory[i][j];
+	sums[index] += population;
+	squares[index] += (unsigned __int128) (population * population);
+	if(number_bins > 0){
+	  double position = floor((population - lower) / bin_width);
+	  unsigned int bin = position < 0 ? 0 : (position >= number_bins ? number_bins - 1 : (unsigned int) position);
+	  histograms[index * number_bins + bin]++;
+	}
+      }
+    }
+  }
+
+
+  void EnsembleSummary :: merge(const EnsembleSummary& other){
+    for(unsigned int i = 0; i < number_conditions; i++){
+      counts[i] += other.counts[i];
+    }
+    for(size_t i = 0; i < sums.size(); i++){
+      sums[i] += other.sums[i];
+      squares[i] += other.squares[i];
+    }
+    for(size_t i = 0; i < histograms.size(); i++){
+      histograms[i] += other.histograms[i];
+    }
+  }
+
+
+  void EnsembleSummary :: moments(double* means, double* variances) const{
+    size_t condition_size = (size_t) number_timesteps * number_species;
+    for(size_t i = 0; i < sums.size(); i++){
+      unsigned __int128 count = counts[i / condition_size];
+      if(count == 0){
+	means[i] = NAN;
+	variances[i] = NAN;
+	continue;
+      }
+      means[i] = (double) sums[i] / count;
+      //n * sum(x^2) - sum(x)^2 is exact for populations below 2^32 and fewer than 2^32 trajectories
+      unsigned __int128 sum = sums[i];
+      variances[i] = (double) (count * squares[i] - sum * sum) / ((double) count * count);
     }
-    delete trajectories;
   }
 
   
@@ -84,22 +219,58 @@ namespace Gillespy{
     return os;
   }
 
-  void Simulation :: output_results_buffer(std :: ostream& os){
-    double temp;
-    unsigned char* temp_byte = reinterpret_cast<unsigned char*>(&temp);
-    for(unsigned int i = 0; i < number_timesteps; i++){
-      temp = timeline[i];
-      for(unsigned int byte_i = 0; byte_i < sizeof(double); byte_i++){
-	os << temp_byte[byte_i];
-      }
+  void Simulation :: output_results_buffer(std :: ostream& os, bool integer_output){
+    //Header: number of trajectories, timesteps, species, then the NumPy kind and byte size of population values
+    unsigned int header[] = {number_trajectories, number_timesteps, model -> number_species, (unsigned int) (integer_output ? 'u' : 'f'), (unsigned int) (integer_output ? sizeof(unsigned int) : sizeof(double))};
+    os.write(reinterpret_cast<const char*>(header), sizeof(header));
+    os.write(reinterpret_cast<const char*>(timeline), number_timesteps * sizeof(double));
+    //Trajectory-major block of populations
+    size_t trajectory_size = (size_t) number_timesteps * (model -> number_species);
+    if(integer_output){
+      //Populations are already stored trajectory-major, so write them in one call
+      os.write(reinterpret_cast<const char*>(trajectories_1D), number_trajectories * trajectory_size * sizeof(unsigned int));
+    }else{
+      std :: vector<double> buffer(trajectory_size);
       for(unsigned int trajectory = 0; trajectory < number_trajectories; trajectory++){
-	for(unsigned int j = 0; j < model -> number_species; j++){
-	  temp = trajectories[trajectory][i][j];
-	  for(unsigned int byte_i = 0; byte_i < sizeof(double); byte_i++){
-	    os << temp_byte[byte_i];
-	  }
+	unsigned int* populations = &(trajectories_1D[trajectory * trajectory_size]);
+	for(size_t i = 0; i < trajectory_size; i++){
+	  buffer[i] = populations[i];
 	}
+	os.write(reinterpret_cast<const char*>(buffer.data()), trajectory_size * sizeof(double));
       }
     }
+    os.flush();
+  }
+
+  void EnsembleSummary :: output_summary_buffer(std :: ostream& os, const double* timeline) const{
+    //Header: number of conditions, timesteps, species and histogram bins, then the timeline and the uint64 number of trajectories of each condition
+    unsigned int header[] = {number_conditions, number_timesteps, number_species, number_bins};
+    os.write(reinterpret_cast<const char*>(header), sizeof(header));
+    os.write(reinterpret_cast<const char*>(timeline), number_timesteps * sizeof(double));
+    os.write(reinterpret_cast<const char*>(counts.data()), number_conditions * sizeof(unsigned long long));
+    //Condition-major blocks of float64 means, then variances, then uint64 histogram counts
+    std :: vector<double> means(sums.size());
+    std :: vector<double> variances(sums.size());
+    moments(means.data(), variances.data());
+    os.write(reinterpret_cast<const char*>(means.data()), means.size() * sizeof(double));
+    os.write(reinterpret_cast<const char*>(variances.data()), variances.size() * sizeof(double));
+    os.write(reinterpret_cast<const char*>(histograms.data()), histograms.size() * sizeof(unsigned long long));
+    os.flush();
+  }
+
+  void Simulation :: output_events_buffer(std :: ostream& os){
+    //uint64 event count of each trajectory, then every trajectory's event times as float64, then their uint32 reaction numbers
+    std :: vector<unsigned long long> counts(number_trajectories);
+    for(unsigned int trajectory = 0; trajectory < number_trajectories; trajectory++){
+      counts[trajectory] = event_times[trajectory].size();
+    }
+    os.write(reinterpret_cast<const char*>(counts.data()), number_trajectories * sizeof(unsigned long long));
+    for(unsigned int trajectory = 0; trajectory < number_trajectories; trajectory++){
+      os.write(reinterpret_cast<const char*>(event_times[trajectory].data()), event_times[trajectory].size() * sizeof(double));
+    }
+    for(unsigned int trajectory = 0; trajectory < number_trajectories; trajectory++){
+      os.write(reinterpret_cast<const char*>(event_reactions[trajectory].data()), event_reactions[trajectory].size() * sizeof(unsigned int));
+    }
+    os.flush();
   }
 }
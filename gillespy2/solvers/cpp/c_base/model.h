@@ -3,6 +3,7 @@
 #include <memory>
 #include <string>
 #include <vector>
+#include <utility>
 #include <iostream>
 #include <math.h>
 
@@ -20,6 +21,7 @@ namespace Gillespy{
     std :: string name;
     std :: unique_ptr<int[]> species_change; //list of changes to species with this reaction firing
     std :: vector<unsigned int> affected_reactions; //list of which reactions have propensities that would change with this reaction firing 
+    std :: vector<std :: pair<unsigned int, unsigned int>> reactants; //species consumed by this reaction firing, with their stoichiometry
   };
   
   //Represents a model of reactions and species
@@ -29,32 +31,83 @@ namespace Gillespy{
     unsigned int number_reactions;
     std :: unique_ptr<Reaction[]> reactions;
     Model(std :: vector<std :: string> species_names, std :: vector<unsigned int> species_populations, std :: vector<std :: string> reaction_names);
-    void update_affected_reactions();
   };
   
   //Interface class to represent container for propensity functions
   class IPropensityFunction{
   public:
     virtual double evaluate(unsigned int reaction_number, unsigned int* state) = 0;
+    //Propensity for a continuous state, used by the ODE integrator
+    virtual double evaluate(unsigned int reaction_number, double* state) = 0;
     virtual ~IPropensityFunction() {}; 
   };
 
   
+  //Moments and histograms of populations across trajectories, accumulated as each trajectory finishes so memory does not grow with the number of trajectories
+  //Sums are kept as exact integers, so results do not depend on the order trajectories finish in
+  struct EnsembleSummary{
+    unsigned int number_conditions; //Initial states or parameter sets, each summarized separately
+    unsigned int number_timesteps;
+    unsigned int number_species;
+    unsigned int number_bins; //Zero for no histograms
+    double lower; //Range of the histograms' equal width bins, populations outside it are counted in the first or last bin
+    double upper;
+    std :: vector<unsigned long long> counts; //Trajectories summarized for each condition
+    std :: vector<unsigned long long> sums; //Condition x timestep x species
+    std :: vector<unsigned __int128> squares;
+    std :: vector<unsigned long long> histograms; //Condition x timestep x species x bin
+    EnsembleSummary(unsigned int number_conditions, unsigned int number_timesteps, unsigned int number_species, unsigned int number_bins = 0, double lower = 0, double upper = 0);
+    void add(unsigned int condition, unsigned int** trajectory);
+    void merge(const EnsembleSummary& other);
+    //Mean and variance (normalized by the number of trajectories) of each condition, timestep and species
+    void moments(double* means, double* variances) const;
+    void output_summary_buffer(std :: ostream& os, const double* timeline) const;
+  };
+
   //Represents simulation return data
   struct Simulation{
     Model* model;
     double* timeline;
     double end_time;
-    int random_seed;
+    unsigned int random_seed;
+    unsigned int first_trajectory; //Index of the first trajectory's random stream, for ensembles split between runs
     unsigned int number_timesteps;
     unsigned int number_trajectories;
+    unsigned int number_threads;
     unsigned int* trajectories_1D;
     unsigned int*** trajectories;
+    bool owns_trajectories; //False when trajectories_1D is a caller supplied buffer
+    EnsembleSummary* summary; //When set, trajectories are added to the summary instead of being stored
+    unsigned int number_initial_states;
+    std :: vector<unsigned int> initial_states; //Initial populations, trajectories are split evenly between states
     IPropensityFunction *propensity_function;
-    Simulation(Model* model, unsigned int number_trajectories, unsigned int number_timesteps, double end_time, IPropensityFunction* propensity_function, int random_seed);
+    std :: vector<IPropensityFunction*> swept_propensity_functions; //One per parameter set of a sweep, trajectories are split evenly between them
+    double tau_tolerance; //Relative change in propensities allowed during a tau-leaping step
+    bool record_events; //Log every reaction fired by the exact engines, in addition to the timeline
+    std :: vector<std :: vector<double>> event_times; //Per trajectory, so threads never share a log
+    std :: vector<std :: vector<unsigned int>> event_reactions;
+    Simulation(Model* model, unsigned int number_trajectories, unsigned int number_timesteps, double end_time, IPropensityFunction* propensity_function, unsigned int random_seed, unsigned int number_threads = 1, unsigned int* output_buffer = nullptr, EnsembleSummary* summary = nullptr);
     ~Simulation();
     friend std :: ostream& operator<<(std :: ostream& os, const Simulation& simulation);
-    void output_results_buffer(std :: ostream& os);
+    void output_results_buffer(std :: ostream& os, bool integer_output = false);
+    void set_initial_states(const unsigned int* states, unsigned int number_states);
+    void set_timeline(const double* times);
+    void enable_event_log();
+    void output_events_buffer(std :: ostream& os);
+    //Called by the engines as each reaction fires, events past the end of the timeline are not logged
+    void record_event(unsigned int trajectory_number, double time, unsigned int reaction_number){
+      if(record_events && time <= end_time){
+	event_times[trajectory_number].push_back(time);
+	event_reactions[trajectory_number].push_back(reaction_number);
+      }
+    }
+    unsigned int condition(unsigned int trajectory_number);
+    unsigned int* initial_state(unsigned int trajectory_number);
+    IPropensityFunction* propensity_function_for(unsigned int trajectory_number);
   };
+
+  //Simulates every trajectory of a simulation, distributing trajectories across the simulation's threads
+  //simulate_trajectory writes each trajectory's populations to the rows it is passed, one per timestep
+  void simulate_trajectories(Simulation* simulation, void (*simulate_trajectory)(Simulation* simulation, unsigned int trajectory_number, unsigned int** trajectory));
 }
 #endif
@@ -0,0 +1,159 @@
+#include "ssa.h"
+#include "rng.h"
+#include <cmath>//Included for natural logarithm
+#include <limits>//Included for infinity
+#include <string.h>//Included for memcpy only
+
+namespace Gillespy{
+  //Indexed binary min-heap of reaction firing times, supports O(log R) updates of any reaction
+  class ReactionQueue{
+  public:
+    ReactionQueue(unsigned int number_reactions) : times(number_reactions), heap(number_reactions), position(number_reactions){
+      for(unsigned int i = 0; i < number_reactions; i++){
+	heap[i] = i;
+	position[i] = i;
+      }
+    }
+
+    //Rebuild the heap after all times have been set
+    void build(){
+      for(unsigned int i = heap.size() / 2; i-- > 0;){
+	sift_down(i);
+      }
+    }
+
+    unsigned int top() const{
+      return heap[0];
+    }
+
+    void update(unsigned int reaction, double time){
+      double old_time = times[reaction];
+      times[reaction] = time;
+      if(time < old_time){
+	sift_up(position[reaction]);
+      }else{
+	sift_down(position[reaction]);
+      }
+    }
+
+    std :: vector<double> times;
+
+  private:
+    std :: vector<unsigned int> heap;
+    std :: vector<unsigned int> position;
+
+    void swap(unsigned int i, unsigned int j){
+      std :: swap(heap[i], heap[j]);
+      position[heap[i]] = i;
+      position[heap[j]] = j;
+    }
+
+    void sift_up(unsigned int i){
+      while(i > 0 && times[heap[(i - 1) / 2]] > times[heap[i]]){
+	swap(i, (i - 1) / 2);
+	i = (i - 1) / 2;
+      }
+    }
+
+    void sift_down(unsigned int i){
+      unsigned int size = heap.size();
+      while(true){
+	unsigned int smallest = i;
+	unsigned int left = 2 * i + 1;
+	unsigned int right = left + 1;
+	if(left < size && times[heap[left]] < times[heap[smallest]]){
+	  smallest = left;
+	}
+	if(right < size && times[heap[right]] < times[heap[smallest]]){
+	  smallest = right;
+	}
+	if(smallest == i){
+	  return;
+	}
+	swap(i, smallest);
+	i = smallest;
+      }
+    }
+  };
+
+  //Simulates a single trajectory with the Gibson-Bruck next reaction method
+  void ssa_next_reaction_trajectory(Simulation* simulation, unsigned int trajectory_number, unsigned int** trajectory){
+    //Stream keyed by (seed, trajectory) so each trajectory is reproducible regardless of thread count or how an ensemble is split between runs
+    Philox rng(simulation -> random_seed, simulation -> first_trajectory + trajectory_number);
+    IPropensityFunction* propensity_function = simulation -> propensity_function_for(trajectory_number);
+    //Exponential variate with unit rate, uniform drawn from (0, 1]
+    auto exponential = [&rng](){
+      return -log((rng() + 1.0) / (rng.max() + 1.0));
+    };
+    const double infinity = std :: numeric_limits<double> :: infinity();
+    Model& model = *(simulation -> model);
+    unsigned int state_size = sizeof(int) * model.number_species;
+    std :: vector<unsigned int> current_state(model.number_species);
+    std :: vector<double> propensity_values(model.number_reactions);
+
+    memcpy(trajectory[0], simulation -> initial_state(trajectory_number), state_size);
+    memcpy(current_state.data(), trajectory[0], state_size);
+    double current_time = simulation -> timeline[0];
+    unsigned int entry_count = 1;
+
+    //Schedule each reaction's first firing time
+    ReactionQueue queue(model.number_reactions);
+    for(unsigned int reaction_number = 0; reaction_number < model.number_reactions; reaction_number++){
+      propensity_values[reaction_number] = propensity_function -> evaluate(reaction_number, current_state.data());
+      queue.times[reaction_number] = propensity_values[reaction_number] > 0 ? current_time + exponential() / propensity_values[reaction_number] : infinity;
+    }
+    queue.build();
+
+    while(current_time < (simulation -> end_time)){
+      unsigned int fired_reaction = model.number_reactions > 0 ? queue.top() : 0;
+      double next_time = model.number_reactions > 0 ? queue.times[fired_reaction] : infinity;
+      //No more reactions
+      if(next_time == infinity){
+	for(unsigned int i = entry_count; i < simulation -> number_timesteps; i++){
+	  memcpy(trajectory[i], current_state.data(), state_size);
+	}
+	break;
+      }
+      current_time = next_time;
+      //Copy current state to passed timesteps
+      while(entry_count < simulation -> number_timesteps && (simulation -> timeline[entry_count]) <= current_time){
+	memcpy(trajectory[entry_count], current_state.data(), state_size);
+	entry_count++;
+      }
+      //Update current state
+      Reaction& reaction = model.reactions[fired_reaction];
+      simulation -> record_event(trajectory_number, current_time, fired_reaction);
+      for(unsigned int species_number = 0; species_number < model.number_species; species_number++){
+	current_state[species_number] += reaction.species_change[species_number];
+      }
+      //Rescale the firing times of dependent reactions, reusing their pending random numbers
+      for(unsigned int& affected_reaction : reaction.affected_reactions){
+	if(affected_reaction == fired_reaction){
+	  continue;
+	}
+	double old_propensity = propensity_values[affected_reaction];
+	double new_propensity = propensity_function -> evaluate(affected_reaction, current_state.data());
+	propensity_values[affected_reaction] = new_propensity;
+	double new_time = infinity;
+	if(new_propensity > 0){
+	  double old_time = queue.times[affected_reaction];
+	  if(old_propensity > 0 && old_time != infinity){
+	    new_time = current_time + (old_propensity / new_propensity) * (old_time - current_time);
+	  }else{
+	    new_time = current_time + exponential() / new_propensity;
+	  }
+	}
+	queue.update(affected_reaction, new_time);
+      }
+      //The fired reaction always draws a new firing time
+      propensity_values[fired_reaction] = propensity_function -> evaluate(fired_reaction, current_state.data());
+      queue.update(fired_reaction, propensity_values[fired_reaction] > 0 ? current_time + exponential() / propensity_values[fired_reaction] : infinity);
+    }
+  }//end ssa_next_reaction_trajectory
+
+  void ssa_next_reaction(Simulation* simulation){
+    if(simulation){
+      simulate_trajectories(simulation, ssa_next_reaction_trajectory);
+    }
+  }
+}//end namespace
@@ -0,0 +1,214 @@
+#include "ode.h"
+#include <cmath>//Included for sqrt, pow and fabs
+#include <limits>//Included for machine epsilon
+#include <algorithm>//Included for min and max
+
+namespace Gillespy{
+  //Right hand side of the reaction rate equations, each reaction changes species at the rate of its propensity
+  class RateEquations{
+  public:
+    RateEquations(Model* model, IPropensityFunction* propensity_function) : model(model), propensity_function(propensity_function), changes(model -> number_reactions){
+      for(unsigned int reaction_number = 0; reaction_number < model -> number_reactions; reaction_number++){
+	for(unsigned int species_number = 0; species_number < model -> number_species; species_number++){
+	  int change = model -> reactions[reaction_number].species_change[species_number];
+	  if(change != 0){
+	    changes[reaction_number].emplace_back(species_number, change);
+	  }
+	}
+      }
+    }
+
+    void evaluate(std :: vector<double>& state, std :: vector<double>& derivative){
+      std :: fill(derivative.begin(), derivative.end(), 0);
+      for(unsigned int reaction_number = 0; reaction_number < model -> number_reactions; reaction_number++){
+	double propensity = propensity_function -> evaluate(reaction_number, state.data());
+	for(auto& change : changes[reaction_number]){
+	  derivative[change.first] += change.second * propensity;
+	}
+      }
+    }
+
+    //Forward difference Jacobian, stored row-major
+    void jacobian(std :: vector<double>& state, std :: vector<double>& derivative, std :: vector<double>& jacobian_values){
+      unsigned int size = state.size();
+      std :: vector<double> shifted_derivative(size);
+      const double root_epsilon = sqrt(std :: numeric_limits<double> :: epsilon());
+      for(unsigned int j = 0; j < size; j++){
+	double original = state[j];
+	double delta = root_epsilon * std :: max(fabs(original), 1.0);
+	state[j] = original + delta;
+	evaluate(state, shifted_derivative);
+	state[j] = original;
+	for(unsigned int i = 0; i < size; i++){
+	  jacobian_values[i * size + j] = (shifted_derivative[i] - derivative[i]) / delta;
+	}
+      }
+    }
+
+  private:
+    Model* model;
+    IPropensityFunction* propensity_function;
+    std :: vector<std :: vector<std :: pair<unsigned int, int>>> changes;
+  };
+
+  //Dense LU factorization with partial pivoting, for solving with the Rosenbrock iteration matrix
+  class LUSolver{
+  public:
+    LUSolver(unsigned int size) : size(size), matrix(size * size), pivots(size){
+    }
+
+    //Factor I - scale * J in place
+    void factor(const std :: vector<double>& jacobian_values, double scale){
+      for(unsigned int i = 0; i < size * size; i++){
+	matrix[i] = -scale * jacobian_values[i];
+      }
+      for(unsigned int i = 0; i < size; i++){
+	matrix[i * size + i] += 1;
+      }
+      for(unsigned int k = 0; k < size; k++){
+	unsigned int pivot = k;
+	for(unsigned int i = k + 1; i < size; i++){
+	  if(fabs(matrix[i * size + k]) > fabs(matrix[pivot * size + k])){
+	    pivot = i;
+	  }
+	}
+	pivots[k] = pivot;
+	if(pivot != k){
+	  for(unsigned int j = 0; j < size; j++){
+	    std :: swap(matrix[k * size + j], matrix[pivot * size + j]);
+	  }
+	}
+	if(matrix[k * size + k] == 0){
+	  continue;
+	}
+	for(unsigned int i = k + 1; i < size; i++){
+	  double factor = matrix[i * size + k] / matrix[k * size + k];
+	  matrix[i * size + k] = factor;
+	  for(unsigned int j = k + 1; j < size; j++){
+	    matrix[i * size + j] -= factor * matrix[k * size + j];
+	  }
+	}
+      }
+    }
+
+    //Overwrite x with the solution of the factored system for right hand side x
+    void solve(std :: vector<double>& x){
+      for(unsigned int k = 0; k < size; k++){
+	std :: swap(x[k], x[pivots[k]]);
+	for(unsigned int i = k + 1; i < size; i++){
+	  x[i] -= matrix[i * size + k] * x[k];
+	}
+      }
+      for(unsigned int k = size; k-- > 0;){
+	for(unsigned int j = k + 1; j < size; j++){
+	  x[k] -= matrix[k * size + j] * x[j];
+	}
+	x[k] /= matrix[k * size + k];
+      }
+    }
+
+  private:
+    unsigned int size;
+    std :: vector<double> matrix;
+    std :: vector<unsigned int> pivots;
+  };
+
+  //Shampine and Reichelt's L-stable Rosenbrock 2(3) pair (MATLAB ode23s), with the error of the second order solution controlling the step size
+  bool ode_solve(Model* model, IPropensityFunction* propensity_function, const double* timeline, unsigned int number_timesteps, const unsigned int* initial_state, double relative_tolerance, double absolute_tolerance, double* output){
+    const double d = 1 / (2 + sqrt(2.0));
+    const double e32 = 6 + sqrt(2.0);
+    unsigned int size = model -> number_species;
+    RateEquations rate_equations(model, propensity_function);
+    LUSolver lu_solver(size);
+    std :: vector<double> state(initial_state, initial_state + size);
+    std :: vector<double> next_state(size), stage(size);
+    std :: vector<double> f0(size), f1(size), f2(size), k1(size), k2(size), k3(size);
+    std :: vector<double> jacobian_values(size * size);
+
+    double current_time = timeline[0];
+    for(unsigned int i = 0; i < size; i++){
+      output[i] = state[i];
+    }
+    if(number_timesteps < 2 || size == 0){
+      for(unsigned int i = 1; i < number_timesteps; i++){
+	std :: copy(state.begin(), state.end(), output + i * size);
+      }
+      return true;
+    }
+    rate_equations.evaluate(state, f0);
+    rate_equations.jacobian(state, f0, jacobian_values);
+    //Initial step from the fastest relative rate of change
+    double end_time = timeline[number_timesteps - 1];
+    double rate = 0;
+    for(unsigned int i = 0; i < size; i++){
+      rate = std :: max(rate, fabs(f0[i]) / (absolute_tolerance + relative_tolerance * fabs(state[i])));
+    }
+    double step = rate > 0 ? 0.8 * pow(relative_tolerance, 1.0 / 3) / rate : end_time - current_time;
+    bool refactor = true;
+    double factored_step = 0;
+
+    for(unsigned int entry = 1; entry < number_timesteps; entry++){
+      double next_output = timeline[entry];
+      while(current_time < next_output){
+	//Land exactly on output times
+	double h = std :: min(step, next_output - current_time);
+	if(h <= 16 * std :: numeric_limits<double> :: epsilon() * fabs(current_time)){
+	  //Step size underflow, the tolerances cannot be met
+	  return false;
+	}
+	if(refactor || h != factored_step){
+	  lu_solver.factor(jacobian_values, h * d);
+	  factored_step = h;
+	  refactor = false;
+	}
+	k1 = f0;
+	lu_solver.solve(k1);
+	for(unsigned int i = 0; i < size; i++){
+	  stage[i] = state[i] + 0.5 * h * k1[i];
+	}
+	rate_equations.evaluate(stage, f1);
+	for(unsigned int i = 0; i < size; i++){
+	  k2[i] = f1[i] - k1[i];
+	}
+	lu_solver.solve(k2);
+	for(unsigned int i = 0; i < size; i++){
+	  k2[i] += k1[i];
+	  next_state[i] = state[i] + h * k2[i];
+	}
+	rate_equations.evaluate(next_state, f2);
+	for(unsigned int i = 0; i < size; i++){
+	  k3[i] = f2[i] - e32 * (k2[i] - f1[i]) - 2 * (k1[i] - f0[i]);
+	}
+	lu_solver.solve(k3);
+	double error_norm = 0;
+	for(unsigned int i = 0; i < size; i++){
+	  double scale = absolute_tolerance + relative_tolerance * std :: max(fabs(state[i]), fabs(next_state[i]));
+	  error_norm = std :: max(error_norm, fabs(h / 6 * (k1[i] - 2 * k2[i] + k3[i])) / scale);
+	}
+	double factor = error_norm > 0 ? 0.8 * pow(error_norm, -1.0 / 3) : 5;
+	if(error_norm <= 1){
+	  current_time = (h == next_output - current_time) ? next_output : current_time + h;
+	  state.swap(next_state);
+	  f0.swap(f2);
+	  rate_equations.jacobian(state, f0, jacobian_values);
+	  refactor = true;
+	  //Steps shortened to land on an output time do not limit the next step
+	  double proposed = h * std :: min(5.0, std :: max(0.2, factor));
+	  step = h < step ? std :: max(step, proposed) : proposed;
+	}else{
+	  step = h * std :: max(0.2, factor);
+	}
+      }
+      std :: copy(state.begin(), state.end(), output + entry * size);
+    }
+    return true;
+  }
+
+  void output_ode_results(std :: ostream& os, unsigned int number_trajectories, unsigned int number_timesteps, unsigned int number_species, const double* timeline, const double* trajectories){
+    unsigned int header[] = {number_trajectories, number_timesteps, number_species, (unsigned int) 'f', (unsigned int) sizeof(double)};
+    os.write(reinterpret_cast<const char*>(header), sizeof(header));
+    os.write(reinterpret_cast<const char*>(timeline), number_timesteps * sizeof(double));
+    os.write(reinterpret_cast<const char*>(trajectories), (size_t) number_trajectories * number_timesteps * number_species * sizeof(double));
+    os.flush();
+  }
+}//end namespace
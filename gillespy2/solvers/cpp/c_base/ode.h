@@ -0,0 +1,12 @@
+#ifndef GILLESPY_ODE
+#define GILLESPY_ODE
+#include "model.h"
+
+namespace Gillespy{
+  //Integrates the deterministic reaction rate equations from an initial state, writing the state at each time of the timeline (number_timesteps x number_species) to output
+  //Returns false if the step size underflows before the end of the timeline, leaving the remaining output unwritten
+  bool ode_solve(Model* model, IPropensityFunction* propensity_function, const double* timeline, unsigned int number_timesteps, const unsigned int* initial_state, double relative_tolerance, double absolute_tolerance, double* output);
+  //Writes ODE results in the binary layout of Simulation :: output_results_buffer, with float64 populations
+  void output_ode_results(std :: ostream& os, unsigned int number_trajectories, unsigned int number_timesteps, unsigned int number_species, const double* timeline, const double* trajectories);
+}
+#endif
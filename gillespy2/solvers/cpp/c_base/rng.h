@@ -0,0 +1,68 @@
+#ifndef GILLESPY_RNG
+#define GILLESPY_RNG
+#include <cstdint>//Included for fixed width integers
+#include <limits>//Included for the largest output value
+
+namespace Gillespy{
+  //Philox4x32-10 counter-based random number generator (Salmon et al. 2011)
+  //Output block n is a keyed bijection of the counter n, so each (seed, stream) key is an independent stream with no state to seed or warm up
+  class Philox{
+  public:
+    typedef uint64_t result_type;
+
+    Philox(uint32_t seed, uint32_t stream) : key{seed, stream}, counter{0, 0, 0, 0}, position(4){
+    }
+
+    static constexpr result_type min(){
+      return 0;
+    }
+
+    static constexpr result_type max(){
+      return std :: numeric_limits<result_type> :: max();
+    }
+
+    //Each block of four 32 bit words yields two outputs
+    result_type operator()(){
+      if(position == 4){
+	generate();
+	position = 0;
+      }
+      result_type value = ((result_type) block[position] << 32) | block[position + 1];
+      position += 2;
+      return value;
+    }
+
+  private:
+    //Encrypt the counter into the next block, then advance the 128 bit counter
+    void generate(){
+      uint32_t x[4] = {counter[0], counter[1], counter[2], counter[3]};
+      uint32_t k0 = key[0];
+      uint32_t k1 = key[1];
+      for(unsigned int round = 0; round < 10; round++){
+	uint64_t product0 = (uint64_t) 0xD2511F53 * x[0];
+	uint64_t product1 = (uint64_t) 0xCD9E8D57 * x[2];
+	x[0] = (uint32_t) (product1 >> 32) ^ x[1] ^ k0;
+	x[1] = (uint32_t) product1;
+	x[2] = (uint32_t) (product0 >> 32) ^ x[3] ^ k1;
+	x[3] = (uint32_t) product0;
+	k0 += 0x9E3779B9;
+	k1 += 0xBB67AE85;
+      }
+      for(unsigned int i = 0; i < 4; i++){
+	block[i] = x[i];
+      }
+      //Carry into the next word when a word wraps around
+      for(unsigned int i = 0; i < 4; i++){
+	if(++counter[i] != 0){
+	  break;
+	}
+      }
+    }
+
+    uint32_t block[4];
+    uint32_t key[2];
+    uint32_t counter[4];
+    unsigned int position;
+  };
+}
+#endif
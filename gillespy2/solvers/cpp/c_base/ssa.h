@@ -1,5 +1,11 @@
 #include "model.h"
+#include <string>
 
 namespace Gillespy{
   void ssa_direct(Simulation* simulation);
+  void ssa_next_reaction(Simulation* simulation);
+  void ssa_composition_rejection(Simulation* simulation);
+  void tau_leaping(Simulation* simulation);
+  //Runs the named algorithm ("direct", "nrm", "cr" or "tau"), returns false if the name is not recognized
+  bool simulate(Simulation* simulation, const std :: string& algorithm);
 }
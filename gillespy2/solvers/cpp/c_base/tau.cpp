@@ -0,0 +1,240 @@
+#include "ssa.h"
+#include "rng.h"
+#include <random>//Included for poisson distribution
+#include <cmath>//Included for natural logarithm
+#include <limits>//Included for infinity
+#include <algorithm>//Included for min and max
+#include <string.h>//Included for memcpy only
+
+namespace Gillespy{
+  //A reaction is critical if fewer than this many firings would exhaust one of its reactants
+  static const unsigned int critical_firings = 10;
+  //Leaps shorter than this many expected waiting times are replaced by an exact SSA step
+  static const double ssa_threshold = 10;
+
+  //Highest order reaction each species is a reactant in, used to bound the relative change of its propensities
+  struct SpeciesOrder{
+    unsigned int order = 0;
+    unsigned int stoichiometry = 0;
+  };
+
+  //Cao, Gillespie and Petzold (2006) eq. 27, relative error allowance divisor g_i of a species with population x
+  static double relative_error_divisor(const SpeciesOrder& highest, unsigned int x){
+    double x_1 = x > 1 ? 1.0 / (x - 1) : 0;
+    double x_2 = x > 2 ? 2.0 / (x - 2) : 0;
+    switch(highest.order){
+    case 0:
+    case 1:
+      return 1;
+    case 2:
+      return highest.stoichiometry >= 2 ? 2 + x_1 : 2;
+    default:
+      if(highest.stoichiometry >= 3){
+	return 3 + x_1 + x_2;
+      }
+      return highest.stoichiometry == 2 ? 1.5 * (2 + x_1) : 3;
+    }
+  }
+
+  //Simulates a single trajectory with Cao-Gillespie-Petzold tau-leaping, falling back to exact steps when leaps are too short
+  void tau_leaping_trajectory(Simulation* simulation, unsigned int trajectory_number, unsigned int** trajectory){
+    //Stream keyed by (seed, trajectory) so each trajectory is reproducible regardless of thread count or how an ensemble is split between runs
+    Philox rng(simulation -> random_seed, simulation -> first_trajectory + trajectory_number);
+    IPropensityFunction* propensity_function = simulation -> propensity_function_for(trajectory_number);
+    //Uniform drawn from (0, 1]
+    auto uniform = [&rng](){
+      return (rng() + 1.0) / (rng.max() + 1.0);
+    };
+    const double infinity = std :: numeric_limits<double> :: infinity();
+    Model& model = *(simulation -> model);
+    unsigned int state_size = sizeof(int) * model.number_species;
+    std :: vector<unsigned int> current_state(model.number_species);
+    std :: vector<double> propensity_values(model.number_reactions);
+    std :: vector<bool> critical(model.number_reactions);
+    std :: vector<unsigned int> firings(model.number_reactions);
+    std :: vector<long long> next_state(model.number_species);
+    std :: vector<double> mean(model.number_species);
+    std :: vector<double> variance(model.number_species);
+
+    //Sparse net changes, and the highest order reaction each species is consumed by
+    std :: vector<std :: vector<std :: pair<unsigned int, int>>> changes(model.number_reactions);
+    std :: vector<SpeciesOrder> highest_order(model.number_species);
+    std :: vector<bool> is_reactant(model.number_species, false);
+    for(unsigned int reaction_number = 0; reaction_number < model.number_reactions; reaction_number++){
+      Reaction& reaction = model.reactions[reaction_number];
+      for(unsigned int species_number = 0; species_number < model.number_species; species_number++){
+	if(reaction.species_change[species_number] != 0){
+	  changes[reaction_number].emplace_back(species_number, reaction.species_change[species_number]);
+	}
+      }
+      unsigned int order = 0;
+      for(auto& reactant : reaction.reactants){
+	order += reactant.second;
+      }
+      for(auto& reactant : reaction.reactants){
+	SpeciesOrder& highest = highest_order[reactant.first];
+	is_reactant[reactant.first] = true;
+	if(order > highest.order || (order == highest.order && reactant.second > highest.stoichiometry)){
+	  highest.order = order;
+	  highest.stoichiometry = reactant.second;
+	}
+      }
+    }
+
+    memcpy(trajectory[0], simulation -> initial_state(trajectory_number), state_size);
+    memcpy(current_state.data(), trajectory[0], state_size);
+    double current_time = simulation -> timeline[0];
+    unsigned int entry_count = 1;
+
+    while(entry_count < simulation -> number_timesteps){
+      double next_output = simulation -> timeline[entry_count];
+      //Evaluate propensities and classify reactions which are close to exhausting a reactant as critical
+      double propensity_sum = 0;
+      double critical_sum = 0;
+      for(unsigned int reaction_number = 0; reaction_number < model.number_reactions; reaction_number++){
+	double propensity = propensity_function -> evaluate(reaction_number, current_state.data());
+	propensity_values[reaction_number] = propensity;
+	propensity_sum += propensity;
+	critical[reaction_number] = false;
+	if(propensity > 0){
+	  for(auto& reactant : model.reactions[reaction_number].reactants){
+	    if(current_state[reactant.first] / reactant.second < critical_firings){
+	      critical[reaction_number] = true;
+	      critical_sum += propensity;
+	      break;
+	    }
+	  }
+	}
+      }
+      //No more reactions
+      if(propensity_sum <= 0){
+	for(unsigned int i = entry_count; i < simulation -> number_timesteps; i++){
+	  memcpy(trajectory[i], current_state.data(), state_size);
+	}
+	break;
+      }
+
+      //Largest leap bounding the relative change of every noncritical propensity, Cao, Gillespie and Petzold (2006) eq. 33
+      std :: fill(mean.begin(), mean.end(), 0);
+      std :: fill(variance.begin(), variance.end(), 0);
+      for(unsigned int reaction_number = 0; reaction_number < model.number_reactions; reaction_number++){
+	if(critical[reaction_number] || propensity_values[reaction_number] <= 0){
+	  continue;
+	}
+	for(auto& change : changes[reaction_number]){
+	  mean[change.first] += change.second * propensity_values[reaction_number];
+	  variance[change.first] += change.second * change.second * propensity_values[reaction_number];
+	}
+      }
+      double noncritical_tau = infinity;
+      for(unsigned int species_number = 0; species_number < model.number_species; species_number++){
+	if(!is_reactant[species_number]){
+	  continue;
+	}
+	double bound = std :: max(simulation -> tau_tolerance * current_state[species_number] / relative_error_divisor(highest_order[species_number], current_state[species_number]), 1.0);
+	if(mean[species_number] != 0){
+	  noncritical_tau = std :: min(noncritical_tau, bound / fabs(mean[species_number]));
+	}
+	if(variance[species_number] > 0){
+	  noncritical_tau = std :: min(noncritical_tau, bound * bound / variance[species_number]);
+	}
+      }
+
+      //Leaping would not gain much over exact simulation, take a single SSA step
+      if(noncritical_tau < ssa_threshold / propensity_sum){
+	current_time += -log(uniform()) / propensity_sum;
+	while(entry_count < simulation -> number_timesteps && (simulation -> timeline[entry_count]) <= current_time){
+	  memcpy(trajectory[entry_count], current_state.data(), state_size);
+	  entry_count++;
+	}
+	if(entry_count >= simulation -> number_timesteps){
+	  break;
+	}
+	double cumulative_sum = uniform() * propensity_sum;
+	for(unsigned int reaction_number = 0; reaction_number < model.number_reactions; reaction_number++){
+	  cumulative_sum -= propensity_values[reaction_number];
+	  if(cumulative_sum <= 0 && propensity_values[reaction_number] > 0){
+	    for(auto& change : changes[reaction_number]){
+	      current_state[change.first] += change.second;
+	    }
+	    break;
+	  }
+	}
+	continue;
+      }
+
+      //Leap, halving the noncritical step whenever a population would become negative
+      double critical_tau = critical_sum > 0 ? -log(uniform()) / critical_sum : infinity;
+      while(true){
+	double tau = std :: min(noncritical_tau, critical_tau);
+	bool fire_critical = critical_tau <= noncritical_tau;
+	//Do not leap past the next output time
+	if(current_time + tau >= next_output){
+	  tau = next_output - current_time;
+	  fire_critical = false;
+	}
+	for(unsigned int reaction_number = 0; reaction_number < model.number_reactions; reaction_number++){
+	  firings[reaction_number] = 0;
+	  if(!critical[reaction_number] && propensity_values[reaction_number] > 0){
+	    std :: poisson_distribution<unsigned int> poisson(propensity_values[reaction_number] * tau);
+	    firings[reaction_number] = poisson(rng);
+	  }
+	}
+	//Exactly one critical reaction fires during the leap, chosen by propensity
+	if(fire_critical){
+	  double cumulative_sum = uniform() * critical_sum;
+	  for(unsigned int reaction_number = 0; reaction_number < model.number_reactions; reaction_number++){
+	    if(critical[reaction_number] && propensity_values[reaction_number] > 0){
+	      cumulative_sum -= propensity_values[reaction_number];
+	      if(cumulative_sum <= 0){
+		firings[reaction_number] = 1;
+		break;
+	      }
+	    }
+	  }
+	}
+	for(unsigned int species_number = 0; species_number < model.number_species; species_number++){
+	  next_state[species_number] = current_state[species_number];
+	}
+	for(unsigned int reaction_number = 0; reaction_number < model.number_reactions; reaction_number++){
+	  if(firings[reaction_number] > 0){
+	    for(auto& change : changes[reaction_number]){
+	      next_state[change.first] += (long long) change.second * firings[reaction_number];
+	    }
+	  }
+	}
+	bool negative = false;
+	for(unsigned int species_number = 0; species_number < model.number_species; species_number++){
+	  if(next_state[species_number] < 0){
+	    negative = true;
+	    break;
+	  }
+	}
+	if(negative){
+	  noncritical_tau = std :: min(noncritical_tau, tau) / 2;
+	  continue;
+	}
+	for(unsigned int species_number = 0; species_number < model.number_species; species_number++){
+	  current_state[species_number] = next_state[species_number];
+	}
+	if(current_time + tau >= next_output){
+	  current_time = next_output;
+	}else{
+	  current_time += tau;
+	}
+	break;
+      }
+      //Copy current state to reached timesteps
+      while(entry_count < simulation -> number_timesteps && (simulation -> timeline[entry_count]) <= current_time){
+	memcpy(trajectory[entry_count], current_state.data(), state_size);
+	entry_count++;
+      }
+    }
+  }//end tau_leaping_trajectory
+
+  void tau_leaping(Simulation* simulation){
+    if(simulation){
+      simulate_trajectories(simulation, tau_leaping_trajectory);
+    }
+  }
+}//end namespace
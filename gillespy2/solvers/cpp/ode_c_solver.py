@@ -0,0 +1,131 @@
+from gillespy2.core import gillespyError
+from gillespy2.solvers.cpp.ssa_c_solver import SSACSolver, format_output
+from gillespy2.solvers.utilities import validate_timeline
+import os
+import ctypes
+import numpy as np
+
+# Options of SSACSolver.run which only apply to stochastic simulation, rejected rather than ignored.
+STOCHASTIC_OPTIONS = ('num_threads', 'integer_output', 'algorithm', 'tau_tol', 'record', 'first_trajectory', 'output',
+                      'histogram_bins', 'histogram_range')
+
+
+class ODECSolver(SSACSolver):
+    name = "ODECSolver"
+    """
+    Compiles a model into a C++ integrator of its deterministic reaction rate equations, which is reused across
+    runs. The right hand side is generated from the same propensity code as SSACSolver and integrated with an
+    adaptive, L-stable Rosenbrock method (the 2(3) pair of MATLAB's ode23s) using a finite difference Jacobian,
+    so stiff models do not force tiny steps. Results have the layout of BasicODESolver.
+
+    Accepts the same arguments as SSACSolver.
+    """
+
+    def load_library(self):
+        super(ODECSolver, self).load_library()
+        self.library.run_ode.restype = ctypes.c_int
+        self.library.run_ode.argtypes = [ctypes.c_uint, ctypes.c_double, ctypes.c_double, ctypes.c_double,
+                                         np.ctypeslib.ndpointer(np.float64, flags='C_CONTIGUOUS'),
+                                         np.ctypeslib.ndpointer(np.uint32, flags='C_CONTIGUOUS'), ctypes.c_uint,
+                                         ctypes.c_int, np.ctypeslib.ndpointer(np.float64, flags='C_CONTIGUOUS'),
+                                         np.ctypeslib.ndpointer(np.float64, flags='C_CONTIGUOUS')]
+
+    def run_library(self, number_timesteps, t, parameters, initial_states, rtol, atol, output_times=None):
+        # The library writes directly into these buffers, and reads custom output times from the timeline.
+        timeline = np.empty(number_timesteps, dtype=np.float64) if output_times is None else output_times.copy()
+        trajectories = np.empty((initial_states.shape[0], number_timesteps, len(self.species)), dtype=np.float64)
+        status = self.library.run_ode(number_timesteps, t, rtol, atol, self.get_parameter_values(parameters),
+                                      initial_states, initial_states.shape[0], output_times is not None, timeline,
+                                      trajectories)
+        if status == 2:
+            raise gillespyError.ExecutionError("Step size underflow while integrating, the tolerances cannot be met.")
+        if status != 0:
+            raise gillespyError.ExecutionError("Error encountered while running simulation library:\nReturn code: {0}.\n".format(status))
+        return timeline, trajectories
+
+    def integrate(self, number_timesteps, t, parameters, initial_state, initial_states, rtol, atol, output_times=None):
+        """
+        Integrate once from each initial state, through the shared library, a worker or the executable.
+        :return: the timeline, and an (initial states x timesteps x species) array of populations.
+        """
+        if self.shared_library:
+            return self.run_library(number_timesteps, t, parameters, initial_states, rtol, atol, output_times)
+        if self.persistent_workers > 0:
+            # Integration draws no random numbers, so any seed will do.
+            return self.run_worker(initial_states.shape[0], number_timesteps, t, 0, 1, False, parameters,
+                                   initial_states, 'ode', rtol=rtol, atol=atol, output_times=output_times)
+        args = [os.path.join(self.output_directory, self.target), '-algorithm', 'ode',
+                '-trajectories', str(initial_states.shape[0]), '-timesteps', str(number_timesteps),
+                '-end', str(t), '-rtol', repr(float(rtol)), '-atol', repr(float(atol))]
+        input_data = self.get_runtime_input(args, parameters, initial_state, initial_states, output_times)
+        return self.run_executable(args, input_data)
+
+    def run(self=None, model=None, t=20, number_of_trajectories=1,
+            increment=0.05, seed=None, debug=False, profile=False, show_labels=True, parameters=None,
+            initial_state=None, rtol=1e-6, atol=1e-9, timeline=None, **kwargs):
+        """
+        Integrate the compiled model. Accepts the arguments of SSACSolver.run which apply to a deterministic
+        solution (parameters, initial_state and timeline), and raises SolverError for the stochastic options of
+        STOCHASTIC_OPTIONS. Also accepts:
+        :param rtol: Relative error tolerance of the integrator.
+        :param atol: Absolute error tolerance of the integrator, in molecules.
+        The solution is computed once per initial state, and repeated for each of number_of_trajectories.
+        """
+        unsupported = [option for option in STOCHASTIC_OPTIONS if option in kwargs]
+        if unsupported:
+            raise gillespyError.SolverError("{0} does not support the options: {1}.".format(ODECSolver.name, ', '.join(unsupported)))
+        if self is None:
+            self = ODECSolver(model)
+        self.wait()
+        if self.compiled:
+            self.simulation_data = None
+            output_times = None
+            if timeline is not None:
+                output_times = validate_timeline(timeline)
+                t = output_times[-1]
+            number_timesteps = int(t//increment + 1) if output_times is None else output_times.size
+            initial_states = self.get_initial_states(initial_state)
+            timeline, trajectories = self.integrate(number_timesteps, t, parameters, initial_state, initial_states,
+                                                    rtol, atol, output_times)
+            self.timeline = timeline
+            # Deterministic, so every trajectory from an initial state is the same solution.
+            trajectories = np.repeat(trajectories, number_of_trajectories, axis=0)
+            self.simulation_data = self.format_results(timeline, trajectories, initial_state, number_of_trajectories, show_labels)
+        return self.simulation_data
+
+    def sweep(self, parameter_table, number_of_trajectories=1, t=20, increment=0.05, initial_state=None,
+              timeline=None, rtol=1e-6, atol=1e-9):
+        """
+        Integrate the compiled model at every point of a table of parameter sets, once per point.
+        :param parameter_table: Parameter sets as in SSACSolver.sweep.
+        :param initial_state: Initial populations as in run, shared by every point, or a 2-D array with one row
+        per point.
+        Other arguments are those of run.
+        :return: a (points x trajectories x timesteps x species + 1) array in the layout of SSACSolver.sweep, with
+        the solution repeated for each of number_of_trajectories.
+        """
+        self.wait()
+        if not self.compiled:
+            return None
+        parameter_values = self.get_parameter_table(parameter_table)
+        number_points = parameter_values.shape[0]
+        output_times = None
+        if timeline is not None:
+            output_times = validate_timeline(timeline)
+            t = output_times[-1]
+        number_timesteps = int(t//increment + 1) if output_times is None else output_times.size
+        initial_states = self.get_initial_states(initial_state)
+        if initial_states.shape[0] not in (1, number_points):
+            raise gillespyError.SimulationError("Expected one initial state, or one for each of the {0} points.".format(number_points))
+        # The integrator takes a single parameter set, so each point is its own call.
+        trajectories = []
+        for point in range(number_points):
+            point_state = initial_states[point:point + 1] if initial_states.shape[0] > 1 else initial_states
+            timeline, point_trajectories = self.integrate(number_timesteps, t, parameter_values[point], initial_state,
+                                                          point_state, rtol, atol, output_times)
+            trajectories.append(point_trajectories)
+        self.timeline = timeline
+        trajectories = format_output(timeline, np.repeat(np.concatenate(trajectories), number_of_trajectories, axis=0),
+                                     self.species, False)
+        self.simulation_data = trajectories.reshape((number_points, number_of_trajectories) + trajectories.shape[1:])
+        return self.simulation_data
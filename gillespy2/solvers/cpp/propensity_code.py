@@ -0,0 +1,208 @@
+"""Simplification of the propensity functions written into the C++ solvers' generated simulation code."""
+
+import ast
+
+# <cmath> functions whose result only depends on their arguments, so repeated calls may share one evaluation.
+PURE_FUNCTIONS = {'exp', 'log', 'log10', 'log2', 'sqrt', 'cbrt', 'pow', 'fabs', 'floor', 'ceil',
+                  'sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'sinh', 'cosh', 'tanh'}
+BINARY_OPERATORS = {ast.Add: ('+', 1), ast.Sub: ('-', 1), ast.Mult: ('*', 2), ast.Div: ('/', 2)}
+UNARY_OPERATORS = {ast.USub: '-', ast.UAdd: '+'}
+UNARY_PRECEDENCE = 3
+ATOM_PRECEDENCE = 4
+
+
+class Term:
+    """
+    A node of a propensity's expression tree.
+
+    Attributes
+    ----------
+    kind : str
+        'number', 'parameter', 'species', 'name', 'constant', 'call', 'unary' or 'binary'.
+    value : str
+        Literal text, name or operator of the node.
+    operands : list
+        Child terms, in evaluation order.
+    species : bool
+        Whether the term reads a species population.
+    parameter : bool
+        Whether the term reads a parameter.
+    foldable : bool
+        Whether the term only depends on parameters and literals.
+    pure : bool
+        Whether the term has no calls to functions outside PURE_FUNCTIONS.
+    """
+    def __init__(self, kind, value, operands=()):
+        self.kind = kind
+        self.value = value
+        self.operands = list(operands)
+        self.species = kind == 'species' or any(operand.species for operand in operands)
+        self.parameter = kind == 'parameter' or any(operand.parameter for operand in operands)
+        self.pure = (kind != 'call' or value in PURE_FUNCTIONS) and all(operand.pure for operand in operands)
+        self.foldable = kind in ('number', 'parameter', 'constant') or \
+            (kind in ('call', 'unary', 'binary') and self.pure and all(operand.foldable for operand in operands))
+
+
+class PropensityCode:
+    """
+    C++ code of a model's propensity functions, simplified once at code generation rather than on every evaluation.
+
+    Subexpressions which only depend on parameters are folded into constants, computed when the parameters are
+    set, and the leading parameters of each product are gathered into a single constant. Species dependent
+    subexpressions which occur more than once in a propensity are evaluated once into a local. Evaluation order
+    and operand types are otherwise kept, so integer arithmetic on populations is unchanged. Propensities outside
+    the arithmetic understood here are written unchanged.
+
+    :param propensities: Sanitized propensity function of each reaction, in reaction order.
+    :param parameters: Sanitized parameter names.
+
+    Attributes
+    ----------
+    constants : list
+        C++ expression of each folded constant, constant i is named Ci.
+    cases : list
+        For each reaction, a list of C++ local definitions and the expression returned.
+    """
+    def __init__(self, propensities, parameters):
+        self.parameters = set(parameters)
+        self.constants = []
+        self.constant_names = {}
+        self.cases = []
+        for propensity in propensities:
+            try:
+                tree = ast.parse(propensity.strip(), mode='eval')
+                term = self.fold(self.convert(tree.body, propensity.strip()))
+            except (SyntaxError, ValueError):
+                self.cases.append(([], propensity))
+                continue
+            self.cases.append(self.hoist(term))
+
+    def convert(self, node, source):
+        # Build a term from a Python expression, folding parameter only operands of species dependent products.
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return Term('number', ast.get_source_segment(source, node))
+        if isinstance(node, ast.Name):
+            return Term('parameter' if node.id in self.parameters else 'name', node.id)
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == 'S':
+            index = node.slice
+            # Python before 3.9 wraps subscripts in an Index node
+            if type(index).__name__ == 'Index':
+                index = index.value
+            if isinstance(index, ast.Constant) and type(index.value) is int:
+                return Term('species', 'S[{}]'.format(index.value))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            return Term('unary', UNARY_OPERATORS[type(node.op)], [self.convert(node.operand, source)])
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            arguments = [self.convert(argument, source) for argument in node.args]
+            call = Term('call', node.func.id, arguments)
+            if call.foldable:
+                return call
+            return Term('call', node.func.id, [self.fold(argument) for argument in arguments])
+        if isinstance(node, ast.BinOp) and type(node.op) in (ast.Mult, ast.Div):
+            return self.convert_product(node, source)
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            operation = Term('binary', BINARY_OPERATORS[type(node.op)][0],
+                             [self.convert(node.left, source), self.convert(node.right, source)])
+            if operation.foldable:
+                return operation
+            return Term('binary', operation.value, [self.fold(operand) for operand in operation.operands])
+        raise ValueError('Unsupported propensity expression.')
+
+    def convert_product(self, node, source):
+        # Flatten the left leaning chain a*b/c*d into its operands and their operators.
+        factors = []
+        while isinstance(node, ast.BinOp) and type(node.op) in (ast.Mult, ast.Div):
+            factors.append((BINARY_OPERATORS[type(node.op)][0], self.convert(node.right, source)))
+            node = node.left
+        factors.append(('*', self.convert(node, source)))
+        factors.reverse()
+        if all(factor.foldable for _, factor in factors):
+            return chain(factors)
+        # Once a leading run of constant factors reaches a floating point one the whole product is floating point,
+        # so every constant factor may be gathered in front without changing integer arithmetic on the species.
+        leading = next(i for i, (_, factor) in enumerate(factors) if not factor.foldable or is_floating(factor))
+        if factors[leading][1].foldable:
+            constant = chain([factor for factor in factors if factor[1].foldable])
+            return chain([('*', self.fold(constant))] + [factor for factor in factors if not factor[1].foldable])
+        return chain([(operator, self.fold(factor)) for operator, factor in factors])
+
+    def fold(self, term):
+        # Replace a parameter dependent term by a constant, shared by every occurrence of its expression.
+        if not term.foldable or not term.parameter or term.kind in ('parameter', 'constant'):
+            return term
+        expression = render(term)[0]
+        if expression not in self.constant_names:
+            self.constant_names[expression] = 'C{}'.format(len(self.constants))
+            self.constants.append(expression)
+        return Term('constant', self.constant_names[expression])
+
+    def hoist(self, term):
+        # Count each species dependent subexpression, then evaluate those occurring more than once into locals.
+        counts = {}
+
+        def count(subterm):
+            if is_reusable(subterm):
+                expression = render(subterm)[0]
+                counts[expression] = counts.get(expression, 0) + 1
+            for operand in subterm.operands:
+                count(operand)
+
+        count(term)
+        definitions = []
+        local_names = {}
+
+        def substitute(subterm):
+            if is_reusable(subterm):
+                expression = render(subterm)[0]
+                if counts[expression] > 1:
+                    if expression not in local_names:
+                        local = Term(subterm.kind, subterm.value, [substitute(operand) for operand in subterm.operands])
+                        local_names[expression] = 'E{}'.format(len(definitions))
+                        definitions.append('const auto {} = {};'.format(local_names[expression], render(local)[0]))
+                    return Term('name', local_names[expression])
+            return Term(subterm.kind, subterm.value, [substitute(operand) for operand in subterm.operands])
+
+        return definitions, render(substitute(term))[0]
+
+
+def is_reusable(term):
+    return term.kind in ('call', 'unary', 'binary') and term.species and term.pure
+
+
+def is_floating(term):
+    # Parameters are doubles, as are decimal literals with a point or exponent.
+    if term.kind == 'number':
+        return not term.value.lower().startswith('0x') and any(mark in term.value for mark in '.eE')
+    return term.parameter
+
+
+def chain(factors):
+    # Rebuild a flattened product, evaluated left to right.
+    product = factors[0][1]
+    for operator, factor in factors[1:]:
+        product = Term('binary', operator, [product, factor])
+    return product
+
+
+def render(term):
+    """
+    :return: the C++ text of a term and the precedence of its outermost operator.
+    """
+    if term.kind == 'call':
+        return '{}({})'.format(term.value, ', '.join(render(operand)[0] for operand in term.operands)), ATOM_PRECEDENCE
+    if term.kind == 'unary':
+        operand, precedence = render(term.operands[0])
+        if precedence <= UNARY_PRECEDENCE:
+            operand = '(' + operand + ')'
+        return term.value + operand, UNARY_PRECEDENCE
+    if term.kind == 'binary':
+        precedence = 1 if term.value in ('+', '-') else 2
+        left, left_precedence = render(term.operands[0])
+        right, right_precedence = render(term.operands[1])
+        if left_precedence < precedence:
+            left = '(' + left + ')'
+        # Parenthesize equal precedence on the right to keep the left to right evaluation order
+        if right_precedence <= precedence:
+            right = '(' + right + ')'
+        return left + term.value + right, precedence
+    return term.value, ATOM_PRECEDENCE
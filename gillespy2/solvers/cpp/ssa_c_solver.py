@@ -1,14 +1,65 @@
 import gillespy2
-from gillespy2.core import Model, Reaction, gillespyError, GillesPySolver
+from gillespy2.core import Model, Reaction, gillespyError, GillesPySolver, log
+from gillespy2.solvers.cpp.build_cache import BuildCache
+from gillespy2.solvers.cpp.propensity_code import PropensityCode
+from gillespy2.solvers.utilities import species_changes, reactant_stoichiometry, dependency_graph, validate_timeline, EventLog, \
+    EnsembleSummary
 import os #for getting directories for C++ files
 import shutil #for deleting/copying files
 import subprocess #For calling make and executing c solver
 import inspect #for finding the Gillespy2 module path
 import tempfile #for temporary directories
+import ctypes #for loading the shared library build
+import io
+import operator #for accepting any integer seed
+import struct #for framing worker requests
+import threading #for serializing runtime builds
+import concurrent.futures #for background builds
+import platform #for keying host specific builds
 import numpy as np
 
 GILLESPY_PATH = os.path.dirname(inspect.getfile(gillespy2))
 GILLESPY_C_DIRECTORY = os.path.join(GILLESPY_PATH, 'solvers/cpp/c_base')
+# Simulation engines built into the compiled solver: the direct method, the next reaction method and
+# composition-rejection.
+ALGORITHMS = ('direct', 'nrm', 'cr')
+# What a run records: populations at the output times, or also every reaction event.
+RECORD_MODES = ('grid', 'events')
+# What a run returns: every trajectory, or only statistics of populations across them.
+OUTPUT_MODES = ('trajectories', 'summary')
+# Static library of the model independent runtime, which each model's simulation links against.
+RUNTIME_TARGET = 'libgillespy.a'
+# Sources which only affect the simulation generated for each model, not the runtime.
+MODEL_SOURCES = ('SimulationTemplate.cpp',)
+# Compiler optimization flags of each build profile. 'pgo' builds with the native flags twice: instrumented,
+# then, after a short calibration run, optimized with the recorded profile.
+BUILD_PROFILES = {
+    'default': '-O3',
+    'native': '-O3 -march=native -flto -fno-math-errno',
+    'pgo': '-O3 -march=native -flto -fno-math-errno',
+}
+PROFILE_GENERATE_FLAGS = '-fprofile-generate'
+# The library build reuses the executable's profile; only static initializers differ between the two, so a
+# mismatch is not fatal.
+PROFILE_USE_FLAGS = '-fprofile-use -fprofile-correction -Wno-error=coverage-mismatch -Wmissing-profile'
+# Trajectories of the model's own timespan simulated to record a profile.
+CALIBRATION_TRAJECTORIES = 10
+# Held while the runtime is fetched or built, so concurrent builds compile it only once.
+RUNTIME_LOCK = threading.Lock()
+BUILD_EXECUTOR_LOCK = threading.Lock()
+build_executor = None
+# Compiler the makefile builds with (its CC).
+COMPILER = 'g++'
+compiler_version = None
+
+
+def get_build_executor():
+    # Pool of threads shared by background builds, each of which waits on a make process.
+    global build_executor
+    with BUILD_EXECUTOR_LOCK:
+        if build_executor is None:
+            build_executor = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+        return build_executor
 
 
 def copy_files(destination):
@@ -19,8 +70,51 @@ def copy_files(destination):
             shutil.copy(src_file, destination)
 
 
+def get_compiler_version():
+    # Identifies the compiler in build keys, so an upgraded or replaced compiler does not reuse cached builds.
+    global compiler_version
+    if compiler_version is None:
+        try:
+            compiler_version = subprocess.run([COMPILER, '--version'], stdout=subprocess.PIPE,
+                                              stderr=subprocess.DEVNULL).stdout.decode(errors='replace')
+        except OSError:
+            compiler_version = ''
+    return compiler_version
+
+
+def get_flags_key(flags):
+    # Builds for the host's instruction set must not be shared with other machines through the cache.
+    if '-march=native' in flags:
+        return flags + ' ' + platform.node() + ' ' + platform.machine()
+    return flags
+
+
+def get_build_key(directory, target, flags=BUILD_PROFILES['default']):
+    # Key on every source copied into the build directory (including the makefile), the build flags and the
+    # compiler.
+    sources = [target, get_flags_key(flags), get_compiler_version()]
+    for source_file in sorted(os.listdir(GILLESPY_C_DIRECTORY)) + ['UserSimulation.cpp']:
+        with open(os.path.join(directory, source_file), 'rb') as source:
+            sources.append(source_file)
+            sources.append(source.read())
+    return BuildCache.make_key(*sources)
+
+
+def get_runtime_key(flags=BUILD_PROFILES['default']):
+    # The runtime only depends on the shipped sources, makefile, flags and compiler, so one build serves every
+    # model.
+    sources = [RUNTIME_TARGET, get_flags_key(flags), get_compiler_version()]
+    for source_file in sorted(os.listdir(GILLESPY_C_DIRECTORY)):
+        path = os.path.join(GILLESPY_C_DIRECTORY, source_file)
+        if source_file in MODEL_SOURCES or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as source:
+            sources.append(source_file)
+            sources.append(source.read())
+    return BuildCache.make_key(*sources)
+
+
 def write_constants(outfile, model, reactions, species, parameter_mappings):
-    outfile.write("const double V = {};\n".format(model.volume))
     outfile.write("std :: string s_names[] = {");
     if len(species) > 0:
         #Write model species names.
@@ -40,65 +134,356 @@ def write_constants(outfile, model, reactions, species, parameter_mappings):
             outfile.write('"{}", '.format(reactions[i]))
         outfile.write('"{}"'.format(reactions[-1]))
         outfile.write("};\n")
-    for param in model.listOfParameters:
-        outfile.write("const double {0} = {1};\n".format(parameter_mappings[param], model.listOfParameters[param].value))
 
 
-def write_propensity(outfile, model, species_mappings, parameter_mappings, reactions):
-    for i in range(len(reactions)):
-        # Write switch statement case for reaction
-        outfile.write("""
+def write_parameters(outfile, parameters, parameter_mappings, parameter_values, constants=()):
+    # Parameters are members with model defaults, replaced in order by set_parameters().
+    outfile.write("  static const unsigned int number_parameters = {0};\n".format(len(parameters)))
+    for param, value in zip(parameters, parameter_values):
+        outfile.write("  double {0} = {1!r};\n".format(parameter_mappings[param], float(value)))
+    # Parameter only subexpressions of the propensities, recomputed whenever the parameters change.
+    for i, expression in enumerate(constants):
+        outfile.write("  double C{0} = {1};\n".format(i, expression))
+    outfile.write("  void set_parameters(const double* values){\n")
+    for i, param in enumerate(parameters):
+        outfile.write("    {0} = values[{1}];\n".format(parameter_mappings[param], i))
+    for i, expression in enumerate(constants):
+        outfile.write("    C{0} = {1};\n".format(i, expression))
+    outfile.write("  }\n")
+
+
+def write_propensity(outfile, propensity_code):
+    for i, (definitions, expression) in enumerate(propensity_code.cases):
+        # Write switch statement case for reaction, scoping any locals to the case
+        if definitions:
+            outfile.write("""
+        case {0}:{{
+            {1}
+            return {2};
+        }}
+        """.format(i, '\n            '.join(definitions), expression))
+        else:
+            outfile.write("""
         case {0}:
             return {1};
-        """.format(i, model.listOfReactions[reactions[i]].sanitized_propensity_function(species_mappings, parameter_mappings)))
+        """.format(i, expression))
 
 
 def write_reactions(outfile, model, reactions, species):
-    for i in range(len(reactions)):
-        reaction = model.listOfReactions[reactions[i]]
-        for j in range(len(species)):
-            change = (reaction.products.get(model.listOfSpecies[species[j]], 0)) - (reaction.reactants.get(model.listOfSpecies[species[j]], 0))
-            if change != 0:
-                outfile.write("model.reactions[{0}].species_change[{1}] = {2};\n".format(i, j, change))
+    for i, change in enumerate(species_changes(model, reactions, species)):
+        for j, value in sorted(change.items()):
+            outfile.write("  model.reactions[{0}].species_change[{1}] = {2};\n".format(i, j, value))
+    # Species consumed by each reaction, used by tau-leaping to bound propensity changes
+    for i, reactants in enumerate(reactant_stoichiometry(model, reactions, species)):
+        outfile.write("  model.reactions[{0}].reactants = {{{1}}};\n".format(i, ', '.join('{{{0}, {1}}}'.format(j, value) for j, value in sorted(reactants.items()))))
+    # Reactions whose propensities read a species changed by each reaction
+    for i, dependents in enumerate(dependency_graph(model, reactions, species)):
+        outfile.write("  model.reactions[{0}].affected_reactions = {{{1}}};\n".format(i, ', '.join(str(dependent) for dependent in dependents)))
 
 
 def parse_output(results, number_of_trajectories, number_timesteps, number_species):
+    # Each text line holds a timestep followed by every trajectory's populations at that time.
+    data = np.array(" ".join(results).split(), dtype=np.float64)
+    data = data.reshape(number_timesteps, 1 + number_of_trajectories * number_species)
     trajectory_base = np.empty((number_of_trajectories, number_timesteps, number_species+1))
-    for timestep in range(number_timesteps):
-        values = results[timestep].split(" ")
-        trajectory_base[:, timestep, 0] = float(values[0])
-        index = 1
-        for trajectory in range(number_of_trajectories):
-            for species in range(number_species):
-                trajectory_base[trajectory, timestep, 1 + species] = float(values[index+species])
-            index += number_species
+    trajectory_base[:, :, 0] = data[:, 0]
+    trajectory_base[:, :, 1:] = data[:, 1:].reshape(number_timesteps, number_of_trajectories, number_species).transpose(1, 0, 2)
     return trajectory_base
 
 
-def parse_binary_output(results_buffer, number_of_trajectories, number_timesteps, number_species):
-    trajectory_base = np.empty((number_of_trajectories, number_timesteps, number_species+1))
-    step_size = number_species * number_of_trajectories + 1 #1 for timestep
-    data = np.frombuffer(results_buffer, dtype=np.float64)
-    assert(len(data) == (number_of_trajectories*number_timesteps*number_species + number_timesteps))
-    for timestep in range(number_timesteps):
-        index = step_size * timestep
-        trajectory_base[:, timestep, 0] = data[index]
-        index += 1
-        for trajectory in range(number_of_trajectories):
-            for species in range(number_species):
-                trajectory_base[trajectory, timestep, 1 + species] = data[index + species]
-            index += number_species
+def read_buffer(stream, buffer):
+    # Fill a writable buffer from a stream, tolerating short reads from pipes.
+    view = memoryview(buffer).cast('B')
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            raise gillespyError.ExecutionError("Simulation output ended after {0} of {1} expected bytes.".format(filled, len(view)))
+        filled += count
+
+
+def read_binary_output(stream):
+    """
+    Read the binary output of a compiled simulation: a header of five uint32 values (number of trajectories,
+    timesteps and species, then the NumPy kind character and byte size of population values), the timeline
+    as float64, then a trajectory-major block of populations. Data is read straight into the returned arrays
+    with no per-element Python work.
+    :return: the timeline, and a (trajectories x timesteps x species) array of populations.
+    """
+    header = np.empty(5, dtype=np.uint32)
+    read_buffer(stream, header)
+    number_of_trajectories, number_timesteps, number_species, value_kind, value_size = (int(value) for value in header)
+    try:
+        value_type = np.dtype('{0}{1}'.format(chr(value_kind), value_size))
+    except TypeError:
+        raise gillespyError.ExecutionError("Unsupported simulation output type: {0}{1}.".format(chr(value_kind), value_size))
+    timeline = np.empty(number_timesteps, dtype=np.float64)
+    read_buffer(stream, timeline)
+    trajectories = np.empty((number_of_trajectories, number_timesteps, number_species), dtype=value_type)
+    read_buffer(stream, trajectories)
+    return timeline, trajectories
+
+
+def parse_binary_output(results_buffer):
+    return read_binary_output(io.BytesIO(results_buffer))
+
+
+def read_event_log(stream, number_of_trajectories):
+    """
+    Read the event log which follows the binary output of a simulation recording events: the uint64 event count
+    of each trajectory, then every trajectory's event times as float64, then their uint32 reaction numbers.
+    :return: the offsets of each trajectory's events followed by the total, the event times and reaction numbers.
+    """
+    counts = np.empty(number_of_trajectories, dtype=np.uint64)
+    read_buffer(stream, counts)
+    offsets = np.zeros(number_of_trajectories + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    times = np.empty(offsets[-1], dtype=np.float64)
+    read_buffer(stream, times)
+    reaction_numbers = np.empty(offsets[-1], dtype=np.uint32)
+    read_buffer(stream, reaction_numbers)
+    return offsets, times, reaction_numbers
+
+
+def read_simulation_output(stream, record_events=False):
+    """
+    :return: the timeline and populations of read_binary_output, followed by the event log of read_event_log
+    if record_events is set.
+    """
+    timeline, trajectories = read_binary_output(stream)
+    if record_events:
+        return timeline, trajectories, read_event_log(stream, trajectories.shape[0])
+    return timeline, trajectories
+
+
+def read_summary_output(stream):
+    """
+    Read the output of a summarized simulation: a header of four uint32 values (number of conditions, timesteps,
+    species and histogram bins), the timeline as float64, the uint64 number of trajectories of each condition,
+    then condition-major blocks of float64 means, float64 variances and uint64 histogram counts.
+    :return: the timeline, trajectory counts, (conditions x timesteps x species) means and variances, and a
+    (conditions x timesteps x species x bins) array of histogram counts.
+    """
+    header = np.empty(4, dtype=np.uint32)
+    read_buffer(stream, header)
+    number_conditions, number_timesteps, number_species, number_bins = (int(value) for value in header)
+    timeline = np.empty(number_timesteps, dtype=np.float64)
+    read_buffer(stream, timeline)
+    counts = np.empty(number_conditions, dtype=np.uint64)
+    read_buffer(stream, counts)
+    shape = (number_conditions, number_timesteps, number_species)
+    means = np.empty(shape, dtype=np.float64)
+    read_buffer(stream, means)
+    variances = np.empty(shape, dtype=np.float64)
+    read_buffer(stream, variances)
+    histograms = np.empty(shape + (number_bins,), dtype=np.uint64)
+    if number_bins > 0:
+        read_buffer(stream, histograms)
+    return timeline, counts, means, variances, histograms
+
+
+# Fixed fields of a worker request: trajectories, timesteps, threads, seed_time, integer_output, algorithm name
+# length, parameter count, initial state count, whether output times follow, whether to record events, the
+# first trajectory's random stream, whether to summarize and the number of histogram bins, then the seed, end
+# time, tau tolerance, ODE tolerances and the histogram range.
+WORKER_REQUEST_HEADER = struct.Struct('=14I6d')
+# Seconds to wait for a worker whose output ended early to exit.
+WORKER_EXIT_TIMEOUT = 1
+
+# Seeds key the compiled simulation's random streams as one unsigned 32 bit word.
+MAX_SEED = 2**32 - 1
+
+
+def get_seed(seed):
+    """
+    Seed passed to the compiled simulation, which is always given one so that its results only depend on it.
+    :param seed: Integer seed from 0 to MAX_SEED, or None for a fresh seed drawn from system entropy.
+    :return: the seed as an int.
+    """
+    if seed is None:
+        return int(np.random.SeedSequence().entropy) & MAX_SEED
+    try:
+        seed = operator.index(seed)
+    except TypeError:
+        raise gillespyError.SimulationError("A seed must be an integer, not {0}.".format(type(seed).__name__))
+    if not 0 <= seed <= MAX_SEED:
+        raise gillespyError.SimulationError("A seed must be between 0 and {0}.".format(MAX_SEED))
+    return seed
+
+
+# Receives the event times and reaction numbers of one trajectory from the shared library.
+EVENT_CALLBACK = ctypes.CFUNCTYPE(None, ctypes.c_uint, ctypes.c_size_t, ctypes.POINTER(ctypes.c_double),
+                                  ctypes.POINTER(ctypes.c_uint))
+
+
+class SimulationWorker:
+    """
+    A compiled simulation kept running in worker mode, which answers run requests on stdin with a status
+    followed by binary results, so the process and model are only set up once.
+    """
+    def __init__(self, executable):
+        # Collects the worker's stderr, reported if it exits, as run_executable does for a single run.
+        self.error_file = tempfile.TemporaryFile()
+        self.process = subprocess.Popen([executable, '-mode', 'worker'], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=self.error_file)
+        # Cleared once a whole response has been read, so a worker left mid-response is not reused.
+        self.healthy = True
+
+    def run(self, request_data, record_events=False, summarize=False):
+        self.healthy = False
+        try:
+            self.process.stdin.write(request_data)
+            self.process.stdin.flush()
+            status = np.empty(2, dtype=np.uint32)
+            read_buffer(self.process.stdout, status[:1])
+            if status[0] == 0:
+                if summarize:
+                    output = read_summary_output(self.process.stdout)
+                else:
+                    output = read_simulation_output(self.process.stdout, record_events)
+                self.healthy = True
+                return output
+            read_buffer(self.process.stdout, status[1:])
+            message = self.process.stdout.read(int(status[1])).decode('utf-8', 'replace')
+        except (gillespyError.ExecutionError, BrokenPipeError) as output_error:
+            # Output ends early when the worker exits, whose stderr then explains why.
+            try:
+                self.process.wait(timeout=WORKER_EXIT_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                raise output_error
+            self.error_file.seek(0)
+            raise gillespyError.ExecutionError("Simulation worker exited:\nReturn code: {0}.\nError:\n{1}\n".format(self.process.returncode, self.error_file.read()))
+        self.healthy = True
+        raise gillespyError.ExecutionError("Error encountered while running simulation worker:\n{0}\n".format(message))
+
+    def close(self):
+        # Closing stdin ends the worker's request loop.
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.process.stdout.close()
+        self.process.wait()
+        self.error_file.close()
+
+
+class WorkerPool:
+    """
+    Persistent simulation workers of one executable, reused across runs. Up to max_workers runs proceed
+    concurrently, each on its own worker, which are started on demand.
+    """
+    def __init__(self, executable, max_workers):
+        self.executable = executable
+        self.idle_workers = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_workers)
+
+    def run(self, request_data, record_events=False, summarize=False):
+        with self.slots:
+            with self.lock:
+                worker = self.idle_workers.pop() if self.idle_workers else None
+            if worker is None:
+                worker = SimulationWorker(self.executable)
+            try:
+                return worker.run(request_data, record_events, summarize)
+            finally:
+                if worker.healthy:
+                    with self.lock:
+                        self.idle_workers.append(worker)
+                else:
+                    worker.close()
+
+    def close(self):
+        with self.lock:
+            workers, self.idle_workers = self.idle_workers, []
+        for worker in workers:
+            worker.close()
+
+
+def format_output(timeline, trajectories, species, show_labels):
+    if show_labels:
+        # Label columns with views into the trajectory block rather than copies.
+        simulation_data = []
+        for trajectory in trajectories:
+            data = {'time': timeline}
+            for i in range(len(species)):
+                data[species[i]] = trajectory[:, i]
+            simulation_data.append(data)
+        return simulation_data
+    if np.issubdtype(trajectories.dtype, np.integer):
+        # Integer populations keep their dtype, so unlabeled results omit the time column.
+        return trajectories
+    trajectory_base = np.empty((trajectories.shape[0], trajectories.shape[1], trajectories.shape[2] + 1))
+    trajectory_base[:, :, 0] = timeline
+    trajectory_base[:, :, 1:] = trajectories
     return trajectory_base
 
 
 class SSACSolver(GillesPySolver):
     name = "SSACSolver"
-    """TODO"""
-    def __init__(self, model=None, output_directory=None, delete_directory=True):
+    """
+    Compiles a model into a C++ SSA simulation, which is reused across runs.
+
+    Attributes
+    ----------
+    model : gillespy2.Model
+        The model to compile.
+    output_directory : str
+        Directory in which to build the simulation. Defaults to a temporary directory.
+    delete_directory : bool (True)
+        Whether to remove output_directory when the solver is deleted.
+    cache : bool or BuildCache (True)
+        Cache of compiled simulations shared between solvers and processes. True uses the default
+        cache (~/.cache/gillespy2), False disables caching.
+    shared_library : bool (False)
+        Compile the model into a shared library which is called in-process through ctypes and writes
+        directly into NumPy arrays, rather than an executable which streams results over a pipe.
+    build_profile : str ('default')
+        Compiler optimization profile: 'default' (-O3), 'native' (tuned to the host CPU with link time
+        optimization, builds are not shared between machines) or 'pgo' (native, then rebuilt with the profile
+        of a short calibration simulation). The flags of the final build are kept in build_flags.
+    persistent_workers : int (0)
+        Keep up to this many simulation processes alive in worker mode and send each run to one of them,
+        rather than starting a process per run. Has no effect with shared_library. Workers are stopped by
+        close() or when the solver is deleted.
+    background : bool or concurrent.futures.Executor (False)
+        Compile on the given executor, or a shared pool of build threads if True, instead of blocking the
+        constructor. build_future resolves to the solver once it is compiled, and run() waits for it.
+    """
+    # Engines of the compiled simulation which run() accepts.
+    algorithms = ALGORITHMS
+    supports_timeline = True
+
+    def __init__(self, model=None, output_directory=None, delete_directory=True, cache=True, shared_library=False,
+                 build_profile='default', persistent_workers=0, background=False):
         super(SSACSolver, self).__init__()
         self.compiled = False
+        self.timeline = None
+        self.event_log = None
+        self.summary = None
         self.delete_directory = False
         self.model = model
+        self.shared_library = shared_library
+        self.target = 'UserSimulation.so' if shared_library else 'UserSimulation'
+        self.library = None
+        self.build_key = None
+        self.runtime_cached = False
+        # Checked once the attributes __del__ reads are set.
+        if build_profile not in BUILD_PROFILES:
+            raise gillespyError.SolverError("Unknown build profile '{0}', expected one of {1}.".format(build_profile, ', '.join(BUILD_PROFILES)))
+        self.build_profile = build_profile
+        self.build_flags = None
+        self.build_future = None
+        self.persistent_workers = persistent_workers
+        self.worker_pool = None
+        self.cache = None
+        if cache is True:
+            try:
+                self.cache = BuildCache()
+            except OSError as e:
+                log.warning("Unable to use build cache: {0}".format(e))
+        elif isinstance(cache, BuildCache):
+            self.cache = cache
         if self.model is not None:
             # Create constant, ordered lists for reactions/species
             self.species_mappings = self.model.sanitized_species_names()
@@ -125,9 +510,80 @@ class SSACSolver(GillesPySolver):
                 raise gillespyError.DirectoryError("Errors encountered while setting up directory for Solver C++ files.")
             copy_files(self.output_directory)
             self.write_template()
-            self.compile()
-        
+            if background:
+                executor = background if isinstance(background, concurrent.futures.Executor) else get_build_executor()
+                self.build_future = executor.submit(self.compile_in_background)
+            else:
+                self.compile()
+
+    @classmethod
+    def compile_async(cls, model, **kwargs):
+        """
+        Start compiling a model without waiting for the build.
+        :param model: The model to compile.
+        :param kwargs: Other arguments of the solver's constructor.
+        :return: a concurrent.futures.Future which resolves to the compiled solver.
+        """
+        kwargs.setdefault('background', True)
+        return cls(model, **kwargs).build_future
+
+    @classmethod
+    def compile_many(cls, models, max_workers=None, **kwargs):
+        """
+        Compile many models in parallel, running at most max_workers builds at once.
+        :param models: The models to compile.
+        :param max_workers: Number of concurrent builds, defaults to the number of processors.
+        :param kwargs: Other arguments of the solver's constructor.
+        :return: a list of solvers, one per model, which may still be compiling. Their run() waits for the build.
+        """
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1)
+        try:
+            return [cls(model, background=executor, **kwargs) for model in models]
+        finally:
+            # Submitted builds continue, the pool's threads exit once they are done.
+            executor.shutdown(wait=False)
+
+    def compile_in_background(self):
+        self.compile()
+        return self
+
+    def close(self):
+        """ Stop any persistent simulation workers. """
+        if getattr(self, 'worker_pool', None) is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
+
+    def run_worker(self, number_of_trajectories, number_timesteps, t, seed, num_threads, integer_output, parameters,
+                   initial_states, algorithm, tau_tol=0.03, rtol=1e-6, atol=1e-9, output_times=None, record_events=False,
+                   first_trajectory=0, summary=None):
+        """
+        Run a simulation on a persistent worker, starting the pool on first use.
+        :param summary: Number of histogram bins and their lower and upper bounds, to summarize the trajectories.
+        :return: the timeline, and a (trajectories x timesteps x species) array of populations, followed by the
+        event log of read_event_log if record_events is set. The output of read_summary_output if summarizing.
+        """
+        if self.worker_pool is None:
+            self.worker_pool = WorkerPool(os.path.join(self.output_directory, self.target), self.persistent_workers)
+        algorithm_name = algorithm.encode('ascii')
+        parameter_values = self.get_parameter_values(parameters)
+        request = WORKER_REQUEST_HEADER.pack(number_of_trajectories, number_timesteps, num_threads,
+                                             False, bool(integer_output), len(algorithm_name),
+                                             parameter_values.size, initial_states.shape[0], output_times is not None, record_events,
+                                             first_trajectory, summary is not None, summary[0] if summary else 0,
+                                             seed, t, tau_tol, rtol, atol,
+                                             *(summary[1:] if summary else (0, 0)))
+        request += algorithm_name + parameter_values.tobytes() + initial_states.tobytes()
+        if output_times is not None:
+            request += output_times.tobytes()
+        return self.worker_pool.run(request, record_events, summary is not None)
+
+    def wait(self):
+        """ Block until a background build has finished, raising any error it encountered. """
+        if self.build_future is not None:
+            self.build_future.result()
+
     def __del__(self):
+        self.close()
         if self.delete_directory and os.path.isdir(self.output_directory):
             shutil.rmtree(self.output_directory)
         
@@ -137,55 +593,482 @@ class SSACSolver(GillesPySolver):
             # Write simulation C++ file.
             template_keyword = "__DEFINE_"
             # Use same lists of model's species and reactions to maintain order
+            propensity_code = PropensityCode(
+                [self.model.listOfReactions[reaction].sanitized_propensity_function(self.species_mappings, self.parameter_mappings)
+                 for reaction in self.reactions], self.parameter_mappings.values())
             with open(os.path.join(self.output_directory, 'UserSimulation.cpp'), 'w') as outfile:
                 for line in template:
                     if line.startswith(template_keyword):
                         line = line[len(template_keyword):]
                         if line.startswith("CONSTANTS"):
                             write_constants(outfile, self.model, self.reactions, self.species, self.parameter_mappings)
+                        if line.startswith("PARAMETERS"):
+                            write_parameters(outfile, self.parameters, self.parameter_mappings, self.get_parameter_values(),
+                                             propensity_code.constants)
                         if line.startswith("PROPENSITY"):
-                            write_propensity(outfile, self.model, self.species_mappings, self.parameter_mappings, self.reactions)
+                            write_propensity(outfile, propensity_code)
                         if line.startswith("REACTIONS"):
                             write_reactions(outfile, self.model, self.reactions, self.species)
                     else:
                         outfile.write(line)
 
     def compile(self):
-        # Use makefile.
-        cleaned = subprocess.run(["make", "-C", self.output_directory, 'cleanSimulation'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        built = subprocess.run(["make", "-C", self.output_directory, 'UserSimulation'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if built.returncode == 0:
+        executable = os.path.join(self.output_directory, self.target)
+        flags = BUILD_PROFILES[self.build_profile]
+        profile_guided = self.build_profile == 'pgo'
+        self.build_flags = flags + ' ' + PROFILE_USE_FLAGS if profile_guided else flags
+        if self.cache is not None:
+            self.build_key = get_build_key(self.output_directory, self.target, self.build_flags)
+            try:
+                if self.cache.fetch(self.build_key, executable):
+                    self.compiled = True
+            except OSError as e:
+                log.warning("Unable to read from build cache: {0}".format(e))
+        if not self.compiled:
+            if profile_guided:
+                self.make(['clean', 'cleanSimulation'], flags)
+                self.make(['UserSimulation'], flags + ' ' + PROFILE_GENERATE_FLAGS)
+                self.calibrate()
+                # Objects are rebuilt from the recorded profile, which make clean leaves in place.
+                self.make(['clean', 'cleanSimulation'], flags)
+                warnings = self.make([self.target], self.build_flags)
+                if '-Wmissing-profile' in warnings:
+                    log.warning("Profile guided build did not find the recorded profile:\n{0}".format(warnings))
+            else:
+                self.build_runtime(flags)
+                self.make(['cleanSimulation'], flags, keep_runtime=True)
+                self.make([self.target], flags, keep_runtime=True)
             self.compiled = True
-        else:
+            if self.cache is not None:
+                try:
+                    self.cache.store(self.build_key, executable)
+                except OSError as e:
+                    log.warning("Unable to write to build cache: {0}".format(e))
+        if self.shared_library:
+            self.load_library()
+
+    def make(self, targets, flags, keep_runtime=False):
+        # Returns the compiler's warnings.
+        make_args = ["make", "-C", self.output_directory, 'OPTFLAGS=' + flags]
+        if keep_runtime:
+            make_args.extend(['-o', RUNTIME_TARGET])
+        built = subprocess.run(make_args + targets, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if built.returncode != 0:
             raise gillespyError.BuildError("Error encountered while compiling file:\nReturn code: {0}.\nError:\n{1}\n".format(built.returncode, built.stderr))
+        return built.stderr.decode(errors='replace')
+
+    def calibrate(self):
+        """
+        Run the instrumented simulation executable on the model's timespan, recording the profile used by the
+        optimized build.
+        """
+        tspan = self.model.tspan
+        args = [os.path.join(self.output_directory, 'UserSimulation'), '-trajectories', str(CALIBRATION_TRAJECTORIES),
+                '-timesteps', str(len(tspan)), '-end', str(tspan[-1]), '-seed', '0']
+        calibration = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if calibration.returncode != 0:
+            raise gillespyError.BuildError("Error encountered while running calibration simulation:\nReturn code: {0}.\nError:\n{1}\n".format(calibration.returncode, calibration.stderr))
+
+    def build_runtime(self, flags):
+        """
+        Place the model independent runtime in the output directory, compiling and caching it unless a cached
+        build was found. Cached builds in other threads wait rather than compiling it again; without a cache,
+        each solver builds into its own output directory concurrently.
+        """
+        if self.cache is None:
+            self.runtime_cached = False
+            self.make([RUNTIME_TARGET], flags)
+            return
+        with RUNTIME_LOCK:
+            if self.fetch_runtime():
+                return
+            self.make([RUNTIME_TARGET], flags)
+            try:
+                self.cache.store(get_runtime_key(flags), os.path.join(self.output_directory, RUNTIME_TARGET))
+            except OSError as e:
+                log.warning("Unable to write to build cache: {0}".format(e))
+
+    def fetch_runtime(self):
+        """
+        Place a cached build of the model independent runtime in the output directory, so that only the
+        generated simulation needs compiling.
+        :return: True if the runtime was found in the cache.
+        """
+        self.runtime_cached = False
+        if self.cache is not None:
+            try:
+                self.runtime_cached = self.cache.fetch(get_runtime_key(BUILD_PROFILES[self.build_profile]), os.path.join(self.output_directory, RUNTIME_TARGET))
+            except OSError as e:
+                log.warning("Unable to read from build cache: {0}".format(e))
+        return self.runtime_cached
+
+    def get_parameter_values(self, parameters=None):
+        """
+        Build the ordered vector of parameter values passed to the compiled simulation.
+        :param parameters: dict mapping parameter names (or 'vol' for the volume) to values overriding the model,
+        or the array of parameter sets of a sweep from get_parameter_table, which is passed on as is.
+        :return: NumPy array of values, volume first, then model parameters in order.
+        """
+        if isinstance(parameters, np.ndarray):
+            return parameters
+        values = {'vol': self.model.volume}
+        for name, parameter in self.model.listOfParameters.items():
+            values[name] = parameter.value
+        if parameters is not None:
+            for name, value in parameters.items():
+                if name not in values:
+                    raise gillespyError.ParameterError("Model has no parameter named '{0}'.".format(name))
+                values[name] = value
+        return np.array([values[name] for name in self.parameters], dtype=np.float64)
+
+    def get_parameter_table(self, parameter_table):
+        """
+        Build the parameter sets of a sweep.
+        :param parameter_table: A list of dicts mapping parameter names (or 'vol') to values, or a dict mapping
+        parameter names to equal length sequences of values, one per point. Parameters which are not named keep
+        the model's values.
+        :return: a (points x parameters) NumPy array, each row ordered as get_parameter_values.
+        """
+        if isinstance(parameter_table, dict):
+            columns = {name: np.asarray(values, dtype=np.float64).ravel() for name, values in parameter_table.items()}
+            lengths = set(column.size for column in columns.values())
+            if len(lengths) != 1:
+                raise gillespyError.ParameterError("Parameter table columns must have the same, non-zero number of values.")
+            table = np.tile(self.get_parameter_values(), (lengths.pop(), 1))
+            for name, column in columns.items():
+                if name not in self.parameters:
+                    raise gillespyError.ParameterError("Model has no parameter named '{0}'.".format(name))
+                table[:, self.parameters.index(name)] = column
+        else:
+            table = np.array([self.get_parameter_values(point) for point in parameter_table]).reshape(-1, len(self.parameters))
+        if table.shape[0] == 0:
+            raise gillespyError.ParameterError("Parameter table has no points.")
+        return table
+
+    def get_initial_states(self, initial_state=None):
+        """
+        Build the initial populations passed to the compiled simulation.
+        :param initial_state: dict mapping species names to populations overriding the model's initial values,
+        an array of populations for every species, or an (n_conditions x n_species) array of initial states.
+        :return: (n_conditions x n_species) uint32 array of initial states.
+        """
+        if initial_state is None or isinstance(initial_state, dict):
+            values = {name: species.initial_value for name, species in self.model.listOfSpecies.items()}
+            for name, value in (initial_state or {}).items():
+                if name not in values:
+                    raise gillespyError.SpeciesError("Model has no species named '{0}'.".format(name))
+                values[name] = value
+            initial_states = np.array([[values[name] for name in self.species]])
+        else:
+            initial_states = np.array(initial_state, ndmin=2)
+        if initial_states.ndim != 2 or initial_states.shape[1] != len(self.species):
+            raise gillespyError.SpeciesError("Initial states must have one population for each of the {0} species.".format(len(self.species)))
+        if np.any(initial_states < 0):
+            raise gillespyError.SpeciesError("Initial populations must be non-negative.")
+        return np.ascontiguousarray(initial_states, dtype=np.uint32)
+
+    def load_library(self):
+        self.library = ctypes.CDLL(os.path.join(self.output_directory, self.target))
+        self.library.run_simulation.restype = ctypes.c_int
+        self.library.run_simulation.argtypes = [ctypes.c_uint, ctypes.c_uint, ctypes.c_double, ctypes.c_uint,
+                                                ctypes.c_int, ctypes.c_uint, ctypes.c_uint, ctypes.c_char_p, ctypes.c_double,
+                                                np.ctypeslib.ndpointer(np.float64, flags='C_CONTIGUOUS'), ctypes.c_uint,
+                                                np.ctypeslib.ndpointer(np.uint32, flags='C_CONTIGUOUS'), ctypes.c_uint,
+                                                ctypes.c_int, EVENT_CALLBACK,
+                                                np.ctypeslib.ndpointer(np.float64, flags='C_CONTIGUOUS'),
+                                                np.ctypeslib.ndpointer(np.uint32, flags='C_CONTIGUOUS')]
+        self.library.run_summary.restype = ctypes.c_int
+        self.library.run_summary.argtypes = [ctypes.c_uint, ctypes.c_uint, ctypes.c_double, ctypes.c_uint,
+                                             ctypes.c_int, ctypes.c_uint, ctypes.c_uint, ctypes.c_char_p, ctypes.c_double,
+                                             np.ctypeslib.ndpointer(np.float64, flags='C_CONTIGUOUS'), ctypes.c_uint,
+                                             np.ctypeslib.ndpointer(np.uint32, flags='C_CONTIGUOUS'), ctypes.c_uint,
+                                             ctypes.c_int, ctypes.c_uint, ctypes.c_double, ctypes.c_double,
+                                             np.ctypeslib.ndpointer(np.float64, flags='C_CONTIGUOUS'),
+                                             np.ctypeslib.ndpointer(np.float64, flags='C_CONTIGUOUS'),
+                                             np.ctypeslib.ndpointer(np.float64, flags='C_CONTIGUOUS'),
+                                             np.ctypeslib.ndpointer(np.uint64, flags='C_CONTIGUOUS')]
+
+    def run_library(self, number_of_trajectories, number_timesteps, t, seed, num_threads, integer_output, parameters, initial_states, algorithm='direct', tau_tol=0.03, output_times=None, record_events=False, first_trajectory=0):
+        # The library writes directly into these buffers, and reads custom output times from the timeline.
+        timeline = np.empty(number_timesteps, dtype=np.float64) if output_times is None else output_times.copy()
+        trajectories = np.empty((number_of_trajectories, number_timesteps, len(self.species)), dtype=np.uint32)
+        event_times = [None] * number_of_trajectories
+        event_reactions = [None] * number_of_trajectories
+
+        def store_events(trajectory_number, number_events, times, reaction_numbers):
+            # The library's buffers are only valid during the call.
+            event_times[trajectory_number] = np.ctypeslib.as_array(times, (number_events,)).copy() if number_events else np.zeros(0)
+            event_reactions[trajectory_number] = np.ctypeslib.as_array(reaction_numbers, (number_events,)).copy() if number_events else np.zeros(0, dtype=np.uint32)
+
+        parameter_values = self.get_parameter_values(parameters)
+        status = self.library.run_simulation(number_of_trajectories, number_timesteps, t, seed, False,
+                                             first_trajectory, num_threads, algorithm.encode('ascii'), tau_tol, parameter_values,
+                                             parameter_values.size // len(self.parameters), initial_states, initial_states.shape[0], output_times is not None,
+                                             EVENT_CALLBACK(store_events) if record_events else EVENT_CALLBACK(),
+                                             timeline, trajectories)
+        if status != 0:
+            raise gillespyError.ExecutionError("Error encountered while running simulation library:\nReturn code: {0}.\n".format(status))
+        output = (timeline, trajectories if integer_output else trajectories.astype(np.float64))
+        if record_events:
+            offsets = np.zeros(number_of_trajectories + 1, dtype=np.int64)
+            np.cumsum([times.size for times in event_times], out=offsets[1:])
+            output += ((offsets, np.concatenate(event_times), np.concatenate(event_reactions)),)
+        return output
+
+    def run_library_summary(self, number_of_trajectories, number_timesteps, t, seed, num_threads, parameters, initial_states,
+                            algorithm, tau_tol, output_times, first_trajectory, summary):
+        # Trajectories are summarized by the library, which only fills these buffers.
+        timeline = np.empty(number_timesteps, dtype=np.float64) if output_times is None else output_times.copy()
+        parameter_values = self.get_parameter_values(parameters)
+        number_parameter_sets = parameter_values.size // len(self.parameters)
+        number_conditions = max(initial_states.shape[0], number_parameter_sets)
+        shape = (number_conditions, number_timesteps, len(self.species))
+        means = np.empty(shape, dtype=np.float64)
+        variances = np.empty(shape, dtype=np.float64)
+        histograms = np.empty(shape + (summary[0],), dtype=np.uint64)
+        status = self.library.run_summary(number_of_trajectories, number_timesteps, t, seed, False,
+                                          first_trajectory, num_threads, algorithm.encode('ascii'), tau_tol, parameter_values,
+                                          number_parameter_sets, initial_states, initial_states.shape[0], output_times is not None,
+                                          summary[0], summary[1], summary[2], timeline, means, variances, histograms)
+        if status != 0:
+            raise gillespyError.ExecutionError("Error encountered while running simulation library:\nReturn code: {0}.\n".format(status))
+        counts = np.full(number_conditions, number_of_trajectories // number_conditions, dtype=np.uint64)
+        return timeline, counts, means, variances, histograms
+
+    def run_executable(self, args, input_data=None, record_events=False, summarize=False):
+        with tempfile.TemporaryFile() as error_file:
+            simulation = subprocess.Popen(args, stdin=subprocess.DEVNULL if input_data is None else subprocess.PIPE,
+                                          stdout=subprocess.PIPE, stderr=error_file)
+            try:
+                if input_data is not None:
+                    # The simulation reads all of its input before writing any output.
+                    try:
+                        simulation.stdin.write(input_data)
+                    finally:
+                        simulation.stdin.close()
+                if summarize:
+                    output = read_summary_output(simulation.stdout)
+                else:
+                    output = read_simulation_output(simulation.stdout, record_events)
+            except (gillespyError.ExecutionError, BrokenPipeError) as output_error:
+                output = output_error
+            finally:
+                simulation.stdout.close()
+            returncode = simulation.wait()
+            if returncode != 0:
+                error_file.seek(0)
+                raise gillespyError.ExecutionError("Error encountered while running simulation C++ file:\nReturn code: {0}.\nError:\n{1}\n".format(returncode, error_file.read()))
+        if isinstance(output, Exception):
+            raise output
+        return output
+
+    def get_runtime_input(self, args, parameters, initial_state, initial_states, output_times=None):
+        """
+        Build the data streamed to the simulation executable on stdin: parameters, initial states, then output
+        times. The arguments announcing each block are appended to args.
+        :return: bytes to write to stdin, or None when nothing is overridden.
+        """
+        input_data = b''
+        if parameters is not None:
+            parameter_values = self.get_parameter_values(parameters)
+            args.extend(['-parameters', str(parameter_values.size)])
+            input_data += parameter_values.tobytes()
+        if initial_state is not None:
+            args.extend(['-initial', str(initial_states.shape[0])])
+            input_data += initial_states.tobytes()
+        if output_times is not None:
+            args.extend(['-custom_timeline', '1'])
+            input_data += output_times.tobytes()
+        return input_data or None
+
+    def format_results(self, timeline, trajectories, initial_state, number_of_trajectories, show_labels):
+        # Runs from several initial states gain a leading condition dimension.
+        if initial_state is not None and np.ndim(initial_state) == 2:
+            trajectories = trajectories.reshape((-1, number_of_trajectories) + trajectories.shape[1:])
+            simulation_data = [format_output(timeline, condition, self.species, show_labels) for condition in trajectories]
+            if not show_labels:
+                simulation_data = np.array(simulation_data)
+            return simulation_data
+        return format_output(timeline, trajectories, self.species, show_labels)
+
+    def simulate(self, total_trajectories, number_timesteps, t, seed, num_threads, integer_output, parameters,
+                 initial_state, initial_states, algorithm, tau_tol, output_times, record_events, first_trajectory, summary):
+        """
+        Run the compiled simulation through the shared library, a persistent worker or a new process.
+        :param summary: Number of histogram bins and their lower and upper bounds, to summarize the trajectories.
+        :return: the output of read_simulation_output, or of read_summary_output if summarizing.
+        """
+        seed = get_seed(seed)
+        if self.shared_library and summary is not None:
+            output = self.run_library_summary(total_trajectories, number_timesteps, t, seed, num_threads, parameters, initial_states, algorithm, tau_tol, output_times, first_trajectory, summary)
+        elif self.shared_library:
+            output = self.run_library(total_trajectories, number_timesteps, t, seed, num_threads, integer_output, parameters, initial_states, algorithm, tau_tol, output_times, record_events, first_trajectory)
+        elif self.persistent_workers > 0:
+            output = self.run_worker(total_trajectories, number_timesteps, t, seed, num_threads, integer_output, parameters, initial_states, algorithm, tau_tol, output_times=output_times, record_events=record_events, first_trajectory=first_trajectory, summary=summary)
+        else:
+            # Execute simulation.
+            args = [os.path.join(self.output_directory, self.target), '-trajectories', str(total_trajectories), '-timesteps', str(number_timesteps), '-end', str(t), '-threads', str(num_threads), '-algorithm', algorithm, '-tolerance', str(tau_tol)]
+            args.extend(['-seed', str(seed)])
+            if first_trajectory:
+                args.extend(['-first', str(first_trajectory)])
+            if integer_output:
+                args.extend(['-format', 'integer'])
+            if record_events:
+                args.extend(['-record', 'events'])
+            if summary is not None:
+                args.extend(['-output', 'summary', '-bins', str(summary[0]), '-lower', repr(summary[1]), '-upper', repr(summary[2])])
+            input_data = self.get_runtime_input(args, parameters, initial_state, initial_states, output_times)
+            output = self.run_executable(args, input_data, record_events, summary is not None)
+        return output
+
+    def get_summary(self, output, histogram_bins, histogram_range):
+        # Histogram bins and bounds of a summarized run, or None when every trajectory is returned.
+        if output not in OUTPUT_MODES:
+            raise gillespyError.SolverError("Unknown output '{0}', expected one of {1}.".format(output, ', '.join(OUTPUT_MODES)))
+        if output != 'summary':
+            return None
+        lower, upper = (0, histogram_bins) if histogram_range is None else histogram_range
+        if histogram_bins < 0 or (histogram_bins > 0 and not lower < upper):
+            raise gillespyError.SolverError("Histograms need a non-negative number of bins and a lower bound below the upper bound.")
+        return int(histogram_bins), float(lower), float(upper)
+
+    def format_summary(self, output, summary, conditions=False):
+        # Only runs from several initial states or parameter sets keep the leading condition dimension.
+        timeline, counts, means, variances, histograms = output
+        self.timeline = timeline
+        if not conditions:
+            counts, means, variances, histograms = counts[0], means[0], variances[0], histograms[0]
+        number_bins, lower, upper = summary
+        self.summary = EnsembleSummary(timeline, means, variances, self.species, counts,
+                                       histograms if number_bins > 0 else None,
+                                       np.linspace(lower, upper, number_bins + 1) if number_bins > 0 else None)
+        return self.summary
 
     def run(self=None, model=None, t=20, number_of_trajectories=1,
-            increment=0.05, seed=None, debug=False, profile=False, show_labels=True, **kwargs):
+            increment=0.05, seed=None, debug=False, profile=False, show_labels=True, num_threads=1,
+            integer_output=False, parameters=None, initial_state=None, algorithm='direct', tau_tol=0.03, timeline=None,
+            record='grid', first_trajectory=0, output='trajectories', histogram_bins=0, histogram_range=None, **kwargs):
+        """
+        Run the compiled simulation. Accepts the arguments of GillesPySolver.run, with a seed from 0 to MAX_SEED
+        or None for a fresh seed from system entropy, plus:
+        :param num_threads: Number of threads across which trajectories are distributed. Each trajectory draws
+        from its own counter-based (Philox) random stream keyed by (seed, trajectory index), so seeded results do
+        not depend on num_threads.
+        :param first_trajectory: Trajectory index of the first trajectory's random stream. An ensemble split
+        between runs or processes, each starting at the index of its first trajectory, reproduces the
+        trajectories of a single run.
+        :param integer_output: Return populations as the kernel's native unsigned integers instead of float64,
+        halving output size. With show_labels=False the result is a (trajectories x timesteps x species) integer
+        array without the time column; the timeline is kept in self.timeline.
+        :param parameters: dict mapping parameter names (or 'vol') to values which override the model's values
+        for this run, without recompiling.
+        :param initial_state: dict mapping species names to initial populations overriding the model's values, or
+        an array with a population for each species. A 2-D (n_conditions x n_species) array runs
+        number_of_trajectories trajectories from each initial state in a single call, and results gain a leading
+        condition dimension (a list per condition when show_labels is True).
+        :param algorithm: Simulation engine, either 'direct' (Gillespie's direct method) or 'nrm' (Gibson-Bruck
+        next reaction method, O(log R) per event, faster for models with many loosely coupled reactions) or 'cr'
+        (composition-rejection over power-of-two propensity bins, selection cost independent of the number of
+        reactions, for very large networks). On the random first order networks of test/time_solvers.py
+        (timed_algorithms), 'cr' overtakes 'direct' at about 100 reactions and runs twice as fast at 300; below
+        about 80 reactions 'direct' is as fast or faster. All produce results in the same layout.
+        :param tau_tol: Relative change in propensities allowed per leap by the tau-leaping engine of
+        TauLeapingCSolver, ignored by the exact engines.
+        :param timeline: Output times, which may be unevenly spaced, replacing t and increment. Trajectories start
+        from their initial state at the first time.
+        :param record: 'grid' to record populations at the output times, or 'events' to also log the time and
+        reaction of every event up to the end time, with the exact engines. Returns (results, EventLog) when
+        recording events, the log is kept in self.event_log.
+        :param output: 'trajectories' to return every trajectory, or 'summary' to return only an EnsembleSummary of
+        the mean and variance of each species' population at each output time across trajectories. Trajectories
+        are reduced as they are simulated, so memory does not grow with number_of_trajectories. The summary is
+        kept in self.summary.
+        :param histogram_bins: Number of equal width population bins of the summary's histograms, none by default.
+        :param histogram_range: Lower and upper bound of the histogram bins, defaults to one bin per population
+        from 0 to histogram_bins. Populations outside the range are counted in the first or last bin.
+        """
         if self is None:
             self = SSACSolver(model)
+        self.wait()
+        if algorithm not in self.algorithms:
+            raise gillespyError.SolverError("Unknown algorithm '{0}', expected one of {1}.".format(algorithm, ', '.join(self.algorithms)))
+        if record not in RECORD_MODES:
+            raise gillespyError.SolverError("Unknown record mode '{0}', expected one of {1}.".format(record, ', '.join(RECORD_MODES)))
+        record_events = record == 'events'
+        if record_events and algorithm not in ALGORITHMS:
+            raise gillespyError.SolverError("Events can only be recorded by the exact algorithms: {0}.".format(', '.join(ALGORITHMS)))
+        summary = self.get_summary(output, histogram_bins, histogram_range)
+        if summary is not None and record_events:
+            raise gillespyError.SolverError("Events cannot be recorded when summarizing trajectories.")
         if self.compiled:
             self.simulation_data = None
-            number_timesteps = int(t//increment + 1)                    
-            # Execute simulation.
-            args = [os.path.join(self.output_directory, 'UserSimulation'), '-trajectories', str(number_of_trajectories), '-timesteps', str(number_timesteps), '-end', str(t)]
-            if isinstance(seed, int):
-                args.append('-seed')
-                args.append(str(seed))
-            simulation = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            # Parse/return results.
-            if simulation.returncode == 0:
-                trajectory_base = parse_binary_output(simulation.stdout, number_of_trajectories, number_timesteps, len(self.species))
-                # Format results
-                if show_labels:
-                    self.simulation_data = []
-                    for trajectory in range(number_of_trajectories):
-                        data = {'time': trajectory_base[trajectory, :, 0]}
-                        for i in range(len(self.species)):
-                            data[self.species[i]] = trajectory_base[trajectory, :, i+1]
-                        self.simulation_data.append(data)
-                else:
-                    self.simulation_data = trajectory_base
-            else:
-                raise gillespyError.ExecutionError("Error encountered while running simulation C++ file:\nReturn code: {0}.\nError:\n{1}\n".format(simulation.returncode, simulation.stderr))
+            output_times = None
+            if timeline is not None:
+                output_times = validate_timeline(timeline)
+                t = output_times[-1]
+            number_timesteps = int(t//increment + 1) if output_times is None else output_times.size
+            initial_states = self.get_initial_states(initial_state)
+            number_conditions = initial_states.shape[0]
+            total_trajectories = number_conditions * number_of_trajectories
+            output = self.simulate(total_trajectories, number_timesteps, t, seed, num_threads, integer_output, parameters,
+                                   initial_state, initial_states, algorithm, tau_tol, output_times, record_events,
+                                   first_trajectory, summary)
+            if summary is not None:
+                return self.format_summary(output, summary, initial_state is not None and np.ndim(initial_state) == 2)
+            timeline, trajectories = output[:2]
+            self.timeline = timeline
+            self.simulation_data = self.format_results(timeline, trajectories, initial_state, number_of_trajectories, show_labels)
+            if record_events:
+                offsets, times, reaction_numbers = output[2]
+                self.event_log = EventLog(self.model, times, reaction_numbers, offsets,
+                                          np.repeat(initial_states, number_of_trajectories, axis=0),
+                                          self.species, self.reactions)
+                return self.simulation_data, self.event_log
+        return self.simulation_data
+
+    def sweep(self, parameter_table, number_of_trajectories=1, t=20, increment=0.05, seed=None, num_threads=1,
+              integer_output=False, initial_state=None, algorithm='direct', tau_tol=0.03, timeline=None,
+              output='trajectories', histogram_bins=0, histogram_range=None, first_trajectory=0):
+        """
+        Run number_of_trajectories trajectories at every point of a table of parameter sets, in a single call of the
+        compiled simulation which spreads the trajectories of all points across num_threads threads. Trajectories
+        are numbered point by point, so trajectory i of point p draws the random stream of trajectory
+        first_trajectory + p * number_of_trajectories + i, and matches a run with that point's parameters started
+        at that index.
+        :param parameter_table: A list of dicts mapping parameter names (or 'vol') to values, or a dict mapping
+        parameter names to equal length sequences of values, one per point. Parameters which are not named keep
+        the model's values.
+        :param initial_state: Initial populations as in run, shared by every point, or a 2-D array with one row
+        per point.
+        Other arguments are those of run.
+        :return: a (points x trajectories x timesteps x species + 1) array in the layout of run with
+        show_labels=False (without the time column with integer_output), or with output='summary' an
+        EnsembleSummary with a leading point dimension.
+        """
+        self.wait()
+        if algorithm not in self.algorithms:
+            raise gillespyError.SolverError("Unknown algorithm '{0}', expected one of {1}.".format(algorithm, ', '.join(self.algorithms)))
+        summary = self.get_summary(output, histogram_bins, histogram_range)
+        if not self.compiled:
+            return None
+        parameter_values = self.get_parameter_table(parameter_table)
+        number_points = parameter_values.shape[0]
+        output_times = None
+        if timeline is not None:
+            output_times = validate_timeline(timeline)
+            t = output_times[-1]
+        number_timesteps = int(t//increment + 1) if output_times is None else output_times.size
+        initial_states = self.get_initial_states(initial_state)
+        if initial_states.shape[0] not in (1, number_points):
+            raise gillespyError.SimulationError("Expected one initial state, or one for each of the {0} points.".format(number_points))
+        output = self.simulate(number_points * number_of_trajectories, number_timesteps, t, seed, num_threads,
+                               integer_output, parameter_values, initial_state, initial_states, algorithm, tau_tol,
+                               output_times, False, first_trajectory, summary)
+        if summary is not None:
+            return self.format_summary(output, summary, True)
+        timeline, trajectories = output
+        self.timeline = timeline
+        trajectories = format_output(timeline, trajectories, self.species, False)
+        self.simulation_data = trajectories.reshape((number_points, number_of_trajectories) + trajectories.shape[1:])
         return self.simulation_data
 
@@ -0,0 +1,45 @@
+from gillespy2.solvers.cpp.ssa_c_solver import SSACSolver
+
+# Engines of the compiled simulation which approximate the SSA by leaping over many reactions at once.
+TAU_ALGORITHMS = ('tau',)
+
+
+class TauLeapingCSolver(SSACSolver):
+    name = "TauLeapingCSolver"
+    """
+    Compiles a model into a C++ tau-leaping simulation, which is reused across runs. Leaps are chosen by the
+    Cao-Gillespie-Petzold step size selection: reactions close to exhausting a reactant are treated as critical
+    and fire at most once per leap, leaps that would make a population negative are rejected and halved, and
+    exact SSA steps are taken where leaping would not pay off.
+
+    Accepts the same arguments as SSACSolver.
+    """
+    algorithms = TAU_ALGORITHMS
+
+    def run(self=None, model=None, t=20, number_of_trajectories=1,
+            increment=0.05, seed=None, debug=False, profile=False, show_labels=True, num_threads=1,
+            integer_output=False, parameters=None, initial_state=None, algorithm='tau', tau_tol=0.03, **kwargs):
+        """
+        Run the compiled simulation. Accepts the arguments of SSACSolver.run, with:
+        :param algorithm: Simulation engine, 'tau' (Cao-Gillespie-Petzold tau-leaping).
+        :param tau_tol: Relative change in propensities allowed per leap. Smaller values take shorter, more
+        accurate leaps.
+        """
+        if self is None:
+            self = TauLeapingCSolver(model)
+        return SSACSolver.run(self, model=model, t=t, number_of_trajectories=number_of_trajectories,
+                              increment=increment, seed=seed, debug=debug, profile=profile, show_labels=show_labels,
+                              num_threads=num_threads, integer_output=integer_output, parameters=parameters,
+                              initial_state=initial_state, algorithm=algorithm, tau_tol=tau_tol, **kwargs)
+
+    def sweep(self, parameter_table, number_of_trajectories=1, t=20, increment=0.05, seed=None, num_threads=1,
+              integer_output=False, initial_state=None, algorithm='tau', tau_tol=0.03, **kwargs):
+        """
+        Run a parameter sweep of the compiled simulation. Accepts the arguments of SSACSolver.sweep, with the
+        algorithm and tau_tol of run.
+        """
+        return SSACSolver.sweep(self, parameter_table, number_of_trajectories=number_of_trajectories, t=t,
+                                increment=increment, seed=seed, num_threads=num_threads,
+                                integer_output=integer_output, initial_state=initial_state, algorithm=algorithm,
+                                tau_tol=tau_tol, **kwargs)
+
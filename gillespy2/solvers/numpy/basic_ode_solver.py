@@ -3,6 +3,7 @@
 from scipy.integrate import odeint
 import numpy as np
 from gillespy2.core import GillesPySolver
+from gillespy2.solvers.utilities import validate_timeline, fused_propensity_function
 
 
 class BasicODESolver(GillesPySolver):
@@ -10,47 +11,46 @@ class BasicODESolver(GillesPySolver):
     This Solver produces the deterministic continuous solution via ODE.
     """
     name = "BasicODESolver"
+    supports_timeline = True
+
     @staticmethod
-    def rhs(start_state, time, model):
+    def rhs(start_state, time, model, propensity_function=None, state_changes=None):
         """
         The right hand side of the differential equation, uses scipy.integrate odeint
         :param start_state: state as a list
         :param t: time as a numpy array
         :param model: model being simulated
+        :param propensity_function: the model's fused_propensity_function, generated if not given
+        :param state_changes: the model's state_changes, computed if not given
         :return: integration step
         """
-        #   pylint: disable=W0613, W0123
-        curr_state = {}
-        state_change = {}
-        curr_state['vol'] = model.volume
-
-        propensity = {}
-        results = []
-
-        for i, species in enumerate(model.listOfSpecies):
-            curr_state[species] = start_state[i]
-            state_change[species] = 0
-
-        for parameter in model.listOfParameters:
-            curr_state[parameter] = model.listOfParameters[parameter].value
+        #   pylint: disable=W0613
+        if propensity_function is None:
+            propensity_function = fused_propensity_function(model)
+        if state_changes is None:
+            state_changes = BasicODESolver.state_changes(model)
+        return propensity_function(start_state) @ state_changes
 
-        for reaction in model.listOfReactions:
-            propensity[reaction] = eval(
-                model.listOfReactions[reaction].propensity_function, curr_state)
-            # assumption that prop is massAction
-            for react in model.listOfReactions[reaction].reactants:
-                state_change[str(react)] -= propensity[reaction]
-            for prod in model.listOfReactions[reaction].products:
-                state_change[str(prod)] += propensity[reaction]
-
-        for species in model.listOfSpecies:
-            results.append(state_change[species])
-
-        return results
+    @staticmethod
+    def state_changes(model):
+        """
+        Change in each species per unit of each reaction's propensity.
+        :param model: model being simulated
+        :return: a (reactions x species) array
+        """
+        species = list(model.listOfSpecies.keys())
+        changes = np.zeros((len(model.listOfReactions), len(species)))
+        # assumption that prop is massAction
+        for i, reaction in enumerate(model.listOfReactions.values()):
+            for react in reaction.reactants:
+                changes[i, species.index(str(react))] -= 1
+            for prod in reaction.products:
+                changes[i, species.index(str(prod))] += 1
+        return changes
 
     @classmethod
     def run(cls, model, t=20, number_of_trajectories=1,
-            increment=0.05, seed=None, debug=False, profile=False, show_labels=True, **kwargs):
+            increment=0.05, seed=None, debug=False, profile=False, show_labels=True, timeline=None, **kwargs):
         """
 
         :param model: gillespy2.model class object
@@ -62,22 +62,28 @@ class BasicODESolver(GillesPySolver):
         :param debug: not implemented
         :param profile: not implemented
         :param show_labels: not implemented
+        :param timeline: output times, which may be unevenly spaced, replacing t and increment
         :param kwargs:
         :return:
         """
         #   pylint: disable=R0913, R0914
+        if timeline is None:
+            time = np.arange(0., t, increment, dtype=np.float64)
+        else:
+            time = validate_timeline(timeline)
         if show_labels:
             results = []
         else:
-            num_save_times = int((t / increment))
+            num_save_times = time.size
             results = np.empty((number_of_trajectories,
                                 num_save_times, (len(model.listOfSpecies)+1)))
+        propensity_function = fused_propensity_function(model)
+        state_changes = BasicODESolver.state_changes(model)
         for traj_num in range(number_of_trajectories):
             start_state = []
             for species in model.listOfSpecies:
                 start_state.append(model.listOfSpecies[species].initial_value)
-            time = np.arange(0., t, increment, dtype=np.float64)
-            result = odeint(BasicODESolver.rhs, start_state, time, args=(model,))
+            result = odeint(BasicODESolver.rhs, start_state, time, args=(model, propensity_function, state_changes))
 
             if show_labels:
                 results_as_dict = {}
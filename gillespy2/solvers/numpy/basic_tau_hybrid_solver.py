@@ -1,5 +1,5 @@
 from gillespy2.core import GillesPySolver
-import random
+from gillespy2.solvers.utilities import trajectory_generators, fused_propensity_function
 from scipy.integrate import ode
 import numpy
 import math
@@ -25,15 +25,17 @@ class BasicTauHybridSolver(GillesPySolver):
         self.epsilon = 0.03
 
     @staticmethod
-    def __f(t, y, curr_state, reactions, rate_rules, propensities, compiled_reactions, compiled_rate_rules):
+    def __f(t, y, curr_state, species, reactions, rate_rules, propensities, propensity_function,
+            compiled_rate_rules):
         """
         Evaluate the propensities for the reactions and the RHS of the Reactions and RateRules.
         """
         curr_state['t'] = t
         state_change = []
 
+        propensity_values = propensity_function([curr_state[s] for s in species])
         for i, r in enumerate(reactions):
-            propensities[r] = eval(compiled_reactions[r], eval_globals, curr_state)
+            propensities[r] = propensity_values[i]
             state_change.append(propensities[r])
         for i, rr in enumerate(rate_rules):
             state_change.append(eval(compiled_rate_rules[rr], eval_globals, curr_state))
@@ -41,12 +43,12 @@ class BasicTauHybridSolver(GillesPySolver):
         return state_change
 
     @staticmethod
-    def __get_reaction_integrate(step, curr_state, y0, model, curr_time, propensities, compiled_reactions,
+    def __get_reaction_integrate(step, curr_state, y0, model, curr_time, propensities, propensity_function,
                                  compiled_rate_rules):
         """ Helper function to perform the ODE integration of one step """
         rhs = ode(BasicTauHybridSolver.__f)  # set function as ODE object
-        rhs.set_initial_value(y0, curr_time).set_f_params(curr_state, model.listOfReactions,
-                                                          model.listOfRateRules, propensities, compiled_reactions,
+        rhs.set_initial_value(y0, curr_time).set_f_params(curr_state, model.listOfSpecies, model.listOfReactions,
+                                                          model.listOfRateRules, propensities, propensity_function,
                                                           compiled_rate_rules)
         current = rhs.integrate(step + curr_time)  # current holds integration from current_time to int_time\
         if rhs.successful():
@@ -56,14 +58,14 @@ class BasicTauHybridSolver(GillesPySolver):
             # TODO The RateRule linked species should still contain the correct value in current, verify this
             # step size is too small, take a single forward-euler step
             current = y0 + numpy.array(BasicTauHybridSolver.__f(curr_time, y0,
-                                                                curr_state, model.listOfReactions,
-                                                                model.listOfRateRules, propensities, compiled_reactions,
+                                                                curr_state, model.listOfSpecies, model.listOfReactions,
+                                                                model.listOfRateRules, propensities, propensity_function,
                                                                 compiled_rate_rules)) * step
 
             return current, curr_time + step
 
     def __get_reactions(self, step, curr_state, y0, model, curr_time, save_time,
-                        propensities, compiled_reactions, compiled_rate_rules, debug):
+                        propensities, propensity_function, compiled_rate_rules, debug, generator):
         """
         Function to get reactions fired from t to t+tau.  This function solves for root crossings
         of each reaction channel from over tau step, using poisson random number generation
@@ -84,7 +86,7 @@ class BasicTauHybridSolver(GillesPySolver):
             print("Curr Time: ", curr_time, " Save time: ", save_time, "step: ", step)
 
         current, curr_time = self.__get_reaction_integrate(step, curr_state, y0, model,
-                                                           curr_time, propensities, compiled_reactions,
+                                                           curr_time, propensities, propensity_function,
                                                            compiled_rate_rules)
 
         rxn_count = {}
@@ -95,7 +97,7 @@ class BasicTauHybridSolver(GillesPySolver):
                 if not fired:
                     fired = True
                 rxn_count[r] += 1
-                urn = (math.log(random.uniform(0, 1)))
+                urn = (math.log(1 - generator.random()))
                 current[i] += urn
 
         # UPDATE THE STATE of the continuous species
@@ -129,7 +131,8 @@ class BasicTauHybridSolver(GillesPySolver):
         increment : float
             Save point increment for recording data
         seed : int
-            The random seed for the simulation. Optional, defaults to None.
+            The random seed for the simulation. Optional, defaults to None. Each
+            trajectory draws from its own stream keyed by (seed, trajectory index).
         debug : bool (False)
             Set to True to provide additional debug information about the
             simulation.
@@ -155,9 +158,11 @@ class BasicTauHybridSolver(GillesPySolver):
             num_save_points = int(t / increment) + 1
             trajectories = numpy.empty((number_of_trajectories, num_save_points, len(model.listOfSpecies)+1))
 
+        generators = trajectory_generators(seed, number_of_trajectories)
+        propensity_function = fused_propensity_function(model)
         for trajectory in range(number_of_trajectories):
 
-            random.seed(seed)
+            generator = generators[trajectory]
             steps_taken = []
             steps_rejected = 0
 
@@ -183,14 +188,10 @@ class BasicTauHybridSolver(GillesPySolver):
                 curr_state[p] = model.listOfParameters[p].value
 
             for i, r in enumerate(model.listOfReactions):  # set reactions to uniform random number and add to y0
-                y0[i] = (math.log(random.uniform(0, 1)))
+                y0[i] = (math.log(1 - generator.random()))
                 if debug:
                     print("Setting Random number ", y0[i], " for ", model.listOfReactions[r].name)
 
-            compiled_reactions = {}
-            for i, r in enumerate(model.listOfReactions):
-                compiled_reactions[r] = compile(model.listOfReactions[r].propensity_function, '<string>',
-                                                'eval')
             compiled_rate_rules = {}
             for i, rr in enumerate(model.listOfRateRules):
                 compiled_rate_rules[rr] = compile(model.listOfRateRules[rr].expression, '<string>', 'eval')
@@ -215,9 +216,10 @@ class BasicTauHybridSolver(GillesPySolver):
 
                     # Salis et al. eq (16)
                     # TODO: this needs to be optimized.  Going too big is expensive, too small is also expensive
+                    propensity_values = propensity_function([curr_state[s] for s in model.listOfSpecies])
                     propensity_sum = 0
                     for i, r in enumerate(model.listOfReactions):
-                        propensities[r] = eval(model.listOfReactions[r].propensity_function, curr_state)
+                        propensities[r] = propensity_values[i]
                         propensity_sum += propensities[r]
                         if propensities[r] > 0:
                             tau_j[r] = -y0[i] / propensities[r]
@@ -308,8 +310,8 @@ class BasicTauHybridSolver(GillesPySolver):
                             raise Exception("Loop over __get_reactions() exceeded loop count")
 
                         reactions, y0, curr_state, curr_time = self.__get_reactions(
-                            tau_step, curr_state, y0, model, curr_time, save_time, propensities, compiled_reactions,
-                            compiled_rate_rules, debug)
+                            tau_step, curr_state, y0, model, curr_time, save_time, propensities, propensity_function,
+                            compiled_rate_rules, debug, generator)
 
 
                         # Update curr_state with the result of the SSA reaction that fired
@@ -1,11 +1,11 @@
 """Class and methods for Basic Tau Leaping Solver"""
 
-import random
 import math
 import sys
 import warnings
 import numpy
 from gillespy2.core import GillesPySolver
+from gillespy2.solvers.utilities import trajectory_generators, fused_propensity_function
 
 
 class BasicTauLeapingSolver(GillesPySolver):
@@ -21,10 +21,12 @@ class BasicTauLeapingSolver(GillesPySolver):
         self.debug = debug
         self.profile = profile
         self.epsilon = 0.03
+        self.propensity_function = None
 
-    def get_reactions(self, step, curr_state, curr_time, save_time, propensities, reactions):
+    def get_reactions(self, step, curr_state, curr_time, save_time, propensities, reactions, generator):
         """
-        Helper Function to get reactions fired from t to t+tau.  Returns three values:
+        Helper Function to get reactions fired from t to t+tau, drawing from the trajectory's
+        generator.  Returns three values:
         rxn_count - dict with key=Raection channel value=number of times fired
         curr_state - dict containing all state variables for system at current time
         curr_time - float representing current time
@@ -43,7 +45,7 @@ class BasicTauLeapingSolver(GillesPySolver):
         rxn_count = {}
 
         for rxn in reactions:
-            rxn_count[rxn] = numpy.random.poisson(propensities[rxn] * step)
+            rxn_count[rxn] = generator.poisson(propensities[rxn] * step)
 
         if self.debug:
             print("Reactions Fired: ", rxn_count)
@@ -67,9 +69,10 @@ class BasicTauLeapingSolver(GillesPySolver):
             print("}")
 
         # Salis et al. eq (16)
+        propensity_values = self.propensity_function([curr_state[spec] for spec in model.listOfSpecies])
         propensity_sum = 0
         for i, rxn in enumerate(model.listOfReactions):
-            propensities[rxn] = eval(model.listOfReactions[rxn].propensity_function, curr_state)
+            propensities[rxn] = propensity_values[i]
             propensity_sum += propensities[rxn]
             if propensities[rxn] > 0:
                 tau_j[rxn] = -start_state[i] / propensities[rxn]
@@ -191,7 +194,8 @@ class BasicTauLeapingSolver(GillesPySolver):
                 increment : float
                     Save point increment for recording data
                 seed : int
-                    The random seed for the simulation. Optional, defaults to None.
+                    The random seed for the simulation. Optional, defaults to None. Each
+                    trajectory draws from its own stream keyed by (seed, trajectory index).
                 debug : bool (False)
                     Set to True to provide additional debug information about the
                     simulation.
@@ -218,8 +222,10 @@ class BasicTauLeapingSolver(GillesPySolver):
             trajectories = numpy.empty((number_of_trajectories,
                                         num_save_points, len(model.listOfSpecies)+1))
 
+        generators = trajectory_generators(seed, number_of_trajectories)
+        self.propensity_function = fused_propensity_function(model)
         for trajectory in range(number_of_trajectories):
-            random.seed(seed)
+            generator = generators[trajectory]
             start_state = [0] * (len(model.listOfReactions) + len(model.listOfRateRules))
             propensities = {}
             curr_state = {}
@@ -245,7 +251,7 @@ class BasicTauLeapingSolver(GillesPySolver):
 
             for i, rxn in enumerate(model.listOfReactions):
                 # set reactions to uniform random number and add to start_state
-                start_state[i] = (math.log(random.uniform(0, 1)))
+                start_state[i] = (math.log(1 - generator.random()))
                 if debug:
                     print("Setting Random number ",
                           start_state[i], " for ", model.listOfReactions[rxn].name)
@@ -270,7 +276,7 @@ class BasicTauLeapingSolver(GillesPySolver):
 
                         reactions, curr_state, curr_time = self.get_reactions(
                             tau_step, curr_state, curr_time, save_time,
-                            propensities, model.listOfReactions)
+                            propensities, model.listOfReactions, generator)
 
                         # Update curr_state with the result of the SSA reaction that fired
                         species_modified = {}
@@ -1,14 +1,17 @@
-from gillespy2.core import GillesPySolver, Model, Reaction
-import random
+from gillespy2.core import GillesPySolver, Model, Reaction, gillespyError
+from gillespy2.solvers.utilities import validate_timeline, EventLog, trajectory_generators, uniform_stream, \
+    fused_propensity_function, propensity_update_functions, sanitized_propensities
 import math
 import numpy as np
 
 
 class NumPySSASolver(GillesPySolver):
     name = "NumPySSASolver"
+    supports_timeline = True
 
     @staticmethod
-    def run(model, t=20, number_of_trajectories=1, increment=0.05, seed=None, debug=False, show_labels=True, **kwargs):
+    def run(model, t=20, number_of_trajectories=1, increment=0.05, seed=None, debug=False, show_labels=True,
+            timeline=None, record='grid', first_trajectory=0, ensemble=False, **kwargs):
         """
         Run the SSA algorithm using a NumPy for storing the data in arrays and generating the timeline.
         :param model: The model on which the solver will operate.
@@ -16,21 +19,32 @@ class NumPySSASolver(GillesPySolver):
         :param number_of_trajectories: The number of times to sample the chemical master equation. Each
         trajectory will be returned at the end of the simulation.
         :param increment: The time step of the solution.
-        :param seed: The random seed for the simulation. Defaults to None.
+        :param seed: The random seed for the simulation. Defaults to None. Each trajectory draws from its own
+        stream keyed by (seed, trajectory index).
         :param debug: Set to True to provide additional debug information about the
         simulation.
         :param show_labels: Use names of species as index of result object rather than position numbers.
-        :return: a list of each trajectory simulated.
+        :param timeline: Output times, which may be unevenly spaced, replacing t and increment.
+        :param record: 'grid' to record populations at the output times, or 'events' to also log the time and
+        reaction of every event up to the end time.
+        :param first_trajectory: Trajectory index of the first trajectory's random stream, so an ensemble split
+        between runs reproduces the trajectories of a single run.
+        :param ensemble: Advance all trajectories together, one event per NumPy step, rather than one trajectory
+        at a time, sharing Python overhead across the ensemble. Trajectories draw the same random numbers as
+        without it.
+        :return: a list of each trajectory simulated, and an EventLog when recording events.
         """
-        random.seed(seed)
-        # create mapping of species dictionary to array indices
-        species_mappings = model.sanitized_species_names()
-        species = list(species_mappings.keys())
-        parameter_mappings = model.sanitized_parameter_names()
+        if record not in ('grid', 'events'):
+            raise gillespyError.SolverError("Unknown record mode '{0}', expected one of grid, events.".format(record))
+        generators = trajectory_generators(seed, number_of_trajectories, first_trajectory)
+        species = list(model.listOfSpecies.keys())
         number_species = len(species)
 
         # create numpy array for timeline
-        timeline = np.linspace(0, t, (t // increment + 1))
+        if timeline is None:
+            timeline = np.linspace(0, t, (t // increment + 1))
+        else:
+            timeline = validate_timeline(timeline)
 
         # create numpy matrix to mark all state data of time and species
         trajectory_base = np.empty((number_of_trajectories, timeline.size, number_species + 1))
@@ -41,56 +55,86 @@ class NumPySSASolver(GillesPySolver):
 
         for i, s in enumerate(species):
             trajectory_base[:, 0, i + 1] = model.listOfSpecies[s].initial_value
-            # create dictionary of all constant parameters for propensity evaluation
-        parameters = {'V': model.volume}
-        for paramName, param in model.listOfParameters.items():
-            parameters[parameter_mappings[paramName]] = param.value
 
         # create mapping of reaction dictionary to array indices
         reactions = list(model.listOfReactions.keys())
         number_reactions = len(reactions)
-        propensity_functions = []
         # create an array mapping reactions to species modified
         species_changes = np.zeros((number_reactions, number_species))
-        # pre-evaluate propensity equations from strings:
         for i, reaction in enumerate(reactions):
-            # replace all references to species with array indices
             for j, spec in enumerate(species):
                 species_changes[i][j] = model.listOfReactions[reaction].products.get(model.listOfSpecies[spec], 0) - model.listOfReactions[reaction].reactants.get(model.listOfSpecies[spec], 0)
-            propensity_functions.append(eval('lambda S:' + model.listOfReactions[reaction].sanitized_propensity_function(species_mappings, parameter_mappings), parameters))
-        # begin simulating each trajectory
+        # compile the propensity equations into functions of the state
+        propensities = sanitized_propensities(model, reactions, species)
+        propensity_function = fused_propensity_function(model, reactions, species, propensities)
+        if ensemble:
+            event_times, event_reactions = NumPySSASolver.simulate_ensemble(trajectory_base, timeline,
+                                                                            propensity_function, species_changes,
+                                                                            generators, record == 'events')
+        else:
+            event_times = []
+            event_reactions = []
+            # after a reaction fires only the species it changes, and the propensities reading them, are updated
+            propensity_updates = propensity_update_functions(model, reactions, species, propensities)
+            sparse_changes = [[(j, change) for j, change in enumerate(row) if change] for row in species_changes.tolist()]
+            # begin simulating each trajectory
+            for trajectory_num in range(number_of_trajectories):
+                # copy initial state data
+                trajectory = trajectory_base[trajectory_num]
+                entry_count = 1
+                current_time = timeline[0]
+                # populations and propensities are Python lists, whose scalar arithmetic is faster than NumPy's
+                current_state = trajectory[0, 1:].tolist()
+                uniforms = uniform_stream(generators[trajectory_num])
+                times = []
+                fired_reactions = []
+                # calculate initial propensity sums
+                propensity_sums = propensity_function(current_state).tolist()
+                propensity_sum = sum(propensity_sums)
+                events_since_sum = 0
+                while entry_count < timeline.size:
+                    # if no more reactions, quit, checking the exact sum rather than the running one
+                    if propensity_sum <= 0:
+                        propensity_sum = sum(propensity_sums)
+                        if propensity_sum <= 0:
+                            trajectory[entry_count:, 1:] = current_state
+                            break
+                    cumulative_sum = next(uniforms) * propensity_sum
+                    current_time += -math.log(1 - next(uniforms)) / propensity_sum
+                    # determine time passed in this reaction
+                    while entry_count < timeline.size and timeline[entry_count] <= current_time:
+                        trajectory[entry_count, 1:] = current_state
+                        entry_count += 1
+                    # determine next reaction
+                    for potential_reaction, propensity in enumerate(propensity_sums):
+                        cumulative_sum -= propensity
+                        if cumulative_sum <= 0:
+                            break
+                    else:
+                        # a running sum which drifted above the exact one leaves part of the draw unclaimed, which
+                        # goes to the last reaction able to fire rather than to an event changing nothing
+                        propensity_sum = sum(propensity_sums)
+                        events_since_sum = 0
+                        potential_reaction = next((i for i in range(number_reactions - 1, -1, -1)
+                                                   if propensity_sums[i] > 0), None)
+                        if potential_reaction is None:
+                            continue
+                    if record == 'events' and current_time <= timeline[-1]:
+                        times.append(current_time)
+                        fired_reactions.append(potential_reaction)
+                    for index, change in sparse_changes[potential_reaction]:
+                        current_state[index] += change
+                    # refresh only the propensities reading changed species, resumming now and then so
+                    # rounding in the running sum does not accumulate
+                    propensity_sum += propensity_updates[potential_reaction](current_state, propensity_sums)
+                    events_since_sum += 1
+                    if events_since_sum == number_reactions:
+                        propensity_sum = sum(propensity_sums)
+                        events_since_sum = 0
+                event_times.append(times)
+                event_reactions.append(fired_reactions)
         simulation_data = []
-        for trajectory_num in range(number_of_trajectories):
-            # copy initial state data
-            trajectory = trajectory_base[trajectory_num]
-            entry_count = 1
-            current_time = 0
-            current_state = np.copy(trajectory[0, 1:])
-            propensity_sums = np.zeros(number_reactions)
-            # calculate initial propensity sums
-            while entry_count < timeline.size:
-                # determine next reaction
-                for i in range(number_reactions):
-                    propensity_sums[i] = propensity_functions[i](current_state)
-                propensity_sum = np.sum(propensity_sums)
-                # if no more reactions, quit
-                if propensity_sum <= 0:
-                    trajectory[entry_count:, 1:] = current_state
-                    break
-                cumulative_sum = random.uniform(0, propensity_sum)
-                current_time += -math.log(random.random()) / propensity_sum
-                # determine time passed in this reaction
-                while entry_count < timeline.size and timeline[entry_count] <= current_time:
-                    trajectory[entry_count, 1:] = current_state
-                    entry_count += 1
-                for potential_reaction in range(number_reactions):
-                    cumulative_sum -= propensity_sums[potential_reaction]
-                    if cumulative_sum <= 0:
-                        current_state += species_changes[potential_reaction]
-                        # recompute propensities as needed
-                        for i in range(number_reactions):
-                            propensity_sums[i] = propensity_functions[i](current_state)
-                        break
+        for trajectory in trajectory_base:
             if show_labels:
                 data = {
                     'time': timeline
@@ -100,4 +144,85 @@ class NumPySSASolver(GillesPySolver):
                 simulation_data.append(data)
             else:
                 simulation_data.append(trajectory)
+        if record == 'events':
+            return simulation_data, EventLog.from_lists(model, event_times, event_reactions, trajectory_base[:, 0, 1:],
+                                                        species, reactions)
         return simulation_data
+
+    @staticmethod
+    def simulate_ensemble(trajectory_base, timeline, propensity_function, species_changes, generators,
+                          record_events=False, block_size=4096):
+        """
+        Simulate every trajectory of an ensemble in lockstep, firing one event in each unfinished trajectory per
+        step with whole ensemble NumPy operations on (trajectories x species) populations and (trajectories x
+        reactions) propensities. Each trajectory draws from its generator in the same blocks and order as when it
+        is simulated alone, so both give the same trajectories up to the rounding of NumPy's logarithm.
+        :param trajectory_base: (trajectories x timesteps x species + 1) array with the initial populations in each
+        trajectory's first row, filled with the populations at each output time.
+        :param timeline: Output times.
+        :param propensity_function: Function of a (trajectories x species) batch of populations returning the
+        propensity of each reaction, from fused_propensity_function.
+        :param species_changes: (reactions x species) change in populations of each reaction.
+        :param generators: numpy.random.Generator of each trajectory.
+        :param record_events: Log the time and reaction of every event up to the end time.
+        :param block_size: Uniform variates drawn from a generator at a time, as uniform_stream.
+        :return: lists of the event times and reaction numbers of each trajectory, empty unless recording events.
+        """
+        number_trajectories = trajectory_base.shape[0]
+        state = trajectory_base[:, 0, 1:].copy()
+        current_time = np.full(number_trajectories, timeline[0], dtype=np.float64)
+        entry_count = np.ones(number_trajectories, dtype=np.int64)
+        uniforms = np.empty((number_trajectories, block_size))
+        for i, generator in enumerate(generators):
+            uniforms[i] = generator.random(block_size)
+        position = np.zeros(number_trajectories, dtype=np.int64)
+        events = []
+        active = np.arange(number_trajectories if timeline.size > 1 else 0)
+        while active.size > 0:
+            current_state = state[active]
+            propensities = propensity_function(current_state)
+            propensity_sums = propensities.sum(axis=1)
+            # trajectories with no more reactions keep their populations to the end
+            finished = propensity_sums <= 0
+            for row in active[finished]:
+                trajectory_base[row, entry_count[row]:, 1:] = state[row]
+            if finished.any():
+                running = ~finished
+                active, current_state = active[running], current_state[running]
+                propensities, propensity_sums = propensities[running], propensity_sums[running]
+                if active.size == 0:
+                    break
+            for row in active[position[active] >= block_size]:
+                uniforms[row] = generators[row].random(block_size)
+                position[row] = 0
+            draws = position[active]
+            position[active] += 2
+            targets = uniforms[active, draws] * propensity_sums
+            times = current_time[active] - np.log(1 - uniforms[active, draws + 1]) / propensity_sums
+            current_time[active] = times
+            # record populations at every output time passed before this event
+            reached = np.searchsorted(timeline, times, side='right')
+            recording = np.flatnonzero(entry_count[active] < reached)
+            while recording.size > 0:
+                rows = active[recording]
+                trajectory_base[rows, entry_count[rows], 1:] = current_state[recording]
+                entry_count[rows] += 1
+                recording = recording[entry_count[rows] < reached[recording]]
+            # subtract each propensity from the draw in turn, the first reaction taking it to zero fires
+            remaining = np.subtract.accumulate(np.column_stack((targets, propensities)), axis=1)[:, 1:] <= 0
+            # a draw which rounding leaves above every partial sum goes to the last reaction able to fire
+            last_positive = propensities.shape[1] - 1 - (propensities[:, ::-1] > 0).argmax(axis=1)
+            reactions = np.where(remaining.any(axis=1), remaining.argmax(axis=1), last_positive)
+            state[active] += species_changes[reactions]
+            if record_events:
+                logged = times <= timeline[-1]
+                events.append((active[logged], times[logged], reactions[logged]))
+            active = active[entry_count[active] < timeline.size]
+        if not record_events:
+            return [], []
+        rows = np.concatenate([np.zeros(0, dtype=np.int64)] + [event[0] for event in events])
+        order = np.argsort(rows, kind='stable')
+        offsets = np.cumsum(np.bincount(rows, minlength=number_trajectories))[:-1]
+        times = np.concatenate([np.zeros(0)] + [event[1] for event in events])[order]
+        reactions = np.concatenate([np.zeros(0, dtype=np.int64)] + [event[2] for event in events])[order]
+        return np.split(times, offsets), np.split(reactions, offsets)
@@ -0,0 +1,11 @@
+from gillespy2.solvers.utilities.solverutils import species_changes, reactant_stoichiometry, dependency_graph, validate_timeline, \
+    sanitized_propensities
+from gillespy2.solvers.utilities.event_log import EventLog
+from gillespy2.solvers.utilities.ensemble_summary import EnsembleSummary
+from gillespy2.solvers.utilities.random_streams import trajectory_generators, uniform_stream
+from gillespy2.solvers.utilities.propensity_functions import fused_propensity_function, \
+    propensity_update_functions
+
+__all__ = ['species_changes', 'reactant_stoichiometry', 'dependency_graph', 'validate_timeline', 'EventLog',
+           'EnsembleSummary', 'trajectory_generators', 'uniform_stream', 'fused_propensity_function',
+           'propensity_update_functions', 'sanitized_propensities']
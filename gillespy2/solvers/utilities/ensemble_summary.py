@@ -0,0 +1,44 @@
+"""Statistics of populations across an ensemble of trajectories."""
+
+import numpy as np
+
+
+class EnsembleSummary:
+    """
+    The mean, variance and optional histograms of each species' population at each output time, across an
+    ensemble of trajectories which were reduced as they were simulated rather than stored.
+
+    Arrays are (timesteps x species), with a leading condition dimension for runs from several initial states.
+
+    :param timeline: Output times.
+    :param means: Mean populations.
+    :param variances: Population variances, normalized by the number of trajectories as numpy.var.
+    :param species: Ordered list of species names.
+    :param number_of_trajectories: Trajectories summarized for each condition.
+    :param histograms: Counts of trajectories in each population bin, with a trailing bin dimension, or None.
+    :param bin_edges: The number of bins plus one edges of the histograms' equal width bins. Populations outside
+    them are counted in the first or last bin.
+    """
+    def __init__(self, timeline, means, variances, species, number_of_trajectories, histograms=None, bin_edges=None):
+        self.timeline = timeline
+        self.means = means
+        self.variances = variances
+        self.species = species
+        self.number_of_trajectories = number_of_trajectories
+        self.histograms = histograms
+        self.bin_edges = bin_edges
+
+    def std(self):
+        """ :return: the standard deviation of populations. """
+        return np.sqrt(self.variances)
+
+    def statistics(self, species):
+        """
+        :param species: Name of a species.
+        :return: a dict of the species' 'mean', 'variance' and, if recorded, 'histogram' over time.
+        """
+        index = self.species.index(species)
+        statistics = {'time': self.timeline, 'mean': self.means[..., index], 'variance': self.variances[..., index]}
+        if self.histograms is not None:
+            statistics['histogram'] = self.histograms[..., index, :]
+        return statistics
@@ -0,0 +1,87 @@
+"""Event logs of stochastic simulations, recording every reaction fired."""
+
+import numpy as np
+from gillespy2.solvers.utilities.solverutils import species_changes
+
+
+class EventLog:
+    """
+    The jump chain of a set of trajectories: the time and reaction of every event, stored as one float64 array of
+    times and one uint32 array of reaction numbers. Populations at any time are rebuilt on demand from each
+    trajectory's initial state and the reactions' stoichiometry.
+
+    :param model: The simulated model.
+    :param times: Event times of all trajectories, concatenated in trajectory order.
+    :param reaction_numbers: Index of the reaction fired at each event, in the order of reactions.
+    :param offsets: Start of each trajectory's events in times and reaction_numbers, followed by the total.
+    :param initial_states: (trajectories x species) populations each trajectory starts from.
+    :param species: Ordered list of species names, defaults to the model's order.
+    :param reactions: Ordered list of reaction names, defaults to the model's order.
+    """
+    def __init__(self, model, times, reaction_numbers, offsets, initial_states, species=None, reactions=None):
+        if species is None:
+            species = list(model.listOfSpecies.keys())
+        if reactions is None:
+            reactions = list(model.listOfReactions.keys())
+        self.species = species
+        self.reactions = reactions
+        self.times = np.asarray(times, dtype=np.float64)
+        self.reaction_numbers = np.asarray(reaction_numbers, dtype=np.uint32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.initial_states = np.asarray(initial_states, dtype=np.int64).reshape(len(self.offsets) - 1, len(species))
+        self.stoichiometry = np.zeros((len(reactions), len(species)), dtype=np.int64)
+        for i, change in enumerate(species_changes(model, reactions, species)):
+            for j, value in change.items():
+                self.stoichiometry[i, j] = value
+
+    @classmethod
+    def from_lists(cls, model, times, reaction_numbers, initial_states, species=None, reactions=None):
+        """ Build a log from a list of event times and a list of reaction numbers for each trajectory. """
+        offsets = np.zeros(len(times) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(trajectory_times) for trajectory_times in times])
+        return cls(model, np.concatenate([np.zeros(0)] + [np.asarray(t, dtype=np.float64) for t in times]),
+                   np.concatenate([np.zeros(0, dtype=np.uint32)] + [np.asarray(r, dtype=np.uint32) for r in reaction_numbers]),
+                   offsets, initial_states, species, reactions)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def events(self, trajectory=0):
+        """
+        :return: the event times and reaction numbers of a trajectory, as views into the log.
+        """
+        start, end = self.offsets[trajectory], self.offsets[trajectory + 1]
+        return self.times[start:end], self.reaction_numbers[start:end]
+
+    def state(self, time, trajectory=0):
+        """
+        Populations of a trajectory after every event up to and including time.
+        :param time: A time, or an array of times in any order.
+        :return: an array of species populations, with a leading time dimension if time is an array.
+        """
+        times = np.atleast_1d(np.asarray(time, dtype=np.float64))
+        event_times, reaction_numbers = self.events(trajectory)
+        counts = np.searchsorted(event_times, times, side='right')
+        states = np.empty((times.size, len(self.species)), dtype=np.int64)
+        state = self.initial_states[trajectory].copy()
+        replayed = 0
+        # Visit times in order, so each event is only replayed once.
+        for index in np.argsort(counts, kind='stable'):
+            count = counts[index]
+            fired = np.bincount(reaction_numbers[replayed:count], minlength=len(self.reactions))
+            state += fired.dot(self.stoichiometry)
+            replayed = count
+            states[index] = state
+        return states[0] if np.ndim(time) == 0 else states
+
+    def path(self, trajectory=0):
+        """
+        The full piecewise constant path of a trajectory.
+        :return: the event times, and the populations before the first event followed by those after each event.
+        """
+        event_times, reaction_numbers = self.events(trajectory)
+        populations = np.empty((event_times.size + 1, len(self.species)), dtype=np.int64)
+        populations[0] = self.initial_states[trajectory]
+        np.cumsum(self.stoichiometry[reaction_numbers], axis=0, out=populations[1:])
+        populations[1:] += populations[0]
+        return event_times, populations
@@ -0,0 +1,92 @@
+"""A model's reaction propensities compiled into generated Python functions."""
+
+import numpy as np
+from gillespy2.solvers.utilities.solverutils import dependency_graph, sanitized_propensities
+
+# Math functions available to propensities, as NumPy ufuncs so they apply to batches of states.
+PROPENSITY_FUNCTIONS = {'exp': np.exp, 'log': np.log, 'log10': np.log10, 'log2': np.log2, 'sqrt': np.sqrt,
+                        'cbrt': np.cbrt, 'pow': np.power, 'fabs': np.fabs, 'floor': np.floor, 'ceil': np.ceil,
+                        'sin': np.sin, 'cos': np.cos, 'tan': np.tan, 'asin': np.arcsin, 'acos': np.arccos,
+                        'atan': np.arctan, 'sinh': np.sinh, 'cosh': np.cosh, 'tanh': np.tanh}
+
+
+def fused_propensity_function(model, reactions=None, species=None, propensities=None):
+    """
+    Generate one function evaluating the propensity of every reaction, in place of a function per reaction.
+    Parameters and the volume are bound when the function is generated.
+    :param model: The model whose reactions are compiled.
+    :param reactions: Ordered list of reaction names, defaults to the model's order.
+    :param species: Ordered list of species names, defaults to the model's order.
+    :param propensities: The reactions' sanitized_propensities, if already computed.
+    :return: a function of a state, an array of populations indexed by species or a (states x species) batch,
+    and an optional output array, returning an array of propensities with a trailing reaction dimension.
+    """
+    if reactions is None:
+        reactions = list(model.listOfReactions.keys())
+    if species is None:
+        species = list(model.listOfSpecies.keys())
+    if propensities is None:
+        propensities = sanitized_propensities(model, reactions, species)
+    # A batch is transposed so S[i] is a species' populations across it. A single state is evaluated on Python
+    # numbers, whose arithmetic is faster than on NumPy scalars.
+    lines = ['def propensities(S, out=None):',
+             '    if type(S) is not list:',
+             '        S = _asarray(S)',
+             '        if S.ndim > 1:',
+             '            S = S.T',
+             '            if out is None:',
+             '                out = _empty(S.shape[1:] + ({},))'.format(len(reactions))]
+    for i, propensity in enumerate(propensities):
+        lines.append('            out[..., {}] = {}'.format(i, propensity))
+    lines += ['            return out',
+              '        S = S.tolist()',
+              '    values = [{}]'.format(', '.join(propensities)),
+              '    if out is None:',
+              '        return _array(values, dtype=_float64)',
+              '    out[:] = values',
+              '    return out']
+    namespace = propensity_namespace(model)
+    exec(compile('\n'.join(lines), '<propensities>', 'exec'), namespace)
+    return namespace['propensities']
+
+
+def propensity_update_functions(model, reactions=None, species=None, propensities=None):
+    """
+    Generate, for each reaction, a function refreshing only the propensities which read a species the reaction
+    changes, as given by dependency_graph, so a firing costs the reactions it affects rather than every reaction.
+    :param model: The model whose reactions are compiled.
+    :param reactions: Ordered list of reaction names, defaults to the model's order.
+    :param species: Ordered list of species names, defaults to the model's order.
+    :param propensities: The reactions' sanitized_propensities, if already computed.
+    :return: a list, indexed by reaction, of functions of a state and an array of propensities, updating the
+    propensities after the reaction fires in place and returning the change in their sum.
+    """
+    if reactions is None:
+        reactions = list(model.listOfReactions.keys())
+    if species is None:
+        species = list(model.listOfSpecies.keys())
+    if propensities is None:
+        propensities = sanitized_propensities(model, reactions, species)
+    lines = []
+    for i, dependents in enumerate(dependency_graph(model, reactions, species, propensities)):
+        lines.append('def update_{}(S, P):'.format(i))
+        for j in dependents:
+            lines.append('    A{} = {}'.format(j, propensities[j]))
+        lines.append('    change = {}'.format(' + '.join('(A{0} - P[{0}])'.format(j) for j in dependents) or '0.0'))
+        for j in dependents:
+            lines.append('    P[{0}] = A{0}'.format(j))
+        lines.append('    return change')
+    namespace = propensity_namespace(model)
+    exec(compile('\n'.join(lines), '<propensity updates>', 'exec'), namespace)
+    return [namespace['update_{}'.format(i)] for i in range(len(reactions))]
+
+
+def propensity_namespace(model):
+    """ :return: the globals of generated propensity code, binding the model's parameters and volume. """
+    namespace = dict(PROPENSITY_FUNCTIONS, _asarray=np.asarray, _array=np.array, _empty=np.empty,
+                     _float64=np.float64)
+    namespace['V'] = model.volume
+    parameter_mappings = model.sanitized_parameter_names()
+    for name, parameter in model.listOfParameters.items():
+        namespace[parameter_mappings[name]] = parameter.value
+    return namespace
@@ -0,0 +1,27 @@
+"""Reproducible random streams for the trajectories of stochastic simulations."""
+
+import numpy as np
+
+
+def trajectory_generators(seed, number_of_trajectories, first_trajectory=0):
+    """
+    Independent PCG64 generators for a block of trajectories, spawned from one SeedSequence so each is keyed by
+    (seed, trajectory index). Trajectory i draws the same numbers however an ensemble is split between runs,
+    threads or processes.
+    :param seed: Non-negative integer seed, or None for fresh entropy shared by the block.
+    :param number_of_trajectories: Number of generators.
+    :param first_trajectory: Trajectory index of the first generator.
+    :return: a list of numpy.random.Generator, one per trajectory.
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+    return [np.random.Generator(np.random.PCG64(np.random.SeedSequence(entropy, spawn_key=(trajectory,))))
+            for trajectory in range(first_trajectory, first_trajectory + number_of_trajectories)]
+
+
+def uniform_stream(generator, block_size=4096):
+    """
+    Uniform variates in [0, 1) from a generator, drawn a block at a time rather than with one call per number.
+    :return: an iterator of floats.
+    """
+    while True:
+        yield from generator.random(block_size).tolist()
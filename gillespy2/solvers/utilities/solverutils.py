@@ -0,0 +1,127 @@
+"""Model analysis and argument checks shared by the GillesPy2 solvers."""
+
+import re
+import numpy as np
+from gillespy2.core.gillespyError import SimulationError
+
+SPECIES_REFERENCE = re.compile(r'S\[(\d+)\]')
+
+
+def species_changes(model, reactions=None, species=None):
+    """
+    Sparse stoichiometry of each reaction.
+    :param model: The model whose reactions are analysed.
+    :param reactions: Ordered list of reaction names, defaults to the model's order.
+    :param species: Ordered list of species names, defaults to the model's order.
+    :return: a list, indexed by reaction, of dicts mapping species indices to their nonzero net change.
+    """
+    if reactions is None:
+        reactions = list(model.listOfReactions.keys())
+    if species is None:
+        species = list(model.listOfSpecies.keys())
+    # Reactants/products may be keyed by Species objects or by species names.
+    species_index = {}
+    for i, name in enumerate(species):
+        species_index[name] = i
+        species_index[model.listOfSpecies[name]] = i
+    changes = []
+    for reaction_name in reactions:
+        reaction = model.listOfReactions[reaction_name]
+        change = {}
+        for reactant, stoichiometry in reaction.reactants.items():
+            index = species_index[reactant]
+            change[index] = change.get(index, 0) - stoichiometry
+        for product, stoichiometry in reaction.products.items():
+            index = species_index[product]
+            change[index] = change.get(index, 0) + stoichiometry
+        changes.append({index: value for index, value in change.items() if value != 0})
+    return changes
+
+
+def reactant_stoichiometry(model, reactions=None, species=None):
+    """
+    Sparse reactant stoichiometry of each reaction, the number of molecules of each species consumed by a firing.
+    :param model: The model whose reactions are analysed.
+    :param reactions: Ordered list of reaction names, defaults to the model's order.
+    :param species: Ordered list of species names, defaults to the model's order.
+    :return: a list, indexed by reaction, of dicts mapping species indices to their reactant stoichiometry.
+    """
+    if reactions is None:
+        reactions = list(model.listOfReactions.keys())
+    if species is None:
+        species = list(model.listOfSpecies.keys())
+    species_index = {}
+    for i, name in enumerate(species):
+        species_index[name] = i
+        species_index[model.listOfSpecies[name]] = i
+    stoichiometries = []
+    for reaction_name in reactions:
+        reactants = {}
+        for reactant, stoichiometry in model.listOfReactions[reaction_name].reactants.items():
+            index = species_index[reactant]
+            reactants[index] = reactants.get(index, 0) + stoichiometry
+        stoichiometries.append(reactants)
+    return stoichiometries
+
+
+def sanitized_propensities(model, reactions=None, species=None):
+    """
+    Sanitized propensity function of each reaction, reading species as S[i] and parameters by sanitized name.
+    :param model: The model whose reactions are analysed.
+    :param reactions: Ordered list of reaction names, defaults to the model's order.
+    :param species: Ordered list of species names, defaults to the model's order.
+    :return: a list of propensity expressions, indexed by reaction.
+    """
+    if reactions is None:
+        reactions = list(model.listOfReactions.keys())
+    if species is None:
+        species = list(model.listOfSpecies.keys())
+    species_mappings = {name: 'S[{}]'.format(i) for i, name in enumerate(species)}
+    parameter_mappings = model.sanitized_parameter_names()
+    return [model.listOfReactions[reaction].sanitized_propensity_function(species_mappings, parameter_mappings).strip()
+            for reaction in reactions]
+
+
+def dependency_graph(model, reactions=None, species=None, propensities=None):
+    """
+    Determine, for each reaction, which reaction propensities must be recomputed after it fires: those whose
+    propensity function reads a species that the reaction changes.
+    :param model: The model whose reactions are analysed.
+    :param reactions: Ordered list of reaction names, defaults to the model's order.
+    :param species: Ordered list of species names, defaults to the model's order.
+    :param propensities: The reactions' sanitized_propensities, if already computed.
+    :return: a list, indexed by reaction, of sorted lists of dependent reaction indices.
+    """
+    if reactions is None:
+        reactions = list(model.listOfReactions.keys())
+    if species is None:
+        species = list(model.listOfSpecies.keys())
+    if propensities is None:
+        propensities = sanitized_propensities(model, reactions, species)
+    # Invert propensity reads so the graph is built in time linear in the number of references.
+    readers = [[] for _ in species]
+    for i, propensity in enumerate(propensities):
+        for index in set(int(match) for match in SPECIES_REFERENCE.findall(propensity)):
+            readers[index].append(i)
+    graph = []
+    for change in species_changes(model, reactions, species):
+        dependents = set()
+        for index in change:
+            dependents.update(readers[index])
+        graph.append(sorted(dependents))
+    return graph
+
+
+def validate_timeline(timeline):
+    """
+    Check an output timeline passed to a solver in place of an end time and increment. The times may be unevenly
+    spaced, and trajectories start from their initial state at the first one.
+    :param timeline: Sequence of output times.
+    :return: the timeline as a 1-D float64 array.
+    """
+    timeline = np.array(timeline, dtype=np.float64)
+    if timeline.ndim != 1 or timeline.size < 2:
+        raise SimulationError("A timeline needs at least two output times.")
+    if timeline[0] < 0 or np.any(np.diff(timeline) <= 0) or not np.all(np.isfinite(timeline)):
+        raise SimulationError("A timeline must be finite, non-negative and strictly increasing.")
+    return timeline
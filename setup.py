@@ -55,7 +55,7 @@ setup(name="gillespy2",
       long_description=full_description,
       long_description_content_type="text/markdown",
 
-      install_requires=["numpy",
+      install_requires=["numpy>=1.17",
                         "matplotlib",
                         "scipy"],
 
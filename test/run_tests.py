@@ -18,9 +18,12 @@ if __name__ == '__main__':
     import test_empty_model
     import test_model
     import test_ode_solver
+    import test_ode_c_solver
     import test_simple_model
     import test_ssa_solver
     import test_ssa_c_solver
+    import test_tau_leaping_c_solver
+    import test_solverutils
 
     modules = [
         test_basic_tau_hybrid_solver,
@@ -29,9 +32,12 @@ if __name__ == '__main__':
         test_empty_model,
         test_model,
         test_ode_solver,
+        test_ode_c_solver,
         test_simple_model,
         test_ssa_solver,
-        test_ssa_c_solver
+        test_ssa_c_solver,
+        test_tau_leaping_c_solver,
+        test_solverutils
     ]
 
     for module in modules:
@@ -54,6 +54,26 @@ class TestModel(unittest.TestCase):
         self.assertLess(results[species2.name][0], results[species2.name][-1])
         self.assertEqual(np.sum(results[species1.name]) + np.sum(results[species2.name]), number_points * species1.initial_value)
 
+    def test_nonuniform_timespan(self):
+        model = Model()
+        rate = Parameter(name='rate', expression=1)
+        model.add_parameter(rate)
+        species1 = Species('A', initial_value=100)
+        model.add_species(species1)
+        model.add_reaction(Reaction(name="decay", reactants={species1: 1}, products={}, rate=rate))
+        timespan = np.array([0, 0.01, 0.1, 1, 5])
+        model.timespan(timespan)
+        self.assertFalse(model.uniform_timespan())
+        from gillespy2.solvers.numpy.ssa_solver import NumPySSASolver
+        from gillespy2.solvers.numpy.basic_tau_leaping_solver import BasicTauLeapingSolver
+        results = model.run(solver=NumPySSASolver, seed=1)[0]
+        self.assertTrue(np.array_equal(results['time'], timespan))
+        self.assertEqual(results['A'][0], 100)
+        with self.assertRaises(SimulationError):
+            model.run(solver=BasicTauLeapingSolver)
+        with self.assertRaises(InvalidModelError):
+            model.timespan([0, 1, 1])
+
 
 if __name__ == '__main__':
     unittest.main()
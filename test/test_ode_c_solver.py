@@ -0,0 +1,88 @@
+import unittest
+import numpy as np
+from gillespy2 import Model, Species, Parameter, Reaction
+from gillespy2.core.gillespyError import ExecutionError, SolverError
+from gillespy2.example_models import Example, MichaelisMenten
+from gillespy2.solvers.cpp.ode_c_solver import ODECSolver
+from gillespy2.solvers.numpy.basic_ode_solver import BasicODESolver
+
+
+class TestODECSolver(unittest.TestCase):
+    def test_run_example(self):
+        model = Example()
+        results = model.run(solver=ODECSolver)
+
+    def test_exponential_decay(self):
+        model = Example()
+        for shared_library in (False, True):
+            solver = ODECSolver(model, shared_library=shared_library)
+            results = solver.run(t=1, increment=0.25, number_of_trajectories=2, show_labels=False)
+            self.assertEqual(results.shape, (2, 5, 2))
+            self.assertTrue(np.allclose(results[:, :, 1], 100 * np.exp(-3 * results[:, :, 0]), rtol=1e-4))
+
+    def test_matches_basic_ode_solver(self):
+        model = MichaelisMenten()
+        expected = model.run(solver=BasicODESolver)[0]
+        results = model.run(solver=ODECSolver)[0]
+        for species in model.listOfSpecies:
+            self.assertTrue(np.allclose(results[species][:len(expected[species])], expected[species], rtol=1e-3, atol=1e-3))
+
+    def test_overrides(self):
+        model = Example()
+        for persistent_workers in (0, 1):
+            solver = ODECSolver(model, persistent_workers=persistent_workers)
+            results = solver.run(t=1, increment=0.5, show_labels=False, parameters={'k1': 1},
+                                 initial_state=[[10], [20]])
+            self.assertEqual(results.shape, (2, 1, 3, 2))
+            self.assertTrue(np.allclose(results[1, 0, :, 1], 20 * np.exp(-results[1, 0, :, 0]), rtol=1e-4))
+
+    def test_custom_timeline(self):
+        model = MichaelisMenten()
+        model.timespan(np.array([0, 0.5, 2, 10, 50, 100]))
+        expected = model.run(solver=BasicODESolver)[0]
+        for shared_library in (False, True):
+            results = model.run(solver=ODECSolver(model, shared_library=shared_library))[0]
+            self.assertTrue(np.array_equal(results['time'], model.tspan))
+            for species in model.listOfSpecies:
+                self.assertTrue(np.allclose(results[species], expected[species], rtol=1e-3, atol=1e-3))
+
+    def test_stochastic_options_rejected(self):
+        solver = ODECSolver(Example())
+        for options in ({'output': 'summary'}, {'record': 'events'}, {'algorithm': 'direct'}, {'num_threads': 2},
+                        {'histogram_bins': 10}):
+            with self.assertRaises(SolverError):
+                solver.run(t=1, increment=0.5, **options)
+        # Options every solver is passed by Model.run are still accepted.
+        solver.run(t=1, increment=0.5, stochkit_home=None)
+
+    def test_parameter_sweep(self):
+        model = Example()
+        for options in ({}, {'shared_library': True}, {'persistent_workers': 1}):
+            solver = ODECSolver(model, **options)
+            swept = solver.sweep({'k1': [0, 1, 3]}, number_of_trajectories=2, t=1, increment=0.5,
+                                 initial_state=[[10], [20], [30]])
+            self.assertEqual(swept.shape, (3, 2, 3, 2))
+            for point, (k1, population) in enumerate([(0, 10), (1, 20), (3, 30)]):
+                self.assertTrue(np.allclose(swept[point, :, :, 1], population * np.exp(-k1 * swept[point, :, :, 0]),
+                                            rtol=1e-4))
+            solver.close()
+
+    def test_step_size_underflow(self):
+        # Autocatalysis whose rate grows with the square of its population blows up in finite time, so the steps
+        # shrink without bound rather than reaching the end of the timespan.
+        model = Model(name='Explosion')
+        A = Species(name='A', initial_value=10)
+        model.add_species([A])
+        k = Parameter(name='k', expression=1.0)
+        model.add_parameter([k])
+        model.add_reaction(Reaction(name='r', reactants={A: 2}, products={A: 3}, rate=k))
+        model.timespan(np.linspace(0, 1, 11))
+        for options in ({}, {'shared_library': True}, {'persistent_workers': 1}):
+            solver = ODECSolver(model, **options)
+            with self.assertRaises(ExecutionError):
+                solver.run(show_labels=False)
+            solver.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import numpy as np
+from gillespy2.core import Model, Species, Reaction, Parameter
+from gillespy2.solvers.utilities import species_changes, reactant_stoichiometry, dependency_graph, EventLog, \
+    trajectory_generators, uniform_stream, fused_propensity_function, propensity_update_functions
+
+
+class DependencyModel(Model):
+    def __init__(self, parameter_values=None):
+        Model.__init__(self, name="DependencyModel")
+        A = Species(name='A', initial_value=10)
+        B = Species(name='B', initial_value=10)
+        C = Species(name='C', initial_value=10)
+        self.add_species([A, B, C])
+        k = Parameter(name='k', expression=1)
+        self.add_parameter([k])
+        # produce_A reads nothing, convert reads A and B, degrade_C reads C
+        produce_A = Reaction(name='produce_A', reactants={}, products={A: 1}, rate=k)
+        convert = Reaction(name='convert', reactants={A: 1, B: 1}, products={C: 1, B: 1}, rate=k)
+        degrade_C = Reaction(name='degrade_C', reactants={C: 1}, products={}, propensity_function='k*C')
+        self.add_reaction([produce_A, convert, degrade_C])
+
+
+class TestSolverUtils(unittest.TestCase):
+    def setUp(self):
+        self.model = DependencyModel()
+
+    def test_species_changes(self):
+        # B is both consumed and produced by convert, so it has no net change.
+        self.assertEqual(species_changes(self.model), [{0: 1}, {0: -1, 2: 1}, {2: -1}])
+
+    def test_reactant_stoichiometry(self):
+        # B is consumed by convert even though it is also produced.
+        self.assertEqual(reactant_stoichiometry(self.model), [{}, {0: 1, 1: 1}, {2: 1}])
+
+    def test_dependency_graph(self):
+        self.assertEqual(dependency_graph(self.model), [[1], [1, 2], [2]])
+
+    def test_fused_propensity_function(self):
+        propensities = fused_propensity_function(self.model)
+        self.assertTrue(np.array_equal(propensities(np.array([2., 3., 5.])), [1, 6, 5]))
+        self.assertTrue(np.array_equal(propensities([2, 3, 5]), [1, 6, 5]))
+        batch = np.array([[2., 3., 5.], [1., 0., 4.]])
+        self.assertTrue(np.array_equal(propensities(batch), [[1, 6, 5], [1, 0, 4]]))
+        out = np.empty(3)
+        self.assertIs(propensities(batch[1], out), out)
+        self.assertTrue(np.array_equal(out, [1, 0, 4]))
+
+    def test_propensity_update_functions(self):
+        propensities = fused_propensity_function(self.model)
+        updates = propensity_update_functions(self.model)
+        state = [2., 3., 5.]
+        current = propensities(state).tolist()
+        # convert changes A and C, so only the propensities of convert and degrade_C are refreshed
+        state = [1., 3., 6.]
+        current[0] = -1
+        self.assertEqual(updates[1](state, current), (3 - 6) + (6 - 5))
+        self.assertEqual(current, [-1, 3, 6])
+
+    def test_trajectory_generators(self):
+        whole = [generator.random(3) for generator in trajectory_generators(5, 4)]
+        split = [generator.random(3) for generator in trajectory_generators(5, 2, first_trajectory=2)]
+        self.assertTrue(np.array_equal(whole[2:], split))
+        self.assertFalse(np.array_equal(whole[0], whole[1]))
+        uniforms = uniform_stream(trajectory_generators(5, 1)[0], block_size=2)
+        self.assertTrue(np.array_equal([next(uniforms) for _ in range(3)], whole[0]))
+
+    def test_event_log(self):
+        event_log = EventLog.from_lists(self.model, [[0.5, 1, 2], []], [[0, 1, 2], []], [[10, 10, 10], [1, 2, 3]])
+        self.assertEqual(len(event_log), 2)
+        self.assertTrue(np.array_equal(event_log.state(0.9), [11, 10, 10]))
+        # Times may be in any order, and include the time of an event.
+        self.assertTrue(np.array_equal(event_log.state([3, 0, 1]), [[10, 10, 10], [10, 10, 10], [10, 10, 11]]))
+        self.assertTrue(np.array_equal(event_log.state(5, trajectory=1), [1, 2, 3]))
+        times, populations = event_log.path()
+        self.assertTrue(np.array_equal(times, [0.5, 1, 2]))
+        self.assertTrue(np.array_equal(populations, [[10, 10, 10], [11, 10, 10], [10, 10, 11], [10, 10, 10]]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,15 @@
+import os
 import unittest
 import tempfile
-from gillespy2.core.gillespyError import DirectoryError
-from gillespy2.example_models import Example
-from gillespy2.solvers.cpp.ssa_c_solver import SSACSolver
+from unittest import mock
+import numpy as np
+from gillespy2.core.gillespyError import DirectoryError, ExecutionError, ParameterError, SimulationError, SolverError
+from gillespy2.example_models import Example, MichaelisMenten, Schlogl
+from gillespy2.solvers.cpp.ssa_c_solver import SSACSolver, parse_binary_output, parse_output, get_runtime_key, RUNTIME_TARGET, \
+    MAX_SEED, RUNTIME_LOCK, get_build_key, SimulationWorker
+from gillespy2.solvers.cpp.build_cache import BuildCache
+from gillespy2.solvers.cpp.propensity_code import PropensityCode
+from gillespy2 import Model, Species, Parameter, Reaction
 
 
 class TestSSACSolver(unittest.TestCase):
@@ -25,6 +32,386 @@ class TestSSACSolver(unittest.TestCase):
         model = Example()
         results = model.run(solver=SSACSolver)
 
+    def test_threads_reproducible(self):
+        model = Example()
+        solver = SSACSolver(model)
+        single = model.run(solver=solver, number_of_trajectories=8, seed=1, show_labels=False)
+        threaded = solver.run(t=model.tspan[-1], increment=model.tspan[-1] - model.tspan[-2],
+                              number_of_trajectories=8, seed=1, show_labels=False, num_threads=4)
+        self.assertTrue(np.array_equal(single, threaded))
+
+    def test_seeds(self):
+        model = Example()
+        solvers = (SSACSolver(model), SSACSolver(model, shared_library=True), SSACSolver(model, persistent_workers=1))
+        results = [solver.run(t=2, increment=0.5, number_of_trajectories=4, seed=MAX_SEED, show_labels=False)
+                   for solver in solvers]
+        for result in results[1:]:
+            self.assertTrue(np.array_equal(results[0], result))
+        for solver in solvers:
+            unseeded = [solver.run(t=2, increment=0.5, number_of_trajectories=4, show_labels=False) for _ in range(2)]
+            self.assertFalse(np.array_equal(unseeded[0], unseeded[1]))
+            for seed in (-1, MAX_SEED + 1, 1.5):
+                with self.assertRaises(SimulationError):
+                    solver.run(seed=seed)
+            solver.close()
+
+    def test_split_ensemble_reproducible(self):
+        model = Example()
+        for solver in (SSACSolver(model), SSACSolver(model, shared_library=True),
+                       SSACSolver(model, persistent_workers=1)):
+            for algorithm in solver.algorithms:
+                whole = solver.run(t=1, increment=0.25, number_of_trajectories=6, seed=3, show_labels=False,
+                                   algorithm=algorithm, num_threads=2)
+                first = solver.run(t=1, increment=0.25, number_of_trajectories=2, seed=3, show_labels=False,
+                                   algorithm=algorithm)
+                rest = solver.run(t=1, increment=0.25, number_of_trajectories=4, seed=3, show_labels=False,
+                                  algorithm=algorithm, first_trajectory=2)
+                self.assertTrue(np.array_equal(whole, np.concatenate([first, rest])))
+                self.assertFalse(np.array_equal(whole[0], whole[1]))
+
+    def test_shared_library(self):
+        model = Example()
+        executable_solver = SSACSolver(model)
+        library_solver = SSACSolver(model, shared_library=True)
+        executable_results = model.run(solver=executable_solver, number_of_trajectories=3, seed=1, show_labels=False)
+        library_results = model.run(solver=library_solver, number_of_trajectories=3, seed=1, show_labels=False)
+        self.assertTrue(np.array_equal(executable_results, library_results))
+
+    def test_parameter_overrides(self):
+        model = Example()
+        for shared_library in (False, True):
+            solver = SSACSolver(model, shared_library=shared_library)
+            frozen = solver.run(t=20, increment=1, seed=1, show_labels=False, parameters={'k1': 0})
+            self.assertTrue(np.all(frozen[0, :, 1] == model.listOfSpecies['Sp'].initial_value))
+            model.listOfParameters['k1'].value = 0
+            recompiled = model.run(solver=SSACSolver(model, shared_library=shared_library), seed=1, show_labels=False)
+            model.listOfParameters['k1'].value = 3.0
+            overridden = solver.run(t=model.tspan[-1], increment=model.tspan[-1] - model.tspan[-2], seed=1,
+                                    show_labels=False, parameters={'k1': 0})
+            self.assertTrue(np.array_equal(recompiled, overridden))
+            with self.assertRaises(ParameterError):
+                solver.run(parameters={'not_a_parameter': 1})
+
+    def test_propensity_code(self):
+        code = PropensityCode(['0.5*P0*S[0]*(S[0]-1)/V', 'P1*S[0]*S[1]/V', 'S[0]/S[1]*P1',
+                               'P0*pow(S[0], P1)/(pow(P1, P1)+pow(S[0], P1))', 'P1*V', 'S[0] > 1'],
+                              ['V', 'P0', 'P1'])
+        self.assertEqual(code.constants, ['0.5*P0/V', 'P1/V', 'pow(P1, P1)', 'P1*V'])
+        self.assertEqual(code.cases, [
+            ([], 'C0*S[0]*(S[0]-1)'),
+            ([], 'C1*S[0]*S[1]'),
+            # Integer division of the populations comes first, so the product is left as is
+            ([], 'S[0]/S[1]*P1'),
+            (['const auto E0 = pow(S[0], P1);'], 'P0*E0/(C2+E0)'),
+            ([], 'C3'),
+            ([], 'S[0] > 1'),
+        ])
+
+    def test_folded_constants_follow_parameters(self):
+        model = Model(name='Switch')
+        model.add_parameter([Parameter(name='k', expression=20), Parameter(name='K', expression=5),
+                             Parameter(name='d', expression=0.5)])
+        A = Species(name='A', initial_value=10)
+        model.add_species(A)
+        model.add_reaction([
+            Reaction(name='production', products={A: 1},
+                     propensity_function='k*vol*(1+pow(A,2)/(pow(K,2)+pow(A,2)))'),
+            Reaction(name='degradation', reactants={A: 1}, rate=model.listOfParameters['d'])])
+        for shared_library in (False, True):
+            solver = SSACSolver(model, shared_library=shared_library)
+            growing = solver.run(t=10, increment=1, seed=1, show_labels=False)
+            self.assertGreater(growing[0, -1, 1], 10)
+            decaying = solver.run(t=10, increment=1, seed=1, show_labels=False, parameters={'k': 0})
+            self.assertTrue(np.all(np.diff(decaying[0, :, 1]) <= 0))
+
+    def test_initial_state_overrides(self):
+        model = Example()
+        for shared_library in (False, True):
+            solver = SSACSolver(model, shared_library=shared_library)
+            results = solver.run(t=1, increment=0.5, seed=1, show_labels=False, initial_state={'Sp': 7})
+            self.assertEqual(results[0, 0, 1], 7)
+            batch = solver.run(t=1, increment=0.5, number_of_trajectories=3, seed=1, show_labels=False,
+                               initial_state=[[5], [50], [500]])
+            self.assertEqual(batch.shape, (3, 3, 3, 2))
+            self.assertTrue(np.array_equal(batch[:, :, 0, 1], [[5] * 3, [50] * 3, [500] * 3]))
+            labeled = solver.run(t=1, increment=0.5, seed=1, initial_state=np.array([[5], [50]]))
+            self.assertEqual(labeled[1][0]['Sp'][0], 50)
+
+    def test_next_reaction_method(self):
+        model = Example()
+        for shared_library in (False, True):
+            solver = SSACSolver(model, shared_library=shared_library)
+            direct = solver.run(t=1, increment=0.25, number_of_trajectories=1000, seed=1, show_labels=False)
+            nrm = solver.run(t=1, increment=0.25, number_of_trajectories=1000, seed=1, show_labels=False,
+                             algorithm='nrm')
+            self.assertEqual(direct.shape, nrm.shape)
+            self.assertTrue(np.array_equal(direct[:, :, 0], nrm[:, :, 0]))
+            self.assertTrue(np.allclose(direct[:, :, 1].mean(axis=0), nrm[:, :, 1].mean(axis=0), atol=1.5))
+            with self.assertRaises(SolverError):
+                solver.run(algorithm='not_an_algorithm')
+
+    def test_composition_rejection(self):
+        model = Example()
+        for shared_library in (False, True):
+            solver = SSACSolver(model, shared_library=shared_library)
+            direct = solver.run(t=1, increment=0.25, number_of_trajectories=1000, seed=1, show_labels=False)
+            cr = solver.run(t=1, increment=0.25, number_of_trajectories=1000, seed=1, show_labels=False,
+                            algorithm='cr')
+            self.assertEqual(direct.shape, cr.shape)
+            self.assertTrue(np.array_equal(direct[:, :, 0], cr[:, :, 0]))
+            self.assertTrue(np.allclose(direct[:, :, 1].mean(axis=0), cr[:, :, 1].mean(axis=0), atol=1.5))
+
+    def test_persistent_workers(self):
+        model = Example()
+        expected_solver = SSACSolver(model)
+        expected = expected_solver.run(t=5, increment=1, number_of_trajectories=3, seed=1, show_labels=False,
+                                       parameters={'k1': 0.5}, initial_state={'Sp': 40})
+        solver = SSACSolver(model, persistent_workers=2)
+        for _ in range(3):
+            results = solver.run(t=5, increment=1, number_of_trajectories=3, seed=1, show_labels=False,
+                                 parameters={'k1': 0.5}, initial_state={'Sp': 40})
+            self.assertTrue(np.array_equal(expected, results))
+        self.assertEqual(len(solver.worker_pool.idle_workers), 1)
+        worker = solver.worker_pool.idle_workers[0]
+        integers = solver.run(t=5, increment=1, number_of_trajectories=3, seed=1, show_labels=False,
+                              parameters={'k1': 0.5}, initial_state={'Sp': 40}, integer_output=True)
+        self.assertTrue(np.array_equal(expected[:, :, 1:], integers))
+        with self.assertRaises(ExecutionError):
+            solver.run_worker(1, 2, 1, 1, 1, False, None, solver.get_initial_states(None), 'not_an_algorithm')
+        # Errors are reported without restarting the worker.
+        self.assertIs(solver.worker_pool.idle_workers[0], worker)
+        solver.close()
+        self.assertEqual(worker.process.returncode, 0)
+
+    def test_worker_exit_reports_stderr(self):
+        with tempfile.TemporaryDirectory() as directory:
+            executable = os.path.join(directory, 'failing_worker')
+            with open(executable, 'w') as script:
+                script.write('#!/bin/sh\necho "unable to start worker" >&2\nexit 3\n')
+            os.chmod(executable, 0o755)
+            worker = SimulationWorker(executable)
+            with self.assertRaises(ExecutionError) as context:
+                worker.run(bytes(64))
+            self.assertIn('Return code: 3', str(context.exception))
+            self.assertIn('unable to start worker', str(context.exception))
+            self.assertFalse(worker.healthy)
+            worker.close()
+
+    def test_custom_timeline(self):
+        model = Example()
+        uniform = SSACSolver(model).run(t=2, increment=0.5, number_of_trajectories=3, seed=1, show_labels=False)
+        model.timespan(np.array([0, 0.01, 0.1, 1, 10]))
+        for solver in (SSACSolver(model), SSACSolver(model, shared_library=True),
+                       SSACSolver(model, persistent_workers=1)):
+            results = model.run(solver=solver, number_of_trajectories=3, seed=1, show_labels=False)
+            self.assertTrue(np.array_equal(results[0, :, 0], model.tspan))
+            self.assertTrue(np.all(np.diff(results[:, :, 1], axis=1) <= 0))
+            for algorithm in solver.algorithms:
+                # Evenly spaced timelines match runs from t and increment.
+                timeline = solver.run(timeline=np.linspace(0, 2, 5), number_of_trajectories=3, seed=1,
+                                      show_labels=False, algorithm=algorithm)
+                expected = uniform if algorithm == 'direct' else timeline
+                self.assertTrue(np.array_equal(expected, timeline))
+            # Trajectories start from their initial state at the first output time.
+            delayed = solver.run(timeline=[1, 1.5, 3], seed=1, show_labels=False)
+            self.assertTrue(np.array_equal(delayed[0, :, 0], [1, 1.5, 3]))
+            self.assertEqual(delayed[0, 0, 1], model.listOfSpecies['Sp'].initial_value)
+        with self.assertRaises(SimulationError):
+            solver.run(timeline=[0, 2, 1])
+
+    def test_record_events(self):
+        model = Example()
+        expected = None
+        for solver in (SSACSolver(model), SSACSolver(model, shared_library=True),
+                       SSACSolver(model, persistent_workers=1)):
+            for algorithm in solver.algorithms:
+                results, event_log = solver.run(t=1, increment=0.25, number_of_trajectories=3, seed=1,
+                                                show_labels=False, algorithm=algorithm, record='events')
+                self.assertIs(solver.event_log, event_log)
+                self.assertEqual(len(event_log), 3)
+                for trajectory in range(3):
+                    times, reaction_numbers = event_log.events(trajectory)
+                    self.assertTrue(np.all(np.diff(times) >= 0) and np.all(times <= 1))
+                    # The grid is the event log sampled at the output times.
+                    self.assertTrue(np.array_equal(event_log.state(results[trajectory, :, 0], trajectory),
+                                                   results[trajectory, :, 1:]))
+                if algorithm == 'direct':
+                    if expected is None:
+                        expected = event_log
+                    self.assertTrue(np.array_equal(expected.times, event_log.times))
+                    self.assertTrue(np.array_equal(expected.offsets, event_log.offsets))
+        with self.assertRaises(SolverError):
+            solver.run(record='not_a_record_mode')
+
+    def test_summary_output(self):
+        model = Example()
+        for solver in (SSACSolver(model), SSACSolver(model, shared_library=True),
+                       SSACSolver(model, persistent_workers=1)):
+            trajectories = solver.run(t=2, increment=0.5, number_of_trajectories=20, seed=2, show_labels=False,
+                                      num_threads=2, integer_output=True, initial_state=[[20], [80]])
+            summary = solver.run(t=2, increment=0.5, number_of_trajectories=20, seed=2, num_threads=3,
+                                 initial_state=[[20], [80]], output='summary', histogram_bins=10,
+                                 histogram_range=(20, 70))
+            self.assertIs(summary, solver.summary)
+            self.assertTrue(np.array_equal(summary.number_of_trajectories, [20, 20]))
+            self.assertTrue(np.allclose(summary.means, trajectories.mean(axis=1)))
+            self.assertTrue(np.allclose(summary.variances, trajectories.var(axis=1)))
+            bins = np.clip(np.floor((trajectories.astype(np.int64) - 20) / 5), 0, 9).astype(int)
+            self.assertTrue(np.array_equal(summary.histograms, (bins[..., np.newaxis] == np.arange(10)).sum(axis=1)))
+            self.assertTrue(np.array_equal(summary.bin_edges, np.linspace(20, 70, 11)))
+            single = solver.run(t=2, increment=0.5, number_of_trajectories=20, seed=2, output='summary')
+            self.assertEqual(single.means.shape, (5, 1))
+            self.assertIsNone(single.histograms)
+            self.assertTrue(np.array_equal(single.statistics('Sp')['time'], [0, 0.5, 1, 1.5, 2]))
+        with self.assertRaises(SolverError):
+            solver.run(output='summary', record='events')
+        with self.assertRaises(SolverError):
+            solver.run(output='not_an_output')
+
+    def test_parameter_sweep(self):
+        model = Example()
+        for solver in (SSACSolver(model), SSACSolver(model, shared_library=True),
+                       SSACSolver(model, persistent_workers=1)):
+            swept = solver.sweep({'k1': [0, 1, 3]}, number_of_trajectories=3, t=2, increment=0.5, seed=1,
+                                 num_threads=2)
+            self.assertEqual(swept.shape, (3, 3, 5, 2))
+            for point, k1 in enumerate([0, 1, 3]):
+                single = solver.run(t=2, increment=0.5, number_of_trajectories=3, seed=1, show_labels=False,
+                                    parameters={'k1': k1}, first_trajectory=point * 3)
+                self.assertTrue(np.array_equal(swept[point], single))
+            summary = solver.sweep([{'k1': 0}, {'k1': 2}], number_of_trajectories=10, t=2, increment=0.5, seed=1,
+                                   output='summary', initial_state=[[20], [80]])
+            self.assertEqual(summary.means.shape, (2, 5, 1))
+            self.assertTrue(np.all(summary.means[0] == [[20], [20], [20], [20], [20]]))
+            self.assertTrue(np.all(summary.variances[0] == 0))
+            self.assertTrue(np.all(summary.means[1, 1:] < 80))
+            with self.assertRaises(ParameterError):
+                solver.sweep({'not_a_parameter': [1, 2]})
+            with self.assertRaises(SimulationError):
+                solver.sweep({'k1': [1, 2, 3]}, initial_state=[[20], [80]])
+
+    def test_parse_binary_output(self):
+        timeline = np.linspace(0, 1, 3)
+        populations = np.arange(2 * 3 * 4, dtype=np.float64).reshape(2, 3, 4)
+        header = np.array([2, 3, 4, ord('f'), 8], dtype=np.uint32)
+        parsed_timeline, parsed_populations = parse_binary_output(header.tobytes() + timeline.tobytes() + populations.tobytes())
+        self.assertTrue(np.array_equal(parsed_timeline, timeline))
+        self.assertTrue(np.array_equal(parsed_populations, populations))
+
+    def test_integer_output(self):
+        model = Example()
+        for shared_library in (False, True):
+            solver = SSACSolver(model, shared_library=shared_library)
+            floats = model.run(solver=solver, number_of_trajectories=2, seed=1, show_labels=False)
+            integers = solver.run(t=model.tspan[-1], increment=model.tspan[-1] - model.tspan[-2],
+                                  number_of_trajectories=2, seed=1, show_labels=False, integer_output=True)
+            self.assertEqual(integers.dtype, np.uint32)
+            self.assertTrue(np.array_equal(floats[:, :, 1:], integers))
+            self.assertTrue(np.array_equal(floats[0, :, 0], solver.timeline))
+
+    def test_parse_output(self):
+        # Text output lists each timestep, then every trajectory's species at that time.
+        results = ['0 1 2 3 4', '1 5 6 7 8']
+        trajectory_base = parse_output(results, 2, 2, 2)
+        self.assertTrue(np.array_equal(trajectory_base[1, :, 0], [0, 1]))
+        self.assertTrue(np.array_equal(trajectory_base[1, 1, 1:], [7, 8]))
+
+    def test_build_cache_reused(self):
+        with tempfile.TemporaryDirectory() as cache_directory:
+            cache = BuildCache(cache_directory)
+            model = Example()
+            solver = SSACSolver(model, cache=cache)
+            self.assertTrue(os.path.isfile(cache.entry_path(solver.build_key)))
+            cached_solver = SSACSolver(Example(), cache=cache)
+            self.assertEqual(solver.build_key, cached_solver.build_key)
+            results = model.run(solver=cached_solver)
+            self.assertEqual(len(results[0]['time']), len(model.tspan))
+
+    def test_runtime_shared_between_models(self):
+        with tempfile.TemporaryDirectory() as cache_directory:
+            cache = BuildCache(cache_directory)
+            solver = SSACSolver(Example(), cache=cache)
+            self.assertFalse(solver.runtime_cached)
+            self.assertTrue(os.path.isfile(cache.entry_path(get_runtime_key())))
+            model = MichaelisMenten()
+            other_solver = SSACSolver(model, cache=cache)
+            self.assertTrue(other_solver.runtime_cached)
+            # Only the generated simulation was compiled.
+            self.assertFalse(os.path.exists(os.path.join(other_solver.output_directory, 'model.o')))
+            self.assertTrue(os.path.isfile(os.path.join(other_solver.output_directory, RUNTIME_TARGET)))
+            results = model.run(solver=other_solver)
+            self.assertEqual(len(results[0]['time']), len(model.tspan))
+
+    def test_build_keys_include_compiler(self):
+        solver = SSACSolver(Example(), cache=False)
+        build_key = get_build_key(solver.output_directory, solver.target)
+        runtime_key = get_runtime_key()
+        with mock.patch('gillespy2.solvers.cpp.ssa_c_solver.compiler_version', 'g++ (other) 1.0'):
+            self.assertNotEqual(build_key, get_build_key(solver.output_directory, solver.target))
+            self.assertNotEqual(runtime_key, get_runtime_key())
+
+    def test_uncached_runtime_unlocked(self):
+        # Without a cache the runtime is private to the solver, so its build does not wait on other builds.
+        with RUNTIME_LOCK:
+            solver = SSACSolver(Example(), cache=False)
+        self.assertFalse(solver.runtime_cached)
+        self.assertTrue(os.path.isfile(os.path.join(solver.output_directory, RUNTIME_TARGET)))
+
+    def test_build_profiles(self):
+        model = Example()
+        default = SSACSolver(model)
+        self.assertEqual(default.build_flags, '-O3')
+        expected = model.run(solver=default, seed=1, show_labels=False)
+        for build_profile in ('native', 'pgo'):
+            solver = SSACSolver(model, cache=False, build_profile=build_profile)
+            self.assertIn('-march=native', solver.build_flags)
+            self.assertEqual(build_profile == 'pgo', '-fprofile-use' in solver.build_flags)
+            results = model.run(solver=solver, seed=1, show_labels=False)
+            self.assertTrue(np.array_equal(expected[:, :, 0], results[:, :, 0]))
+        with self.assertRaises(SolverError):
+            SSACSolver(model, build_profile='not_a_profile')
+
+    def test_profile_guided_library(self):
+        # The library is rebuilt from the profile its calibration run recorded, rather than without one.
+        model = Example()
+        with mock.patch('gillespy2.solvers.cpp.ssa_c_solver.log') as log:
+            solver = SSACSolver(model, shared_library=True, cache=False, build_profile='pgo')
+        for call in log.warning.call_args_list:
+            self.assertNotIn('-Wmissing-profile', call[0][0])
+        expected = model.run(solver=SSACSolver(model), seed=1, show_labels=False)
+        results = model.run(solver=solver, seed=1, show_labels=False)
+        self.assertTrue(np.array_equal(expected, results))
+
+    def test_compile_async(self):
+        model = Example()
+        future = SSACSolver.compile_async(model, cache=False)
+        solver = future.result()
+        self.assertTrue(solver.compiled)
+        results = model.run(solver=solver)
+        self.assertEqual(len(results[0]['time']), len(model.tspan))
+
+    def test_compile_many(self):
+        with tempfile.TemporaryDirectory() as cache_directory:
+            models = [Example(), MichaelisMenten(), Schlogl()]
+            solvers = SSACSolver.compile_many(models, max_workers=2, cache=BuildCache(cache_directory))
+            self.assertEqual(len(solvers), len(models))
+            for model, solver in zip(models, solvers):
+                # run() waits for the build to finish.
+                results = model.run(solver=solver)
+                self.assertTrue(solver.compiled)
+                self.assertEqual(set(results[0].keys()), set(['time'] + list(model.listOfSpecies.keys())))
+
+    def test_build_cache_eviction(self):
+        with tempfile.TemporaryDirectory() as cache_directory:
+            cache = BuildCache(cache_directory, max_size=1)
+            with tempfile.NamedTemporaryFile() as artifact:
+                artifact.write(b'artifact')
+                artifact.flush()
+                cache.store('first', artifact.name)
+                cache.store('second', artifact.name)
+            self.assertFalse(os.path.exists(cache.entry_path('first')))
+            self.assertTrue(os.path.exists(cache.entry_path('second')))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,8 @@
 import unittest
-from gillespy2.example_models import Example
+import numpy as np
+from unittest import mock
+from gillespy2.solvers.numpy import ssa_solver
+from gillespy2.example_models import Example, MichaelisMenten
 from gillespy2.solvers.numpy.ssa_solver import NumPySSASolver
 
 
@@ -9,6 +12,71 @@ class TestNumPySSASolver(unittest.TestCase):
         model = Example()
         results = model.run(solver=NumPySSASolver)
 
+    def test_split_ensemble_reproducible(self):
+        model = Example()
+        whole = NumPySSASolver.run(model, timeline=np.linspace(0, 1, 5), number_of_trajectories=4, seed=3, show_labels=False)
+        first = NumPySSASolver.run(model, timeline=np.linspace(0, 1, 5), number_of_trajectories=1, seed=3, show_labels=False)
+        rest = NumPySSASolver.run(model, timeline=np.linspace(0, 1, 5), number_of_trajectories=3, seed=3, show_labels=False,
+                                  first_trajectory=1)
+        self.assertTrue(np.array_equal(whole, first + rest))
+        self.assertFalse(np.array_equal(whole[0], whole[1]))
+
+    def test_record_events(self):
+        model = Example()
+        results, event_log = NumPySSASolver.run(model, timeline=np.linspace(0, 1, 5), number_of_trajectories=2,
+                                                seed=1, show_labels=False, record='events')
+        for trajectory in range(2):
+            times, reaction_numbers = event_log.events(trajectory)
+            self.assertTrue(np.all(times <= 1))
+            self.assertTrue(np.array_equal(event_log.state(results[trajectory][:, 0], trajectory),
+                                           results[trajectory][:, 1:]))
+
+    def test_drifted_propensity_sum(self):
+        # Updates overstating each change leave the running sum above the exact one between resums.
+        update_functions = ssa_solver.propensity_update_functions
+        def drifting_updates(*args):
+            return [lambda S, P, update=update: update(S, P) + 1000 for update in update_functions(*args)]
+        draws = []
+        uniform_stream = ssa_solver.uniform_stream
+        def counted_uniforms(generator):
+            for uniform in uniform_stream(generator):
+                draws.append(uniform)
+                yield uniform
+        model = MichaelisMenten()
+        with mock.patch.object(ssa_solver, 'propensity_update_functions', drifting_updates), \
+                mock.patch.object(ssa_solver, 'uniform_stream', counted_uniforms):
+            results, event_log = NumPySSASolver.run(model, timeline=np.linspace(0, 10, 6), seed=1,
+                                                    show_labels=False, record='events')
+        # Each draw of a time and reaction fires a reaction, only the last falling after the end of the timeline.
+        self.assertEqual(len(event_log.times), len(draws) // 2 - 1)
+        self.assertTrue(np.array_equal(event_log.state(results[0][:, 0], 0), results[0][:, 1:]))
+
+    def test_ensemble(self):
+        for model, timeline in ((Example(), np.linspace(0, 5, 11)), (MichaelisMenten(), np.linspace(0, 10, 6))):
+            sequential, sequential_log = NumPySSASolver.run(model, timeline=timeline, number_of_trajectories=5,
+                                                            seed=2, show_labels=False, record='events')
+            ensemble, ensemble_log = NumPySSASolver.run(model, timeline=timeline, number_of_trajectories=5, seed=2,
+                                                        show_labels=False, record='events', ensemble=True)
+            self.assertTrue(np.array_equal(sequential, ensemble))
+            self.assertTrue(np.array_equal(sequential_log.offsets, ensemble_log.offsets))
+            self.assertTrue(np.array_equal(sequential_log.reaction_numbers, ensemble_log.reaction_numbers))
+            self.assertTrue(np.allclose(sequential_log.times, ensemble_log.times, rtol=1e-12, atol=0))
+
+    def test_ensemble_unclaimed_draw(self):
+        # The largest uniform below 1 times these propensities' sum is left above zero by subtracting them in turn.
+        class LargestUniform:
+            def random(self, size):
+                return np.full(size, 1 - 2 ** -53)
+        timeline = np.array([0, 10, 30])
+        trajectory_base = np.zeros((1, 3, 2))
+        trajectory_base[:, :, 0] = timeline
+        times, reactions = NumPySSASolver.simulate_ensemble(trajectory_base, timeline,
+                                                            lambda S: np.tile([0.4, 0.8, 0.3], (len(S), 1)),
+                                                            np.array([[1], [10], [100]]), [LargestUniform()], True)
+        # The draw goes to the last reaction, firing once before the final output time.
+        self.assertTrue(np.array_equal(trajectory_base[0, :, 1], [0, 0, 100]))
+        self.assertTrue(np.array_equal(reactions[0], [2]))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+from gillespy2.core.gillespyError import SolverError
+from gillespy2.example_models import Example
+from gillespy2.solvers.cpp.ssa_c_solver import SSACSolver
+from gillespy2.solvers.cpp.tau_leaping_c_solver import TauLeapingCSolver
+
+
+class TestTauLeapingCSolver(unittest.TestCase):
+    def test_run_example(self):
+        model = Example()
+        results = model.run(solver=TauLeapingCSolver)
+
+    def test_run_example_precompiled(self):
+        model = Example()
+        solver = TauLeapingCSolver(model)
+        results = model.run(solver=solver)
+
+    def test_matches_ssa(self):
+        model = Example()
+        direct = SSACSolver(model).run(t=1, increment=0.25, number_of_trajectories=200, seed=1, show_labels=False,
+                                       initial_state={'Sp': 10000})
+        for shared_library in (False, True):
+            solver = TauLeapingCSolver(model, shared_library=shared_library)
+            # Leaping biases the mean decay by roughly tau_tol / 2 per unit of k * t.
+            tau = solver.run(t=1, increment=0.25, number_of_trajectories=200, seed=1, show_labels=False,
+                             initial_state={'Sp': 10000}, tau_tol=0.01)
+            self.assertEqual(direct.shape, tau.shape)
+            self.assertTrue(np.array_equal(direct[:, :, 0], tau[:, :, 0]))
+            self.assertTrue(np.allclose(direct[:, :, 1].mean(axis=0), tau[:, :, 1].mean(axis=0), rtol=0.03))
+            self.assertTrue(np.all(tau[:, :, 1] >= 0))
+
+    def test_unknown_algorithm(self):
+        model = Example()
+        solver = TauLeapingCSolver(model)
+        with self.assertRaises(SolverError):
+            solver.run(algorithm='direct')
+        # Leaps do not resolve individual events.
+        with self.assertRaises(SolverError):
+            solver.run(record='events')
+
+    def test_parameter_sweep(self):
+        model = Example()
+        solver = TauLeapingCSolver(model)
+        swept = solver.sweep({'k1': [0, 1, 3]}, number_of_trajectories=2, t=2, increment=0.5, seed=1)
+        self.assertEqual(swept.shape, (3, 2, 5, 2))
+        for point, k1 in enumerate([0, 1, 3]):
+            single = solver.run(t=2, increment=0.5, number_of_trajectories=2, seed=1, show_labels=False,
+                                parameters={'k1': k1}, first_trajectory=point * 2)
+            self.assertTrue(np.array_equal(swept[point], single))
+
+
+if __name__ == '__main__':
+    unittest.main()
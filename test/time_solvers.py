@@ -61,8 +61,63 @@ def timed_trials(models, solvers, trajectories, number_trials=30, override_numbe
     return timing_data
 
 
+def large_network_model(number_reactions, number_species=100, seed=0):
+    """
+    Builds a random network of first order conversions between species, with rate constants spread over several
+    orders of magnitude, for benchmarking how simulation algorithms scale with the number of reactions.
+    :param number_reactions: the number of reactions in the network.
+    :param number_species: the number of species the reactions convert between.
+    :param seed: seed for the random network structure.
+    :return: a GillesPy2 model.
+    """
+    rng = np.random.RandomState(seed)
+    model = gillespy2.Model(name='LargeNetwork{}'.format(number_reactions))
+    species = [gillespy2.Species(name='S{}'.format(i), initial_value=1000) for i in range(number_species)]
+    model.add_species(species)
+    for i in range(number_reactions):
+        reactant, product = rng.choice(number_species, 2, replace=False)
+        rate = gillespy2.Parameter(name='k{}'.format(i), expression=10 ** rng.uniform(-4, 0))
+        model.add_parameter(rate)
+        model.add_reaction(gillespy2.Reaction(name='r{}'.format(i), rate=rate,
+                                              reactants={species[reactant]: 1}, products={species[product]: 1}))
+    model.timespan(np.linspace(0, 1, 11))
+    return model
+
+
+def timed_algorithms(reaction_counts, algorithms=('direct', 'nrm', 'cr'), number_species=100, number_trials=5,
+                     output_file=None):
+    """
+    Times each SSACSolver algorithm on random networks of increasing size.
+    :param reaction_counts: the list of network sizes, in reactions, to time each algorithm on.
+    :param algorithms: the SSACSolver algorithms to compare.
+    :param number_species: the number of species in each network.
+    :param number_trials: the number of times to run each algorithm-size combination.
+    :param output_file: if specified, file location where timing results will be stored using pickle.
+    :return: timing data in the format of timed_trials(), keyed by ['LargeNetwork'][algorithm], with the number of
+    reactions in the first column. Pass xlabel='Reactions' when plotting it with plot_solver_run_times().
+    """
+    timing_data = {'LargeNetwork': {algorithm: np.zeros((len(reaction_counts), 1+number_trials))
+                                    for algorithm in algorithms}}
+    for count_i, number_reactions in enumerate(reaction_counts):
+        model = large_network_model(number_reactions, number_species)
+        solver = SSACSolver(model, shared_library=True)
+        for algorithm in algorithms:
+            times = timing_data['LargeNetwork'][algorithm][count_i]
+            times[0] = number_reactions
+            for i in trange(number_trials, desc='Algorithm: {}, Reactions: {}'.format(algorithm, number_reactions)):
+                start = timer()
+                solver.run(t=model.tspan[-1], increment=model.tspan[1] - model.tspan[0], seed=i, algorithm=algorithm)
+                stop = timer()
+                times[1+i] = stop - start
+        if output_file is not None:
+            with open(output_file, 'wb') as f:
+                pickle.dump(timing_data, f)
+    return timing_data
+
+
 def plot_solver_run_times(timing_data, ylabel='Average seconds', reduce=np.mean, line_styles={}, transformation=None,
-                          model_names=None, solver_names=None, baseline_solver_name=None, output_directory=None):
+                          model_names=None, solver_names=None, baseline_solver_name=None, output_directory=None,
+                          xlabel='Trajectories'):
     """
     Plots matplotlib graphs comparing each solver's execution time for each model.
     :param timing_data: the timing data returned from a call to timed_trials().
@@ -74,6 +129,7 @@ def plot_solver_run_times(timing_data, ylabel='Average seconds', reduce=np.mean,
     :param solver_names: if specified, a list for a subset of the solver names in the timing data to plot.
     :param baseline_solver_name: if specified, timing results will be divided by the times of this solver.
     :param output_directory: if specified, plots will be saved in this folder.
+    :param xlabel: label for the x axis, the quantity in the first column of the timing data.
     :return:
     """
     if model_names is None:
@@ -81,7 +137,7 @@ def plot_solver_run_times(timing_data, ylabel='Average seconds', reduce=np.mean,
     for model in model_names:
         plt.figure()
         plt.title('{} Timing Results'.format(model))
-        plt.xlabel('Trajectories')
+        plt.xlabel(xlabel)
         plt.ylabel(ylabel)
         baseline = None
         if baseline_solver_name is not None: